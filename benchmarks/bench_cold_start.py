@@ -0,0 +1,76 @@
+"""Measure the cold start of bynamodb in fresh interpreters.
+
+    $ python benchmarks/bench_cold_start.py [--runs 10]
+    $ python benchmarks/bench_cold_start.py --host localhost --port 8000
+
+Each run imports :mod:`bynamodb`, defines a model and, when a host is
+given, makes the first request, and reports the time of each step.
+
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+
+RUN = r'''
+import json
+import sys
+import time
+
+started_at = time.time()
+from bynamodb import init_bynamodb
+from bynamodb.attributes import NumberAttribute, StringAttribute
+from bynamodb.model import Model
+imported_at = time.time()
+
+
+class ColdStartItem(Model):
+    user_id = StringAttribute(hash_key=True)
+    created_at = NumberAttribute(range_key=True)
+    name = StringAttribute()
+
+defined_at = time.time()
+host, port = sys.argv[1], int(sys.argv[2] or 0)
+requested_at = defined_at
+if host:
+    init_bynamodb(DYNAMODB_HOST=host, DYNAMODB_PORT=port,
+                  DYNAMODB_IS_SECURE=False)
+    ColdStartItem._get_connection().list_tables(limit=1)
+    requested_at = time.time()
+print(json.dumps({
+    'import': imported_at - started_at,
+    'define': defined_at - imported_at,
+    'request': requested_at - defined_at,
+    'boto': 'boto' in sys.modules
+}))
+'''
+
+
+def run_once(host, port):
+    output = subprocess.check_output(
+        [sys.executable, '-c', RUN, host or '', str(port or '')])
+    return json.loads(output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--host')
+    parser.add_argument('--port', type=int)
+    args = parser.parse_args(argv)
+    # The first run writes the bytecode, so it is not measured.
+    run_once(None, None)
+    runs = [run_once(args.host, args.port) for _ in range(args.runs)]
+    print('{0:<8} {1:>10} {2:>10} {3:>10}'.format(
+        'step', 'min ms', 'median ms', 'max ms'))
+    for step in ('import', 'define', 'request'):
+        times = sorted(run[step] * 1e3 for run in runs)
+        print('{0:<8} {1:>10.2f} {2:>10.2f} {3:>10.2f}'.format(
+            step, times[0], times[len(times) // 2], times[-1]))
+    print('boto imported before the first request: {0}'.format(
+        any(run['boto'] for run in runs if not args.host)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Compare :meth:`Model.dumps` with pickle and JSON of the raw item.
+
+    $ python benchmarks/bench_serialization.py [--items 10000]
+
+"""
+import argparse
+import cPickle as pickle
+import json
+import time
+
+from bynamodb.attributes import (BooleanAttribute, ListAttribute,
+                                 MapAttribute, NumberAttribute,
+                                 StringAttribute, StringSetAttribute)
+from bynamodb.model import Model
+
+
+class BenchItem(Model):
+    user_id = StringAttribute(hash_key=True)
+    created_at = NumberAttribute(range_key=True)
+    name = StringAttribute()
+    active = BooleanAttribute()
+    score = NumberAttribute()
+    tags = StringSetAttribute()
+    history = ListAttribute()
+    profile = MapAttribute()
+
+
+def make_items(count):
+    return [
+        BenchItem(
+            user_id=u'user-{0:08d}'.format(i),
+            created_at=1420070400 + i,
+            name=u'Name {0}'.format(i),
+            active=i % 2 == 0,
+            score=i * 0.5,
+            tags=set([u'tag-{0}'.format(i % 7), u'common']),
+            history=[i, i + 1, i + 2],
+            profile={u'city': u'Seoul', u'visits': i % 100}
+        )
+        for i in range(count)
+    ]
+
+
+def measure(name, items, dumps, loads):
+    started_at = time.time()
+    payloads = [dumps(item) for item in items]
+    dumps_time = time.time() - started_at
+    started_at = time.time()
+    for payload in payloads:
+        loads(payload)
+    loads_time = time.time() - started_at
+    size = sum(len(payload) for payload in payloads)
+    print('{0:<8} {1:>10.1f} {2:>12.2f} {3:>12.2f}'.format(
+        name, float(size) / len(items),
+        dumps_time / len(items) * 1e6, loads_time / len(items) * 1e6))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=10000)
+    args = parser.parse_args(argv)
+    items = make_items(args.items)
+    print('{0:<8} {1:>10} {2:>12} {3:>12}'.format(
+        'format', 'bytes/item', 'dumps us', 'loads us'))
+    measure('dumps', items, BenchItem.dumps, BenchItem.loads)
+    measure('pickle', items, lambda item: pickle.dumps(item, 2),
+            pickle.loads)
+    measure('json', items,
+            lambda item: json.dumps(BenchItem._encode_item(item)),
+            lambda data: BenchItem.from_raw_data(json.loads(data)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,8 @@
-from boto.dynamodb2.layer1 import DynamoDBConnection
-
+from .batch import BatchWriter, batch_get
+from .lazy import dynamodb2_layer1
 from .settings import conf
 
-__all__ = 'init_bynamodb'
+__all__ = 'init_bynamodb', 'batch_get', 'BatchWriter'
 
 
 def init_bynamodb(config=None, **kwargs):
@@ -26,7 +26,18 @@ def _patch_dynamodb_connection(**kwargs):
     to the local DynamoDB or remote DynamoDB as the project configuration
     changes.
 
+    The class is patched right away if :mod:`boto.dynamodb2.layer1` is
+    imported already. Otherwise it is patched as soon as it is imported,
+    either by bynamodb for its first connection or by any other code, so
+    importing boto doesn't slow down the start.
+
     """
+    dynamodb2_layer1.on_load(
+        lambda module: _patch_connection_class(module.DynamoDBConnection,
+                                               kwargs))
+
+
+def _patch_connection_class(DynamoDBConnection, kwargs):
     if hasattr(DynamoDBConnection, '__original_init__'):
         return
 
@@ -1,7 +1,22 @@
+import bz2
+import json
+import zlib
 from decimal import Decimal
-from boto.dynamodb.types import Dynamizer
-from boto.dynamodb2.types import (STRING, STRING_SET, BINARY, BINARY_SET,
-                                  NUMBER, NUMBER_SET, LIST, MAP, BOOLEAN)
+
+from .lazy import dynamodb_types
+
+
+# The DynamoDB types as :mod:`boto.dynamodb2.types` defines them,
+# without importing boto.
+STRING = 'S'
+NUMBER = 'N'
+BINARY = 'B'
+STRING_SET = 'SS'
+NUMBER_SET = 'NS'
+BINARY_SET = 'BS'
+BOOLEAN = 'BOOL'
+MAP = 'M'
+LIST = 'L'
 
 
 class Attribute(object):
@@ -19,6 +34,10 @@ class Attribute(object):
     # (:class:`str`) Type string defined in :mod:`boto.dynamodb2.types`
     type = None
 
+    # (:class:`bool`) `True` if the attribute is decoded on its first access
+    # even if the model doesn't decode lazily.
+    lazy = False
+
     def __init__(self, hash_key=False, range_key=False,
                  null=False, default=None):
         self.hash_key = hash_key
@@ -31,11 +50,15 @@ class Attribute(object):
 
     def __get__(self, obj, cls=None):
         if obj is not None:
+            if self.attr_name in obj._raw:
+                obj._data[self.attr_name] = self.decode(
+                    obj._raw.pop(self.attr_name))
             return obj._data.get(self.attr_name)
         return self
 
     def __set__(self, obj, value):
         if obj is not None:
+            obj._raw.pop(self.attr_name, None)
             obj._data[self.attr_name] = value
             return
         raise ValueError('Cannot change the class attribute')
@@ -54,13 +77,13 @@ class Attribute(object):
         return self._encode(value)
 
     def _encode(self, value):
-        return Dynamizer().encode(value)
+        return dynamodb_types.Dynamizer().encode(value)
 
     def decode(self, value):
-        return Dynamizer().decode(value)
+        return dynamodb_types.Dynamizer().decode(value)
 
     def decode(self, value):
-        return Dynamizer().decode(value)
+        return dynamodb_types.Dynamizer().decode(value)
 
 
 class StringAttribute(Attribute):
@@ -96,7 +119,7 @@ class NumberAttribute(Attribute):
         return type(value) in (int, float)
 
     def decode(self, value):
-        value = Dynamizer().decode(value)
+        value = dynamodb_types.Dynamizer().decode(value)
         if isinstance(value, Decimal):
             if '.' in str(value):
                 return float(value)
@@ -105,6 +128,21 @@ class NumberAttribute(Attribute):
         return value
 
 
+class VersionAttribute(NumberAttribute):
+    """The version of the item for the optimistic locking.
+
+    The version is incremented by each :meth:`~bynamodb.model.Model.save`,
+    which puts the item only if the version in the table is still the one
+    read, as :meth:`~bynamodb.model.Model.delete` deletes it. The item
+    never saved has no version. A model has a version attribute at most.
+
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('null', True)
+        super(VersionAttribute, self).__init__(**kwargs)
+
+
 class SetAttribute(Attribute):
     set_of = None
 
@@ -141,3 +179,103 @@ class MapAttribute(Attribute):
 
     def valid(cls, value):
         return type(value) is dict
+
+
+#: Codecs available to :class:`CompressedAttribute`. Each codec is
+#: a tuple of the header byte stored in front of the payload, the compress
+#: function taking the data and the level, and the decompress function.
+COMPRESSION_CODECS = {
+    'zlib': ('z', zlib.compress, zlib.decompress),
+    'bz2': ('b', bz2.compress, bz2.decompress),
+}
+
+# The header byte of the payload stored without compression.
+_UNCOMPRESSED = '\x00'
+
+
+class CompressedAttribute(BinaryAttribute):
+    """Store the value compressed as binary.
+
+    Values smaller than ``threshold`` bytes are stored as they are.
+    The codec is recorded in the first byte of the stored value, so changing
+    the codec doesn't break the items already written. Loaded values are
+    decompressed on the first access.
+
+    :param codec: the name of the codec in :data:`COMPRESSION_CODECS`.
+    :type codec: :class:`str`
+    :param level: the compression level passed to the codec.
+    :type level: :class:`int`
+    :param threshold: the minimum size in bytes to compress the value.
+    :type threshold: :class:`int`
+
+    """
+
+    lazy = True
+
+    def __init__(self, codec='zlib', level=6, threshold=1024, **kwargs):
+        if codec not in COMPRESSION_CODECS:
+            raise ValueError('Unknown compression codec: {0}'.format(codec))
+        super(CompressedAttribute, self).__init__(**kwargs)
+        self.codec = codec
+        self.level = level
+        self.threshold = threshold
+
+    def _encode(self, value):
+        data = self.serialize(value)
+        if len(data) < self.threshold:
+            payload = _UNCOMPRESSED + data
+        else:
+            header, compress, _ = COMPRESSION_CODECS[self.codec]
+            payload = header + compress(data, self.level)
+        return dynamodb_types.Dynamizer().encode(
+            dynamodb_types.Binary(payload))
+
+    def decode(self, value):
+        payload = dynamodb_types.Dynamizer().decode(value).value
+        header, data = payload[:1], payload[1:]
+        if header != _UNCOMPRESSED:
+            for codec_header, _, decompress in COMPRESSION_CODECS.values():
+                if codec_header == header:
+                    data = decompress(data)
+                    break
+            else:
+                raise ValueError(
+                    'Unknown compression header: {0!r}'.format(header))
+        return self.deserialize(data)
+
+    def serialize(self, value):
+        """Translate the value to the bytes to be compressed."""
+        raise NotImplementedError
+
+    def deserialize(self, data):
+        """Translate the decompressed bytes to the value."""
+        raise NotImplementedError
+
+
+class CompressedStringAttribute(CompressedAttribute):
+
+    @classmethod
+    def valid(cls, value):
+        return StringAttribute.valid(value)
+
+    def serialize(self, value):
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+        return value
+
+    def deserialize(self, data):
+        return data.decode('utf-8')
+
+
+class CompressedJSONAttribute(CompressedAttribute):
+
+    @classmethod
+    def valid(cls, value):
+        return type(value) in (dict, list)
+
+    def serialize(self, value):
+        return json.dumps(value, separators=(',', ':'))
+
+    def deserialize(self, data):
+        return json.loads(data)
+
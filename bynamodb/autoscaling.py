@@ -0,0 +1,469 @@
+import logging
+import math
+import threading
+import time
+from collections import deque, namedtuple
+
+from .lazy import dynamodb2_exceptions
+
+
+logger = logging.getLogger(__name__)
+
+#: The operations consuming the read capacity.
+READ_OPERATIONS = frozenset(['get_item', 'batch_get_item', 'query', 'scan'])
+
+#: The operations consuming the write capacity.
+WRITE_OPERATIONS = frozenset([
+    'put_item', 'update_item', 'delete_item', 'batch_write_item'
+])
+
+#: The change of the provisioned throughput of a table, or of its global
+#: secondary index if ``index_name`` is not `None`.
+CapacityChange = namedtuple('CapacityChange', [
+    'table_name', 'index_name', 'read_units', 'write_units',
+    'new_read_units', 'new_write_units'
+])
+
+
+class ThroughputTuner(object):
+    """Tune the provisioned throughput of the tables and their global
+    secondary indexes to the capacity consumed through bynamodb.
+
+    The connections wrapped by the tuner ask DynamoDB for the consumed
+    capacity of each table and index, and count the throttled requests.
+    :meth:`tune` compares the peak consumption of the recent window with
+    the provisioned throughput, and updates it to keep the utilization at
+    ``target_utilization`` within the bounds. The throughput is increased
+    after ``scale_up_cooldown`` since the last increase, and at least by
+    ``throttle_scale_up`` if the requests were throttled since. It is
+    decreased after ``scale_down_cooldown`` since the last change, when the
+    consumption has fallen to ``scale_down_threshold`` of the target,
+    and at most ``max_decreases`` times in ``decrease_period`` as DynamoDB
+    limits.
+
+    .. code-block:: python
+
+       Model.throughput_tuner = ThroughputTuner(
+           min_units=5, max_units=500,
+           bounds={'Article.AuthorIndex': (1, 50)}
+       )
+       Model.throughput_tuner.watch(Article)
+       Model.throughput_tuner.start(interval=60)
+
+    :param min_units: the minimum read and write capacity units.
+    :type min_units: :class:`int`
+    :param max_units: the maximum read and write capacity units.
+    :type max_units: :class:`int`
+    :param bounds: the ``(min_units, max_units)`` of each table name,
+                   or ``'Table.Index'`` name of an index.
+    :type bounds: :class:`collections.Mapping`
+    :param target_utilization: the ratio of the provisioned throughput
+                               to consume.
+    :type target_utilization: :class:`float`
+    :param scale_down_threshold: the ratio of the provisioned throughput
+                                 the desired throughput must fall to
+                                 before it is decreased.
+    :type scale_down_threshold: :class:`float`
+    :param throttle_scale_up: the minimum ratio to increase the throttled
+                              throughput by.
+    :type throttle_scale_up: :class:`float`
+    :param scale_up_cooldown: seconds between the increases.
+    :param scale_down_cooldown: seconds from the last change to a decrease.
+    :param max_decreases: the number of the decreases in
+                          ``decrease_period``.
+    :type max_decreases: :class:`int`
+    :param decrease_period: seconds to count the decreases in.
+    :param window: seconds of the consumption to tune to. The throughput is
+                   not decreased until the tuner has observed a window.
+    :param bucket: seconds of the consumption averaged to a rate.
+    :param dry_run: if `True`, the changes are logged and returned, but the
+                    tables are not updated.
+    :type dry_run: :class:`bool`
+
+    """
+
+    def __init__(self, min_units=1, max_units=1000, bounds=None,
+                 target_utilization=0.7, scale_down_threshold=0.8,
+                 throttle_scale_up=1.5, scale_up_cooldown=60.0,
+                 scale_down_cooldown=900.0, max_decreases=4,
+                 decrease_period=86400.0, window=300.0, bucket=60.0,
+                 dry_run=False):
+        self.min_units = min_units
+        self.max_units = max_units
+        self.bounds = dict(bounds or {})
+        self.target_utilization = target_utilization
+        self.scale_down_threshold = scale_down_threshold
+        self.throttle_scale_up = throttle_scale_up
+        self.scale_up_cooldown = scale_up_cooldown
+        self.scale_down_cooldown = scale_down_cooldown
+        self.max_decreases = max_decreases
+        self.decrease_period = decrease_period
+        self.window = window
+        self.bucket = bucket
+        self.dry_run = dry_run
+        self._started_at = time.time()
+        self._usages = {}
+        self._history = {}
+        self._tables = set()
+        self._conn = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def wrap(self, conn):
+        """Wrap the connection to observe the capacity its requests
+        consume. :meth:`tune` uses the last connection wrapped if no
+        connection is given. The models wrap each connection once.
+
+        """
+        self._conn = conn
+        return _TunedConnection(self, conn)
+
+    def watch(self, *models):
+        """Tune the tables of the models even if they have no requests,
+        so the throughput of the idle tables is decreased.
+
+        """
+        with self._lock:
+            self._tables.update(model.get_table_name() for model in models)
+
+    def record(self, table_name, index_name, kind, units=0.0, throttled=False,
+               now=None):
+        """Record the capacity units consumed, or a throttled request.
+
+        :param kind: ``'read'`` or ``'write'``.
+        :param now: the time of the request. :func:`time.time` if omitted.
+
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._tables.add(table_name)
+            usage = self._usages.get((table_name, index_name))
+            if usage is None:
+                usage = self._usages[(table_name, index_name)] = _Usage()
+            usage.add(kind, units, throttled, now, self.bucket, self.window)
+
+    def observe(self, operation, args, kwargs, result=None, error=None):
+        """Record the consumed capacity of a response of the operation,
+        or the throttled request of the error.
+
+        """
+        kind = 'read' if operation in READ_OPERATIONS else 'write'
+        if error is not None:
+            if not isinstance(error, dynamodb2_exceptions.
+                              ProvisionedThroughputExceededException):
+                return
+            index_name = kwargs.get('index_name')
+            for table_name in _table_names(operation, args, kwargs):
+                self.record(table_name, index_name, kind, throttled=True)
+            return
+        consumed = result.get('ConsumedCapacity') or []
+        if isinstance(consumed, dict):
+            consumed = [consumed]
+        for capacity in consumed:
+            table_name = capacity['TableName']
+            if 'Table' in capacity:
+                units = capacity['Table'].get('CapacityUnits', 0)
+                # The local secondary indexes share the throughput of
+                # the table.
+                for index in capacity.get('LocalSecondaryIndexes',
+                                          {}).values():
+                    units += index.get('CapacityUnits', 0)
+            else:
+                units = capacity.get('CapacityUnits', 0)
+            self.record(table_name, None, kind, units)
+            for index_name, index in capacity.get('GlobalSecondaryIndexes',
+                                                  {}).items():
+                self.record(table_name, index_name, kind,
+                            index.get('CapacityUnits', 0))
+
+    def tune(self, conn=None, now=None):
+        """Update the provisioned throughput of the tables observed or
+        watched to their consumption.
+
+        :param conn: the connection to describe and update the tables.
+                     The last connection wrapped if omitted.
+        :param now: the time to tune at. :func:`time.time` if omitted.
+        :returns: the list of :data:`CapacityChange`.
+
+        """
+        conn = conn or self._conn
+        if conn is None:
+            raise ValueError('No connection to tune the tables with')
+        now = time.time() if now is None else now
+        with self._lock:
+            table_names = sorted(self._tables)
+        changes = []
+        for table_name in table_names:
+            try:
+                changes.extend(self._tune_table(conn, table_name, now))
+            except Exception as e:
+                logger.warning('Failed to tune the throughput of %s: %s',
+                               table_name, e)
+        return changes
+
+    def start(self, interval=60.0):
+        """Tune the tables every interval in seconds in the background."""
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop tuning in the background."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self, now=None):
+        """The peak consumption rates and the throttled requests of the
+        window of each table and ``'Table.Index'`` as :class:`dict`.
+
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            return dict(
+                (_target_name(table_name, index_name), {
+                    'read_rate': usage.rate('read', now, self.bucket,
+                                            self.window),
+                    'write_rate': usage.rate('write', now, self.bucket,
+                                             self.window),
+                    'read_throttles': usage.throttles('read', now,
+                                                      self.window),
+                    'write_throttles': usage.throttles('write', now,
+                                                       self.window)
+                })
+                for (table_name, index_name), usage in self._usages.items()
+            )
+
+    def _run(self, interval):
+        while not self._stopped.wait(interval):
+            try:
+                self.tune()
+            except ValueError:
+                # No request has been made yet.
+                pass
+            except Exception as e:
+                logger.warning('Failed to tune the throughput: %s', e)
+
+    def _tune_table(self, conn, table_name, now):
+        table = conn.describe_table(table_name)['Table']
+        if table.get('TableStatus', 'ACTIVE') != 'ACTIVE':
+            return []
+        table_change = self._plan(table_name, None,
+                                  table['ProvisionedThroughput'], now)
+        index_changes = []
+        for index in table.get('GlobalSecondaryIndexes', []):
+            if index.get('IndexStatus', 'ACTIVE') != 'ACTIVE':
+                continue
+            change = self._plan(table_name, index['IndexName'],
+                                index['ProvisionedThroughput'], now)
+            if change is not None:
+                index_changes.append(change)
+        changes = [table_change] if table_change is not None else []
+        changes.extend(index_changes)
+        for change in changes:
+            logger.info(
+                '%s the throughput of %s from %d/%d to %d/%d',
+                'Would change' if self.dry_run else 'Changing',
+                _target_name(change.table_name, change.index_name),
+                change.read_units, change.write_units,
+                change.new_read_units, change.new_write_units)
+        if not changes or self.dry_run:
+            return changes
+        kwargs = {}
+        if table_change is not None:
+            kwargs['provisioned_throughput'] = _throughput(table_change)
+        if index_changes:
+            kwargs['global_secondary_index_updates'] = [
+                {'Update': {'IndexName': change.index_name,
+                            'ProvisionedThroughput': _throughput(change)}}
+                for change in index_changes
+            ]
+        conn.update_table(table_name, **kwargs)
+        with self._lock:
+            for change in changes:
+                self._history_of(change.table_name,
+                                 change.index_name).add(change, now)
+        return changes
+
+    def _plan(self, table_name, index_name, throughput, now):
+        read_units = throughput['ReadCapacityUnits']
+        write_units = throughput['WriteCapacityUnits']
+        if not read_units and not write_units:
+            # On-demand
+            return None
+        with self._lock:
+            usage = self._usages.get((table_name, index_name), _Usage())
+            history = self._history_of(table_name, index_name)
+            last_increase = max(history.last_increase,
+                                throughput.get('LastIncreaseDateTime', 0))
+            last_decrease = max(history.last_decrease,
+                                throughput.get('LastDecreaseDateTime', 0))
+            decreases = max(history.decreases_since(
+                now - self.decrease_period),
+                throughput.get('NumberOfDecreasesToday', 0))
+            desired = [
+                self._desired(table_name, index_name, usage, kind, units,
+                              max(last_increase, last_decrease), now)
+                for kind, units in (('read', read_units),
+                                    ('write', write_units))
+            ]
+        can_increase = now - last_increase >= self.scale_up_cooldown
+        can_decrease = \
+            now - max(last_increase, last_decrease) >= \
+            self.scale_down_cooldown and \
+            decreases < self.max_decreases and \
+            now - self._started_at >= self.window
+        new_units = []
+        for units, (desired_units, force) in zip((read_units, write_units),
+                                                 desired):
+            if desired_units > units and can_increase:
+                new_units.append(desired_units)
+            elif desired_units < units and can_decrease and \
+                    (force or desired_units <=
+                     units * self.scale_down_threshold):
+                new_units.append(desired_units)
+            else:
+                new_units.append(units)
+        if new_units == [read_units, write_units]:
+            return None
+        return CapacityChange(table_name, index_name, read_units,
+                              write_units, new_units[0], new_units[1])
+
+    def _desired(self, table_name, index_name, usage, kind, units,
+                 last_change, now):
+        min_units, max_units = self.bounds.get(
+            _target_name(table_name, index_name),
+            (self.min_units, self.max_units))
+        rate = usage.rate(kind, now, self.bucket, self.window)
+        desired = int(math.ceil(rate / self.target_utilization))
+        if usage.throttled_since(kind, last_change):
+            desired = max(desired,
+                          int(math.ceil(units * self.throttle_scale_up)))
+        clamped = max(min_units, min(max_units, desired))
+        # The throughput out of the bounds is changed regardless of
+        # the threshold.
+        return clamped, not min_units <= units <= max_units
+
+    def _history_of(self, table_name, index_name):
+        history = self._history.get((table_name, index_name))
+        if history is None:
+            history = self._history[(table_name, index_name)] = _History()
+        return history
+
+
+class _Usage(object):
+    """The capacity units consumed and the throttled requests in buckets
+    of time.
+
+    """
+
+    def __init__(self):
+        self._buckets = {'read': deque(), 'write': deque()}
+        self._throttles = {'read': deque(), 'write': deque()}
+
+    def add(self, kind, units, throttled, now, bucket, window):
+        buckets = self._buckets[kind]
+        if not buckets or now - buckets[-1][0] >= bucket:
+            buckets.append([now, 0.0])
+        buckets[-1][1] += units
+        while now - buckets[0][0] > window:
+            buckets.popleft()
+        throttles = self._throttles[kind]
+        if throttled:
+            throttles.append(now)
+        while throttles and now - throttles[0] > window:
+            throttles.popleft()
+
+    def rate(self, kind, now, bucket, window):
+        """The peak units per second of the buckets in the window."""
+        peak = 0.0
+        for started_at, units in self._buckets[kind]:
+            if now - started_at > window:
+                continue
+            seconds = max(1.0, min(bucket, now - started_at))
+            peak = max(peak, units / seconds)
+        return peak
+
+    def throttles(self, kind, now, window):
+        return sum(1 for throttled_at in self._throttles[kind]
+                   if now - throttled_at <= window)
+
+    def throttled_since(self, kind, since):
+        throttles = self._throttles[kind]
+        return bool(throttles) and throttles[-1] > since
+
+
+class _History(object):
+    """The changes made by the tuner."""
+
+    def __init__(self):
+        self.last_increase = 0
+        self.last_decrease = 0
+        self._decreases = []
+
+    def add(self, change, now):
+        if change.new_read_units > change.read_units or \
+                change.new_write_units > change.write_units:
+            self.last_increase = now
+        if change.new_read_units < change.read_units or \
+                change.new_write_units < change.write_units:
+            self.last_decrease = now
+            self._decreases.append(now)
+
+    def decreases_since(self, since):
+        self._decreases = [t for t in self._decreases if t > since]
+        return len(self._decreases)
+
+
+class _TunedConnection(object):
+    """The connection reporting the capacity its requests consume to
+    the tuner.
+
+    """
+
+    def __init__(self, tuner, conn):
+        self.tuner = tuner
+        self.conn = conn
+
+    def __getattr__(self, name):
+        attr = getattr(self.conn, name)
+        if not callable(attr) or name.startswith('_') or \
+                name not in READ_OPERATIONS | WRITE_OPERATIONS:
+            return attr
+
+        def call(*args, **kwargs):
+            # The indexes are reported on top of the total, so only no
+            # report or the total is upgraded.
+            if kwargs.get('return_consumed_capacity') in (None, 'TOTAL'):
+                kwargs['return_consumed_capacity'] = 'INDEXES'
+            try:
+                result = attr(*args, **kwargs)
+            except Exception as e:
+                self.tuner.observe(name, args, kwargs, error=e)
+                raise
+            self.tuner.observe(name, args, kwargs, result)
+            return result
+        return call
+
+
+def _table_names(operation, args, kwargs):
+    if operation.startswith('batch_'):
+        request_items = args[0] if args else kwargs['request_items']
+        return list(request_items)
+    return [args[0] if args else kwargs['table_name']]
+
+
+def _target_name(table_name, index_name):
+    if index_name is None:
+        return table_name
+    return '{0}.{1}'.format(table_name, index_name)
+
+
+def _throughput(change):
+    return {'ReadCapacityUnits': change.new_read_units,
+            'WriteCapacityUnits': change.new_write_units}
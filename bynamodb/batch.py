@@ -0,0 +1,320 @@
+import time
+from collections import OrderedDict
+
+from .exceptions import UnprocessedItemsException
+from .lazy import dynamodb_types
+
+
+#: (:class:`int`) The maximum number of keys in a BatchGetItem request.
+MAX_GET_KEYS = 100
+
+#: (:class:`int`) The maximum number of requests in a BatchWriteItem request.
+MAX_WRITE_ITEMS = 25
+
+#: (:class:`int`) The default number of retries of the unprocessed requests
+#: of a batch before giving up.
+MAX_RETRIES = 10
+
+
+def get_raw_items(conn, request_items, retry_delay=0.05, max_delay=1.0,
+                  max_retries=MAX_RETRIES):
+    """Run BatchGetItem until there are no unprocessed keys left.
+
+    :param conn: the connection to execute the request.
+    :type conn: :class:`boto.dynamodb2.layer1.DynamoDBConnection`
+    :param request_items: the ``RequestItems`` of the BatchGetItem request.
+    :type request_items: :class:`collections.Mapping`
+    :param max_retries: the number of retries of the unprocessed keys.
+    :type max_retries: :class:`int`
+    :returns: the raw items found grouped by the table name.
+    :raises: :class:`~bynamodb.exceptions.UnprocessedItemsException`
+             if keys are still unprocessed after the retries.
+
+    """
+    responses = {}
+    delay = retry_delay
+    retries = 0
+    while request_items:
+        result = conn.batch_get_item(request_items)
+        for table_name, items in result.get('Responses', {}).items():
+            responses.setdefault(table_name, []).extend(items)
+        request_items = result.get('UnprocessedKeys')
+        if request_items:
+            retries = _check_retries(retries, max_retries, request_items)
+            time.sleep(delay)
+            delay = min(delay * 2, max_delay)
+    return responses
+
+
+def write_raw_items(conn, request_items, retry_delay=0.05, max_delay=1.0,
+                    max_retries=MAX_RETRIES):
+    """Run BatchWriteItem until there are no unprocessed items left.
+
+    :param conn: the connection to execute the request.
+    :type conn: :class:`boto.dynamodb2.layer1.DynamoDBConnection`
+    :param request_items: the ``RequestItems`` of the BatchWriteItem request.
+    :type request_items: :class:`collections.Mapping`
+    :param max_retries: the number of retries of the unprocessed items.
+    :type max_retries: :class:`int`
+    :raises: :class:`~bynamodb.exceptions.UnprocessedItemsException`
+             if items are still unprocessed after the retries.
+
+    """
+    delay = retry_delay
+    retries = 0
+    while request_items:
+        result = conn.batch_write_item(request_items)
+        request_items = result.get('UnprocessedItems')
+        if request_items:
+            retries = _check_retries(retries, max_retries, request_items)
+            time.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+
+def _check_retries(retries, max_retries, request_items):
+    if retries >= max_retries:
+        error = UnprocessedItemsException(
+            'The requests are still unprocessed after {0} retries'.format(
+                retries))
+        #: The ``RequestItems`` left unprocessed.
+        error.request_items = request_items
+        raise error
+    return retries + 1
+
+
+def put_raw_items(conn, table_name, raw_items):
+    """Put the raw items to the table in batches.
+
+    :returns: the number of items put.
+
+    """
+    count = 0
+    for chunk in chunks(raw_items, MAX_WRITE_ITEMS):
+        write_raw_items(conn, {
+            table_name: [{'PutRequest': {'Item': item}} for item in chunk]
+        })
+        count += len(chunk)
+    return count
+
+
+def delete_raw_keys(conn, table_name, keys):
+    """Delete the items of the raw keys from the table in batches.
+
+    :returns: the number of keys deleted.
+
+    """
+    count = 0
+    for chunk in chunks(keys, MAX_WRITE_ITEMS):
+        write_raw_items(conn, {
+            table_name: [{'DeleteRequest': {'Key': key}} for key in chunk]
+        })
+        count += len(chunk)
+    return count
+
+
+def batch_get(keys, consistent_read=False):
+    """Get the items of several models in BatchGetItem requests.
+
+    The keys of all the models are packed into the requests of up to
+    :data:`MAX_GET_KEYS` keys, and the unprocessed keys are retried.
+
+    .. code-block:: python
+
+       items = batch_get({
+           User: [user_id],
+           Post: [(user_id, post_id) for post_id in post_ids]
+       })
+
+    :param keys: the model and the list of its keys. A key is the hash key,
+                 or the tuple of the hash key and the range key.
+    :type keys: :class:`collections.Mapping`
+    :param consistent_read: read consistently if `True`.
+    :type consistent_read: :class:`bool`
+    :returns: the model and the list of its items found, in the order of
+              the keys.
+
+    In the context of a :class:`~bynamodb.session.Session`, the keys
+    the session has are not requested, and the items loaded are tracked
+    by the session.
+
+    """
+    from .session import current_session
+    session = current_session()
+    requests = OrderedDict()
+    known = {}
+    for model, model_keys in keys.items():
+        for key in model_keys:
+            if not isinstance(key, tuple):
+                key = key,
+            raw_key = model._encode_key(*key)
+            ident = model.get_table_name(), _key_id(raw_key)
+            requests[ident] = model, raw_key
+            if session is not None:
+                is_known, item = session.lookup(model, raw_key)
+                if is_known:
+                    known[ident] = item
+
+    found = {}
+    missing = [request for ident, request in requests.items()
+               if ident not in known]
+    for conn, entries in _group_by_connection(missing):
+        for chunk in chunks(entries, MAX_GET_KEYS):
+            request_items = {}
+            models = {}
+            for model, raw_key in chunk:
+                table_name = model.get_table_name()
+                models[table_name] = model
+                request = request_items.setdefault(table_name, {'Keys': []})
+                request['Keys'].append(raw_key)
+                if consistent_read:
+                    request['ConsistentRead'] = True
+            for table_name, raw_items in get_raw_items(
+                    conn, request_items).items():
+                key_names = [key.name
+                             for key in models[table_name]._get_keys()]
+                for raw_item in raw_items:
+                    raw_key = dict((name, raw_item[name])
+                                   for name in key_names)
+                    found[(table_name, _key_id(raw_key))] = raw_item
+
+    items = OrderedDict((model, []) for model in keys)
+    for ident, (model, raw_key) in requests.items():
+        if ident in known:
+            item = known[ident]
+        else:
+            item = None
+            if ident in found:
+                item = model.from_raw_data(found[ident])
+            if session is not None:
+                session.track(model, raw_key, item)
+        if item is not None:
+            items[model].append(item)
+    return items
+
+
+class BatchWriter(object):
+    """Put and delete the items of several models in BatchWriteItem
+    requests.
+
+    The writes are sent in the requests of up to :data:`MAX_WRITE_ITEMS`
+    items as they are added, and the rest when the writer is flushed or
+    its context exits. The unprocessed items are retried. The repeated
+    writes of a key before they are sent are coalesced. The models with
+    a :class:`~bynamodb.attributes.VersionAttribute` are rejected, since
+    BatchWriteItem can't check their versions.
+
+    .. code-block:: python
+
+       with BatchWriter() as writer:
+           writer.put(user)
+           writer.put(settings)
+           writer.delete(post)
+
+    """
+
+    def __init__(self):
+        self._requests = OrderedDict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def put(self, item):
+        """Put the model object.
+
+        :raises: :exc:`ValueError` if the model has a version.
+
+        """
+        model = item.__class__
+        model._check_batched()
+        raw_item = model._encode_item(item)
+        model._validate_item(raw_item)
+        key_names = [key.name for key in model._get_keys()]
+        raw_key = dict((name, raw_item[name]) for name in key_names)
+        self._add(model, raw_key, {'PutRequest': {'Item': raw_item}})
+
+    def delete(self, item):
+        """Delete the model object.
+
+        :raises: :exc:`ValueError` if the model has a version.
+
+        """
+        model = item.__class__
+        model._check_batched()
+        raw_key = model._encode_key(
+            *[getattr(item, key.name) for key in model._get_keys()])
+        self._add(model, raw_key, {'DeleteRequest': {'Key': raw_key}})
+
+    def flush(self):
+        """Send the writes added."""
+        requests, self._requests = self._requests, OrderedDict()
+        for conn, entries in _group_by_connection(requests.values()):
+            for chunk in chunks(entries, MAX_WRITE_ITEMS):
+                self._write(conn, chunk)
+
+    def _write(self, conn, chunk):
+        request_items = {}
+        for model, _, request in chunk:
+            request_items.setdefault(model.get_table_name(), []).append(
+                request)
+        write_raw_items(conn, request_items)
+        written = OrderedDict()
+        for model, raw_key, request in chunk:
+            raw_item = request['PutRequest']['Item'] \
+                if 'PutRequest' in request else raw_key
+            written.setdefault(model, []).append(raw_item)
+        for model, raw_items in written.items():
+            model._written(*raw_items)
+
+    def _add(self, model, raw_key, request):
+        ident = model.get_table_name(), _key_id(raw_key)
+        self._requests.pop(ident, None)
+        self._requests[ident] = model, raw_key, request
+        if len(self._requests) >= MAX_WRITE_ITEMS:
+            self.flush()
+
+
+def _group_by_connection(entries):
+    """Group the entries whose first element is the model by the connection
+    of the model, as the models may have their own connections, call
+    policies or throughput tuners.
+
+    :returns: the list of the connection and its entries.
+
+    """
+    groups = OrderedDict()
+    conns = {}
+    for entry in entries:
+        model = entry[0]
+        if model not in conns:
+            conns[model] = model._get_connection()
+        conn = conns[model]
+        groups.setdefault(id(conn), (conn, []))[1].append(entry)
+    return groups.values()
+
+
+def chunks(iterable, size):
+    """Split the iterable into lists of the size."""
+    chunk = []
+    for elem in iterable:
+        chunk.append(elem)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _key_id(key):
+    """Hashable identity of the encoded key.
+
+    The values are decoded, so numbers written differently on the wire
+    still refer to the same key.
+
+    """
+    dynamizer = dynamodb_types.Dynamizer()
+    return tuple(sorted(
+        (name, dynamizer.decode(value)) for name, value in key.items()
+    ))
@@ -0,0 +1,427 @@
+"""Drive a model with a workload of the concurrent requests and report
+the throughput and the latency percentiles.
+
+    $ python -m bynamodb.bench myapp.models:Event --memory --latency 0.002 \\
+          --threads 16 --duration 10 --read-ratio 0.9 \\
+          --distribution zipfian --item-size 200
+
+"""
+import argparse
+import bisect
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+
+from .attributes import BinaryAttribute, StringAttribute
+from .batch import MAX_WRITE_ITEMS, BatchWriter
+from .exceptions import ItemNotFoundException
+from .lazy import dynamodb2_layer1
+
+
+#: The key distributions of :class:`Workload`.
+DISTRIBUTIONS = ('uniform', 'zipfian')
+
+#: The percentiles reported by :class:`BenchResult`.
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class Workload(object):
+    """The mix of the requests sent to the model.
+
+    Each request reads or writes the item of a key drawn from ``keys``
+    keys. The reads are :meth:`~bynamodb.model.Model.get_item` or, as
+    many as ``query_ratio`` of them, the queries of the hash key. The writes
+    put the item with the payload of ``item_size`` bytes in its first string
+    or binary attribute which is not a key.
+
+    :param read_ratio: the ratio of the reads in the requests.
+    :type read_ratio: :class:`float`
+    :param query_ratio: the ratio of the queries in the reads.
+    :type query_ratio: :class:`float`
+    :param keys: the number of the keys.
+    :type keys: :class:`int`
+    :param distribution: ``'uniform'`` or ``'zipfian'``.
+    :type distribution: :class:`str`
+    :param zipf_exponent: the exponent of the zipfian distribution.
+                          The higher, the more skewed to the hot keys.
+    :type zipf_exponent: :class:`float`
+    :param item_size: the bytes of the payload of the written items.
+    :type item_size: :class:`int`
+
+    """
+
+    def __init__(self, read_ratio=0.9, query_ratio=0.0, keys=10000,
+                 distribution='uniform', zipf_exponent=0.99, item_size=100):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(
+                'Unknown distribution: {0}'.format(distribution))
+        self.read_ratio = read_ratio
+        self.query_ratio = query_ratio
+        self.keys = keys
+        self.distribution = distribution
+        self.zipf_exponent = zipf_exponent
+        self.item_size = item_size
+        if distribution == 'zipfian':
+            self._chooser = ZipfianKeys(keys, zipf_exponent)
+        else:
+            self._chooser = UniformKeys(keys)
+
+    def choose_key(self, rand):
+        """The index of the key of the next request."""
+        return self._chooser.choose(rand)
+
+    def choose_operation(self, rand):
+        """``'get'``, ``'query'`` or ``'put'``."""
+        if rand.random() >= self.read_ratio:
+            return 'put'
+        if rand.random() < self.query_ratio:
+            return 'query'
+        return 'get'
+
+
+class UniformKeys(object):
+    """Choose each of the keys equally."""
+
+    def __init__(self, count):
+        self.count = count
+
+    def choose(self, rand):
+        return rand.randrange(self.count)
+
+
+class ZipfianKeys(object):
+    """Choose the key of rank ``k`` in proportion to ``1 / k ** exponent``,
+    so a few keys take the most of the requests.
+
+    """
+
+    def __init__(self, count, exponent=0.99):
+        self.count = count
+        self.exponent = exponent
+        self._cumulative = []
+        total = 0.0
+        for rank in xrange(1, count + 1):
+            total += 1.0 / rank ** exponent
+            self._cumulative.append(total)
+
+    def choose(self, rand):
+        index = bisect.bisect_left(self._cumulative,
+                                   rand.random() * self._cumulative[-1])
+        return min(index, self.count - 1)
+
+
+class BenchResult(object):
+    """The throughput and the latencies of a run of :func:`run`."""
+
+    def __init__(self, elapsed, latencies, misses, errors):
+        #: (:class:`float`) Seconds the run took.
+        self.elapsed = elapsed
+        #: (:class:`dict`) The sorted latencies of each operation.
+        self.latencies = dict((operation, sorted(values))
+                              for operation, values in latencies.items())
+        #: (:class:`dict`) The number of the reads not finding the item
+        #: of each operation.
+        self.misses = dict(misses)
+        #: (:class:`dict`) The number of the failed requests of each
+        #: exception class name.
+        self.errors = dict(errors)
+
+    @property
+    def operations(self):
+        return sum(len(values) for values in self.latencies.values())
+
+    @property
+    def throughput(self):
+        """The successful requests per second."""
+        if not self.elapsed:
+            return 0.0
+        return self.operations / self.elapsed
+
+    def percentile(self, percentile, operation=None):
+        """The latency in seconds of the percentile of the operation,
+        or of all the operations if omitted.
+
+        """
+        if operation is None:
+            values = sorted(value for values in self.latencies.values()
+                            for value in values)
+        else:
+            values = self.latencies.get(operation, [])
+        if not values:
+            return None
+        index = int(round(percentile / 100.0 * (len(values) - 1)))
+        return values[index]
+
+    def as_dict(self):
+        operations = {}
+        for operation, values in self.latencies.items():
+            operations[operation] = {
+                'count': len(values),
+                'misses': self.misses.get(operation, 0),
+                'percentiles': dict(
+                    ('p{0}'.format(p), self.percentile(p, operation))
+                    for p in PERCENTILES)
+            }
+        return {
+            'elapsed': self.elapsed,
+            'operations': self.operations,
+            'throughput': self.throughput,
+            'errors': self.errors,
+            'by_operation': operations
+        }
+
+    def report(self):
+        """The result as the lines of a table."""
+        lines = ['{0} requests in {1:.2f}s, {2:.1f} requests/s'.format(
+            self.operations, self.elapsed, self.throughput)]
+        lines.append('{0:<8} {1:>8} {2:>8}'.format('op', 'count', 'misses') +
+                     ''.join('{0:>10}'.format('p{0} ms'.format(p))
+                             for p in PERCENTILES))
+        for operation in sorted(self.latencies):
+            line = '{0:<8} {1:>8} {2:>8}'.format(
+                operation, len(self.latencies[operation]),
+                self.misses.get(operation, 0))
+            for p in PERCENTILES:
+                line += '{0:>10.3f}'.format(
+                    self.percentile(p, operation) * 1e3)
+            lines.append(line)
+        for error, count in sorted(self.errors.items()):
+            lines.append('{0}: {1}'.format(error, count))
+        return '\n'.join(lines)
+
+
+def populate(model, workload):
+    """Put the items of all the keys of the workload."""
+    with BatchWriter() as writer:
+        for index in xrange(workload.keys):
+            writer.put(make_item(model, workload, index))
+            if (index + 1) % MAX_WRITE_ITEMS == 0:
+                writer.flush()
+
+
+def run(model, workload, threads=8, duration=10.0, operations=None,
+        seed=None):
+    """Send the requests of the workload to the model from the threads.
+
+    :param model: the model to drive.
+    :param workload: the requests to send.
+    :type workload: :class:`Workload`
+    :param threads: the number of the threads sending the requests.
+    :type threads: :class:`int`
+    :param duration: seconds to send the requests.
+    :type duration: :class:`float`
+    :param operations: the number of the requests to send. The run stops
+                       at this or ``duration``, whichever comes first.
+    :type operations: :class:`int`
+    :param seed: the seed of the random keys and operations.
+    :returns: the result of the run.
+    :rtype: :class:`BenchResult`
+    :raises: :exc:`ValueError` if neither ``duration`` nor ``operations``
+             is given, as the run would never stop.
+
+    """
+    if not duration and operations is None:
+        raise ValueError('Either duration or operations must be given')
+    latencies = defaultdict(list)
+    misses = defaultdict(int)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    remaining = [operations]
+    rand = random.Random(seed)
+    seeds = [rand.random() for _ in xrange(threads)]
+    started_at = time.time()
+    deadline = started_at + duration if duration else None
+
+    def take():
+        with lock:
+            if remaining[0] is None:
+                return True
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+
+    def work(seed):
+        rand = random.Random(seed)
+        local_latencies = defaultdict(list)
+        local_misses = defaultdict(int)
+        local_errors = defaultdict(int)
+        while take():
+            if deadline is not None and time.time() >= deadline:
+                break
+            operation = workload.choose_operation(rand)
+            index = workload.choose_key(rand)
+            request_started_at = time.time()
+            try:
+                found = _OPERATIONS[operation](model, workload, index)
+            except Exception as e:
+                local_errors[e.__class__.__name__] += 1
+                continue
+            local_latencies[operation].append(
+                time.time() - request_started_at)
+            if not found:
+                local_misses[operation] += 1
+        with lock:
+            for operation, values in local_latencies.items():
+                latencies[operation].extend(values)
+            for operation, count in local_misses.items():
+                misses[operation] += count
+            for error, count in local_errors.items():
+                errors[error] += count
+
+    workers = [threading.Thread(target=work, args=(seeds[i],))
+               for i in xrange(threads)]
+    for worker in workers:
+        worker.daemon = True
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return BenchResult(time.time() - started_at, latencies, misses, errors)
+
+
+def make_key(model, index):
+    """The hash key and the range key values of the key of the index."""
+    hash_key = _key_value(model._get_hash_key().data_type, index)
+    if len(model._get_keys()) < 2:
+        return hash_key, None
+    return hash_key, _key_value(model._get_range_key().data_type, 0)
+
+
+def make_item(model, workload, index):
+    """The item of the key of the index with the payload."""
+    hash_key, range_key = make_key(model, index)
+    data = {model._get_hash_key().name: hash_key}
+    if range_key is not None:
+        data[model._get_range_key().name] = range_key
+    name, attr = _payload_attribute(model)
+    if name is not None and workload.item_size:
+        payload = 'x' * workload.item_size
+        if isinstance(attr, StringAttribute):
+            payload = unicode(payload)
+        data[name] = payload
+    return model(**data)
+
+
+def _key_value(data_type, index):
+    if data_type == 'N':
+        # Zero is not a key value to Model._encode_key().
+        return index + 1
+    if data_type == 'B':
+        return 'bench-{0:010d}'.format(index)
+    return u'bench-{0:010d}'.format(index)
+
+
+def _payload_attribute(model):
+    key_names = set(key.name for key in model._get_keys())
+    for name, attr in sorted(model._get_attributes().items()):
+        if name in key_names:
+            continue
+        if type(attr) in (StringAttribute, BinaryAttribute):
+            return name, attr
+    return None, None
+
+
+def _get(model, workload, index):
+    try:
+        model.get_item(*make_key(model, index))
+    except ItemNotFoundException:
+        return False
+    return True
+
+
+def _query(model, workload, index):
+    hash_key, _ = make_key(model, index)
+    condition = {'{0}__eq'.format(model._get_hash_key().name): hash_key}
+    return bool(list(model.query(**condition)))
+
+
+def _put(model, workload, index):
+    model._put_item(make_item(model, workload, index))
+    return True
+
+
+_OPERATIONS = {'get': _get, 'query': _query, 'put': _put}
+
+
+def main(argv=None):
+    from . import init_bynamodb
+    from .manage import _import_model
+    from .settings import conf
+    from .testing import MemoryConnection, SlowConnection
+
+    parser = argparse.ArgumentParser(prog='python -m bynamodb.bench')
+    parser.add_argument('model', help='module.path:Model')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0,
+                        help='seconds to send the requests')
+    parser.add_argument('--operations', type=int,
+                        help='the number of the requests to send')
+    parser.add_argument('--read-ratio', type=float, default=0.9)
+    parser.add_argument('--query-ratio', type=float, default=0.0,
+                        help='ratio of the queries in the reads')
+    parser.add_argument('--keys', type=int, default=10000)
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS,
+                        default='uniform')
+    parser.add_argument('--zipf-exponent', type=float, default=0.99)
+    parser.add_argument('--item-size', type=int, default=100)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--populate', action='store_true',
+                        help='put the items of all the keys first')
+    parser.add_argument('--memory', action='store_true',
+                        help='keep the table in the memory '
+                             'instead of DynamoDB')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds to delay every request')
+    parser.add_argument('--slow-ratio', type=float, default=0.0)
+    parser.add_argument('--slow-latency', type=float, default=0.0)
+    parser.add_argument('--error-ratio', type=float, default=0.0)
+    parser.add_argument('--json', action='store_true',
+                        help='print the result as JSON')
+    parser.add_argument('--host', help='DynamoDB host')
+    parser.add_argument('--port', type=int, help='DynamoDB port')
+    parser.add_argument('--insecure', action='store_true',
+                        help='connect without SSL')
+    parser.add_argument('--table-prefix', help='prefix of the table names')
+
+    args = parser.parse_args(argv)
+    if not args.duration and args.operations is None:
+        parser.error('--duration or --operations is required')
+    if args.table_prefix is not None:
+        conf.load_settings_from({'TABLE_PREFIX': args.table_prefix})
+    if args.host:
+        init_bynamodb(DYNAMODB_HOST=args.host, DYNAMODB_PORT=args.port,
+                      DYNAMODB_IS_SECURE=not args.insecure)
+
+    model = _import_model(args.model)
+    workload = Workload(read_ratio=args.read_ratio,
+                        query_ratio=args.query_ratio, keys=args.keys,
+                        distribution=args.distribution,
+                        zipf_exponent=args.zipf_exponent,
+                        item_size=args.item_size)
+    if args.memory:
+        model._conn = MemoryConnection()
+        model.create_table()
+    else:
+        model._conn = model._conn or dynamodb2_layer1.DynamoDBConnection()
+    if args.memory or args.populate:
+        populate(model, workload)
+    # The latency is injected after populating, to measure the run only.
+    if args.latency or args.slow_ratio or args.error_ratio:
+        model._conn = SlowConnection(model._conn, latency=args.latency,
+                                     slow_ratio=args.slow_ratio,
+                                     slow_latency=args.slow_latency,
+                                     error_ratio=args.error_ratio,
+                                     seed=args.seed)
+    result = run(model, workload, threads=args.threads,
+                 duration=args.duration, operations=args.operations,
+                 seed=args.seed)
+    if args.json:
+        print(json.dumps(result.as_dict(), sort_keys=True))
+    else:
+        print(result.report())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from .lazy import dynamodb_types
+
+
+class QueryCache(object):
+    """Size-bounded cache of the query and scan results with TTL eviction.
+
+    The results are keyed by the table and the normalized parameters of
+    the request, which are the key conditions built by
+    :func:`~bynamodb.conditions.build_condition`, the filter expression and
+    its values, the index and so on. A write to the table invalidates
+    the cached queries of the hash key of the written item, and all
+    the cached scans and index queries of the table.
+
+    .. code-block:: python
+
+       Post.query_cache = QueryCache(max_size=1000, ttl=30)
+
+    :param max_size: the maximum number of the cached results.
+                     The least recently used result is evicted first.
+    :type max_size: :class:`int`
+    :param ttl: seconds to keep the cached result.
+    :type ttl: :class:`float`
+
+    """
+
+    def __init__(self, max_size=1024, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def make_key(self, table_name, operation, kwargs):
+        """Normalize the parameters of the request to the cache key."""
+        return table_name, operation, json.dumps(kwargs, sort_keys=True)
+
+    def get(self, key):
+        """Get the cached pages of the key, or `None` if missing."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry.expires_at <= time.time():
+                self.misses += 1
+                return None
+            self._entries[key] = entry
+            self.hits += 1
+            return entry.pages
+
+    def generation(self, table_name):
+        """The number of the invalidations of the table, to be passed to
+        :meth:`set` of the pages requested after it.
+
+        """
+        with self._lock:
+            return self._generations.get(table_name, 0)
+
+    def set(self, key, pages, partition=None, generation=None):
+        """Cache the pages of the key.
+
+        :param partition: the hash key name and its raw value if the query
+                          reads a partition of the table.
+        :type partition: :class:`tuple`
+        :param generation: the :meth:`generation` of the table before
+                           the pages were requested. The pages are not
+                           cached if the table has been written since.
+        :type generation: :class:`int`
+
+        """
+        if partition is not None:
+            name, value = partition
+            partition = name, dynamodb_types.Dynamizer().decode(value)
+        with self._lock:
+            if generation is not None and \
+                    generation != self._generations.get(key[0], 0):
+                return
+            self._entries.pop(key, None)
+            self._entries[key] = _Entry(pages, time.time() + self.ttl,
+                                        partition)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, table_name, *raw_items):
+        """Invalidate the cached results affected by the writes to the table.
+
+        :param raw_items: the raw items or keys written. All the cached
+                          results of the table are invalidated if omitted.
+
+        """
+        dynamizer = dynamodb_types.Dynamizer()
+        written = {}
+
+        def is_written(partition):
+            # The decoded values of the hash key name in the items written,
+            # or `None` if an item doesn't have it.
+            name, value = partition
+            if name not in written:
+                values = set()
+                for raw_item in raw_items:
+                    if name not in raw_item:
+                        values = None
+                        break
+                    values.add(dynamizer.decode(raw_item[name]))
+                written[name] = values
+            return written[name] is None or value in written[name]
+
+        with self._lock:
+            self._generations[table_name] = \
+                self._generations.get(table_name, 0) + 1
+            for key, entry in self._entries.items():
+                if key[0] != table_name:
+                    continue
+                if raw_items and entry.partition is not None and \
+                        not is_written(entry.partition):
+                    continue
+                del self._entries[key]
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """The statistics of the cache as :class:`dict`."""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': float(self.hits) / requests if requests else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+class _Entry(object):
+
+    __slots__ = ('pages', 'expires_at', 'partition')
+
+    def __init__(self, pages, expires_at, partition):
+        self.pages = pages
+        self.expires_at = expires_at
+        self.partition = partition
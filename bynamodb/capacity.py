@@ -0,0 +1,167 @@
+import base64
+import math
+import threading
+from collections import namedtuple
+
+
+#: (:class:`int`) The maximum size of an item in bytes.
+MAX_ITEM_SIZE = 400 * 1024
+
+#: (:class:`int`) The bytes of an item read by a read capacity unit.
+READ_UNIT_SIZE = 4 * 1024
+
+#: (:class:`int`) The bytes of an item written by a write capacity unit.
+WRITE_UNIT_SIZE = 1024
+
+
+#: The estimated size and capacity units of an item.
+#: ``read_units`` is for a strongly consistent read, and the eventually
+#: consistent read costs half. ``index_write_units`` is the write capacity
+#: units consumed by each index the item is projected to, and
+#: ``write_units`` includes them.
+ItemCost = namedtuple('ItemCost', [
+    'size', 'read_units', 'write_units', 'index_write_units'
+])
+
+
+def item_size(raw_item):
+    """The size in bytes of the raw item as DynamoDB counts it."""
+    return sum(_utf8_size(name) + value_size(value)
+               for name, value in raw_item.items())
+
+
+def value_size(raw_value):
+    """The size in bytes of the raw attribute value."""
+    value_type, value = next(iter(raw_value.items()))
+    if value_type == 'S':
+        return _utf8_size(value)
+    if value_type == 'N':
+        return _number_size(value)
+    if value_type == 'B':
+        return len(base64.b64decode(value))
+    if value_type == 'SS':
+        return sum(_utf8_size(elem) for elem in value)
+    if value_type == 'NS':
+        return sum(_number_size(elem) for elem in value)
+    if value_type == 'BS':
+        return sum(len(base64.b64decode(elem)) for elem in value)
+    if value_type == 'L':
+        return 3 + sum(1 + value_size(elem) for elem in value)
+    if value_type == 'M':
+        return 3 + sum(1 + _utf8_size(name) + value_size(elem)
+                       for name, elem in value.items())
+    # BOOL and NULL
+    return 1
+
+
+def read_units(size, consistent=True):
+    """The read capacity units to read an item of the size."""
+    units = max(1, int(math.ceil(float(size) / READ_UNIT_SIZE)))
+    return units if consistent else units / 2.0
+
+
+def write_units(size):
+    """The write capacity units to write an item of the size."""
+    return max(1, int(math.ceil(float(size) / WRITE_UNIT_SIZE)))
+
+
+def estimate(model, raw_item):
+    """Estimate the size and capacity units of the raw item of the model.
+
+    The write to an index is counted if the item has the key attributes of
+    the index. The item is projected to the index as a whole if the
+    projection type is ``ALL``, otherwise only its keys are.
+
+    :returns: :data:`ItemCost`
+
+    """
+    size = item_size(raw_item)
+    table_keys = [key.name for key in model._get_keys()]
+    index_write_units = {}
+    for index in model._get_indexes():
+        index_keys = [name for name, _ in index._key_types]
+        if not all(name in raw_item for name in index_keys):
+            continue
+        if index.projection_type == 'ALL':
+            projected_size = size
+        else:
+            projected_size = item_size(dict(
+                (name, raw_item[name]) for name in set(table_keys + index_keys)
+            ))
+        index_write_units[index._get_index_name()] = write_units(
+            projected_size)
+    return ItemCost(
+        size=size,
+        read_units=read_units(size),
+        write_units=write_units(size) + sum(index_write_units.values()),
+        index_write_units=index_write_units
+    )
+
+
+class CostAggregator(object):
+    """Aggregate the estimated costs of the items written per model.
+
+    .. code-block:: python
+
+       Model.cost_aggregator = CostAggregator()
+       # ... after writes
+       Model.cost_aggregator.report()
+
+    """
+
+    def __init__(self):
+        self._aggregates = {}
+        self._lock = threading.Lock()
+
+    def add(self, model, cost):
+        """Add the :data:`ItemCost` of an item of the model."""
+        with self._lock:
+            aggregate = self._aggregates.setdefault(model.__name__, {
+                'items': 0,
+                'size': 0,
+                'max_size': 0,
+                'read_units': 0,
+                'write_units': 0,
+                'index_write_units': {}
+            })
+            aggregate['items'] += 1
+            aggregate['size'] += cost.size
+            aggregate['max_size'] = max(aggregate['max_size'], cost.size)
+            aggregate['read_units'] += cost.read_units
+            aggregate['write_units'] += cost.write_units
+            index_write_units = aggregate['index_write_units']
+            for index_name, units in cost.index_write_units.items():
+                index_write_units[index_name] = \
+                    index_write_units.get(index_name, 0) + units
+
+    def report(self):
+        """The aggregated costs of each model name as :class:`dict`.
+        The average size of the items is included.
+
+        """
+        with self._lock:
+            report = {}
+            for name, aggregate in self._aggregates.items():
+                report[name] = dict(
+                    aggregate,
+                    index_write_units=dict(aggregate['index_write_units']),
+                    average_size=float(aggregate['size']) / aggregate['items']
+                )
+            return report
+
+    def clear(self):
+        with self._lock:
+            self._aggregates.clear()
+
+
+def _utf8_size(value):
+    if isinstance(value, unicode):
+        return len(value.encode('utf-8'))
+    return len(value)
+
+
+def _number_size(value):
+    # A number takes a byte per two significant digits and a byte more.
+    digits = value.lstrip('-').lower().split('e')[0].replace('.', '')
+    digits = digits.strip('0') or '0'
+    return int(math.ceil(len(digits) / 2.0)) + 1
@@ -1,6 +1,9 @@
-from boto.dynamodb.types import Dynamizer
+from operator import ge, gt, le, lt
 
 from .exceptions import ConditionNotRecognizedException
+from .lazy import dynamodb_types
+from .predicates import (begins_with, compare, contains, equals,
+                         value_getter)
 
 
 CONDITIONS = {
@@ -34,7 +37,7 @@ def build_condition(filter_map, using=CONDITIONS):
         return
 
     filters = {}
-    dynamizer = Dynamizer()
+    dynamizer = dynamodb_types.Dynamizer()
 
     for field_and_op, value in filter_map.items():
         field_bits = field_and_op.split('__')
@@ -88,3 +91,61 @@ def build_condition(filter_map, using=CONDITIONS):
         # Finally, insert it into the filters.
         filters[fieldname] = lookup
     return filters
+
+
+def compile_condition(filters, raw=False, conditional_operator='AND'):
+    """Compile the conditions built by :func:`build_condition` to
+    the predicate function, which evaluates an item in memory with
+    the semantics of the conditions.
+
+    :param filters: the conditions built by :func:`build_condition`.
+    :type filters: :class:`collections.Mapping`
+    :param raw: the items are the raw items from
+                :class:`boto.dynamodb2.layer1.DynamoDBConnection` if `True`.
+                Otherwise the items are model objects or :class:`dict` of
+                the decoded values.
+    :type raw: :class:`bool`
+    :param conditional_operator: ``AND`` or ``OR`` to combine
+                                 the conditions.
+    :returns: the function taking an item and returning :class:`bool`.
+
+    """
+    get_value = value_getter(raw)
+    dynamizer = dynamodb_types.Dynamizer()
+    checks = []
+    for fieldname, lookup in (filters or {}).items():
+        op = lookup['ComparisonOperator']
+        try:
+            check = _CHECKS[op]
+        except KeyError:
+            raise ConditionNotRecognizedException(
+                "Operator '%s' is not recognized." % op)
+        args = [dynamizer.decode(value)
+                for value in lookup.get('AttributeValueList', [])]
+        checks.append((fieldname, check, args))
+
+    combine = any if conditional_operator == 'OR' else all
+
+    def predicate(item):
+        return combine(check(get_value(item, fieldname), args)
+                       for fieldname, check, args in checks)
+    return predicate
+
+
+_CHECKS = {
+    'EQ': lambda value, args: equals(value, args[0]),
+    'NE': lambda value, args: not equals(value, args[0]),
+    'LE': lambda value, args: compare(le, value, args[0]),
+    'LT': lambda value, args: compare(lt, value, args[0]),
+    'GE': lambda value, args: compare(ge, value, args[0]),
+    'GT': lambda value, args: compare(gt, value, args[0]),
+    'NULL': lambda value, args: value is None,
+    'NOT_NULL': lambda value, args: value is not None,
+    'CONTAINS': lambda value, args: contains(value, args[0]),
+    'NOT_CONTAINS': lambda value, args: (value is not None and
+                                         not contains(value, args[0])),
+    'BEGINS_WITH': lambda value, args: begins_with(value, args[0]),
+    'IN': lambda value, args: any(equals(value, arg) for arg in args),
+    'BETWEEN': lambda value, args: (compare(ge, value, args[0]) and
+                                    compare(le, value, args[1])),
+}
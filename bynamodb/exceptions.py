@@ -11,3 +11,39 @@ class ItemNotFoundException(Exception):
 class ConditionNotRecognizedException(Exception):
     """Raised when the condition is not found"""
     pass
+
+
+class ItemTooLargeException(Exception):
+    """Raised when the item is larger than the maximum item size"""
+    pass
+
+
+class DeadlineExceededException(Exception):
+    """Raised when a request has not responded within its deadline"""
+    pass
+
+
+class WriteBufferFullException(Exception):
+    """Raised when the write buffer has no space within its timeout"""
+    pass
+
+
+class SchemaMismatchException(Exception):
+    """Raised when the serialized item doesn't match the model schema"""
+    pass
+
+
+class ConditionFailedException(Exception):
+    """Raised when the condition of a conditional write is not met"""
+    pass
+
+
+class VersionConflictException(ConditionFailedException):
+    """Raised when the item was written by another writer since it was read"""
+    pass
+
+
+class UnprocessedItemsException(Exception):
+    """Raised when a batch request still has unprocessed items after
+    its retries"""
+    pass
@@ -1,4 +1,7 @@
-from boto.dynamodb.types import Dynamizer
+from operator import ge, gt, le, lt
+
+from .lazy import dynamodb_types
+from .predicates import compare, contains, equals, value_getter
 
 
 class Operator(object):
@@ -15,6 +18,23 @@ class Operator(object):
     def _build_exp(self, attr_values):
         raise NotImplemented
 
+    def compile(self, raw=False):
+        """Compile the operator to the predicate function, which evaluates
+        an item in memory with the semantics of the filter expression.
+
+        :param raw: the items are the raw items from
+                    :class:`boto.dynamodb2.layer1.DynamoDBConnection`
+                    if `True`. Otherwise the items are model objects or
+                    :class:`dict` of the decoded values.
+        :type raw: :class:`bool`
+        :returns: the function taking an item and returning :class:`bool`.
+
+        """
+        return self._compile(value_getter(raw))
+
+    def _compile(self, get_value):
+        raise NotImplementedError
+
     def __and__(self, operator):
         """Compose the operator with another operator using `and`"""
         return AND(self, operator)
@@ -27,7 +47,7 @@ class Operator(object):
 class AttributeValues(object):
     def __init__(self):
         self.data = {}
-        self._dynamizer = Dynamizer()
+        self._dynamizer = dynamodb_types.Dynamizer()
         self._current_key = 1
 
     def insert(self, value):
@@ -56,14 +76,27 @@ class LogicalOperator(Operator):
 class OR(LogicalOperator):
     operator = 'or'
 
+    def _compile(self, get_value):
+        predicate1 = self.op1._compile(get_value)
+        predicate2 = self.op2._compile(get_value)
+        return lambda item: predicate1(item) or predicate2(item)
+
 
 class AND(LogicalOperator):
     operator = 'and'
 
+    def _compile(self, get_value):
+        predicate1 = self.op1._compile(get_value)
+        predicate2 = self.op2._compile(get_value)
+        return lambda item: predicate1(item) and predicate2(item)
+
 
 class ComparisonOperator(Operator):
     operator = None
 
+    # The function comparing the value of the attribute and the comparator.
+    compare = None
+
     def __init__(self, attr_name, comparator):
         self.attr_name = attr_name
         self.comparator = comparator
@@ -74,25 +107,41 @@ class ComparisonOperator(Operator):
             self.attr_name, self.operator, key
         )
 
+    def _compile(self, get_value):
+        attr_name = self.attr_name
+        comparator = self.comparator
+        op = self.compare
+        return lambda item: compare(op, get_value(item, attr_name),
+                                    comparator)
+
 
 class EQ(ComparisonOperator):
     operator = '='
 
+    def _compile(self, get_value):
+        attr_name = self.attr_name
+        comparator = self.comparator
+        return lambda item: equals(get_value(item, attr_name), comparator)
+
 
 class GT(ComparisonOperator):
     operator = '>'
+    compare = gt
 
 
 class GTE(ComparisonOperator):
     operator = '>='
+    compare = ge
 
 
 class LT(ComparisonOperator):
     operator = '<'
+    compare = lt
 
 
 class LTE(ComparisonOperator):
     operator = '<='
+    compare = le
 
 
 class Contains(Operator):
@@ -103,3 +152,30 @@ class Contains(Operator):
     def _build_exp(self, attr_values):
         key = attr_values.insert(self.operand)
         return 'contains({0}, {1})'.format(self.path, key)
+
+    def _compile(self, get_value):
+        path = self.path
+        operand = self.operand
+        return lambda item: contains(get_value(item, path), operand)
+
+
+class AttributeExists(Operator):
+    function = 'attribute_exists'
+
+    def __init__(self, path):
+        self.path = path
+
+    def _build_exp(self, attr_values):
+        return '{0}({1})'.format(self.function, self.path)
+
+    def _compile(self, get_value):
+        path = self.path
+        return lambda item: get_value(item, path) is not None
+
+
+class AttributeNotExists(AttributeExists):
+    function = 'attribute_not_exists'
+
+    def _compile(self, get_value):
+        path = self.path
+        return lambda item: get_value(item, path) is None
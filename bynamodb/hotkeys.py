@@ -0,0 +1,209 @@
+import random
+import threading
+from collections import namedtuple
+
+from .lazy import dynamodb2_exceptions
+
+
+#: The access frequency of a hash key. ``count`` is estimated and
+#: overestimates the true count by at most ``error``.
+HotKey = namedtuple('HotKey', ['table_name', 'hash_key', 'count', 'error'])
+
+
+class HotKeySampler(object):
+    """Sample the hash keys accessed through the models and find the most
+    frequent ones, the candidates of the hot partitions.
+
+    The frequencies are counted in a Space-Saving sketch per table, which
+    keeps at most ``capacity`` keys, so the memory stays bounded however
+    many keys are accessed. The accesses failed by throttling are counted
+    in their own sketch.
+
+    .. code-block:: python
+
+       Model.key_sampler = HotKeySampler(capacity=1000, sample_rate=0.1)
+       # ...
+       Model.key_sampler.top(10)
+
+    :param capacity: the number of the keys counted per table.
+    :type capacity: :class:`int`
+    :param sample_rate: the ratio of the accesses to record.
+                        The counts are scaled up by it.
+    :type sample_rate: :class:`float`
+
+    """
+
+    def __init__(self, capacity=100, sample_rate=1.0):
+        self.capacity = capacity
+        self.sample_rate = sample_rate
+        self._accesses = {}
+        self._throttles = {}
+        self._lock = threading.Lock()
+
+    def access(self, table_name, hash_key):
+        """The context of an access to the hash key of the table.
+        The access is recorded, and recorded as throttled if the context
+        raises :exc:`ProvisionedThroughputExceededException`.
+
+        :param table_name: the table name, or the table name and the index
+                           name joined by a dot for an index.
+
+        """
+        return _Access(self, table_name, hash_key)
+
+    def record(self, table_name, hash_key):
+        """Record an access to the hash key of the table."""
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+        self._add(self._accesses, table_name, hash_key)
+
+    def record_throttle(self, table_name, hash_key):
+        """Record a throttled access to the hash key of the table.
+        Throttled accesses are always recorded.
+
+        """
+        self._add(self._throttles, table_name, hash_key)
+
+    def top(self, k=10, table_name=None):
+        """The ``k`` most frequently accessed hash keys.
+
+        :param table_name: only the keys of the table if given.
+        :returns: :class:`list` of :data:`HotKey`.
+
+        """
+        return self._top(self._accesses, k, table_name, 1 / self.sample_rate)
+
+    def top_throttled(self, k=10, table_name=None):
+        """The ``k`` most frequently throttled hash keys.
+
+        :returns: :class:`list` of :data:`HotKey`.
+
+        """
+        return self._top(self._throttles, k, table_name, 1)
+
+    def clear(self):
+        with self._lock:
+            self._accesses.clear()
+            self._throttles.clear()
+
+    def _add(self, sketches, table_name, hash_key):
+        with self._lock:
+            sketch = sketches.get(table_name)
+            if sketch is None:
+                sketch = sketches[table_name] = _SpaceSaving(self.capacity)
+            sketch.add(hash_key)
+
+    def _top(self, sketches, k, table_name, scale):
+        with self._lock:
+            hot_keys = [
+                HotKey(name, hash_key, int(count * scale), int(error * scale))
+                for name, sketch in sketches.items()
+                if table_name is None or name == table_name
+                for hash_key, count, error in sketch.items()
+            ]
+        hot_keys.sort(key=lambda hot_key: hot_key.count, reverse=True)
+        return hot_keys[:k]
+
+
+class _SpaceSaving(object):
+    """Space-Saving heavy hitters sketch.
+
+    A new key replaces the least frequent key when the sketch is full, and
+    takes over its count as the error. The keys are kept in the buckets of
+    their counts linked in the order of the counts, the stream summary, so
+    an access takes constant time.
+
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        # The key to its bucket and error.
+        self._entries = {}
+        # The bucket of the lowest count.
+        self._min = None
+
+    def add(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            if len(self._entries) < self.capacity:
+                bucket = self._min
+                if bucket is None or bucket.count != 1:
+                    bucket = _Bucket(1)
+                    bucket.next = self._min
+                    if self._min is not None:
+                        self._min.prev = bucket
+                    self._min = bucket
+                bucket.keys.add(key)
+                self._entries[key] = [bucket, 0]
+                return
+            bucket = self._min
+            del self._entries[bucket.keys.pop()]
+            bucket.keys.add(key)
+            entry = self._entries[key] = [bucket, bucket.count]
+        self._increment(key, entry)
+
+    def items(self):
+        """Iterate the keys with their counts and errors."""
+        for key, (bucket, error) in self._entries.items():
+            yield key, bucket.count, error
+
+    def _increment(self, key, entry):
+        bucket = entry[0]
+        following = bucket.next
+        if following is None or following.count != bucket.count + 1:
+            following = _Bucket(bucket.count + 1)
+            following.prev, following.next = bucket, bucket.next
+            if bucket.next is not None:
+                bucket.next.prev = following
+            bucket.next = following
+        following.keys.add(key)
+        entry[0] = following
+        bucket.keys.discard(key)
+        if not bucket.keys:
+            if bucket.prev is None:
+                self._min = bucket.next
+            else:
+                bucket.prev.next = bucket.next
+            bucket.next.prev = bucket.prev
+
+
+class _Bucket(object):
+
+    __slots__ = ('count', 'keys', 'prev', 'next')
+
+    def __init__(self, count):
+        self.count = count
+        self.keys = set()
+        self.prev = None
+        self.next = None
+
+
+class _Access(object):
+
+    def __init__(self, sampler, table_name, hash_key):
+        self.sampler = sampler
+        self.table_name = table_name
+        self.hash_key = hash_key
+
+    def __enter__(self):
+        self.sampler.record(self.table_name, self.hash_key)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            return False
+        throttled = dynamodb2_exceptions.ProvisionedThroughputExceededException
+        if issubclass(exc_type, throttled):
+            self.sampler.record_throttle(self.table_name, self.hash_key)
+        return False
+
+
+class _NoSampling(object):
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NO_SAMPLING = _NoSampling()
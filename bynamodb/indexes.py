@@ -1,3 +1,6 @@
+from .lazy import dynamodb2_fields
+
+
 class Index(object):
     """Declare the index of the model as a class."""
 
@@ -14,18 +17,30 @@ class Index(object):
     #: (:class:`str`) The projection type of the index.
     projection_type = None
 
+    _key_types = None
     _keys = None
 
     @classmethod
     def schema(cls):
         return {
             'IndexName': cls._get_index_name(),
-            'KeySchema': [key.schema() for key in cls._keys],
+            'KeySchema': [key.schema() for key in cls._get_keys()],
             'Projection': {
                 'ProjectionType': cls.projection_type
             }
         }
 
+    @classmethod
+    def _get_keys(cls):
+        if cls._keys:
+            return cls._keys
+        name, key_type = cls._key_types[0]
+        cls._keys = [dynamodb2_fields.HashKey(name, key_type)]
+        if len(cls._key_types) > 1:
+            name, key_type = cls._key_types[1]
+            cls._keys.append(dynamodb2_fields.RangeKey(name, key_type))
+        return cls._keys
+
     @classmethod
     def _get_index_name(cls):
         return cls.index_name or cls.__name__
@@ -0,0 +1,100 @@
+import importlib
+import sys
+
+
+class LazyModule(object):
+    """The module imported on the first access to its attributes.
+
+    boto takes the most of the time importing bynamodb, so its modules are
+    accessed through this until a request is actually made. The attributes
+    are cached on the first access, so the later accesses cost as much as
+    the attributes of a module.
+
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._hooks = []
+
+    def __getattr__(self, attr):
+        if attr.startswith('__'):
+            raise AttributeError(attr)
+        value = getattr(self.load(), attr)
+        setattr(self, attr, value)
+        return value
+
+    def load(self):
+        """Import the module and run the hooks waiting for it."""
+        module = importlib.import_module(self._name)
+        while self._hooks:
+            self._hooks.pop(0)(module)
+        return module
+
+    def is_loaded(self):
+        return self._name in sys.modules
+
+    def on_load(self, hook):
+        """Call the hook with the module as soon as it is imported, either
+        through this or by any other import, or right away if it is
+        imported already.
+
+        """
+        if self.is_loaded():
+            hook(self.load())
+        else:
+            self._hooks.append(hook)
+            _import_hook.watch(self)
+
+
+class _ImportHook(object):
+    """The :pep:`302` finder which loads the watched lazy modules as soon
+    as anything imports them, so their hooks run before the importer gets
+    the module.
+
+    """
+
+    def __init__(self):
+        self._modules = {}
+        self._importing = set()
+
+    def watch(self, lazy_module):
+        self._modules[lazy_module._name] = lazy_module
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def find_module(self, fullname, path=None):
+        if fullname in self._modules and fullname not in self._importing:
+            return self
+
+    def load_module(self, fullname):
+        self._importing.add(fullname)
+        try:
+            importlib.import_module(fullname)
+        finally:
+            self._importing.discard(fullname)
+        lazy_module = self._modules.pop(fullname)
+        if not self._modules:
+            sys.meta_path.remove(self)
+        return lazy_module.load()
+
+
+_import_hook = _ImportHook()
+
+
+#: :mod:`boto.dynamodb.types`
+dynamodb_types = LazyModule('boto.dynamodb.types')
+
+#: :mod:`boto.dynamodb2.fields`
+dynamodb2_fields = LazyModule('boto.dynamodb2.fields')
+
+#: :mod:`boto.dynamodb2.layer1`
+dynamodb2_layer1 = LazyModule('boto.dynamodb2.layer1')
+
+#: :mod:`boto.dynamodb2.exceptions`
+dynamodb2_exceptions = LazyModule('boto.dynamodb2.exceptions')
+
+#: :mod:`boto.exception`
+boto_exception = LazyModule('boto.exception')
+
+#: :mod:`multiprocessing`, which only the parallel scans use
+multiprocessing = LazyModule('multiprocessing')
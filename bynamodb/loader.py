@@ -0,0 +1,137 @@
+import threading
+
+from .batch import (MAX_GET_KEYS, _group_by_connection, _key_id,
+                    get_raw_items)
+from .exceptions import ItemNotFoundException
+
+
+class ItemLoader(object):
+    """Coalesce and batch the concurrent :meth:`Model.get_item` calls.
+
+    Identical keys requested while a request for the key is in flight share
+    the request. Distinct keys requested within the ``window`` are merged
+    into one BatchGetItem request, and each item is routed back to its caller.
+    A loader can be shared by several models, and the keys of a batch are
+    requested once per connection of the models.
+
+    .. code-block:: python
+
+       User.loader = Post.loader = ItemLoader(window=0.002, max_keys=100)
+
+    :param window: seconds to wait for other keys before sending the batch.
+    :type window: :class:`float`
+    :param max_keys: the batch is sent as soon as it has this many keys.
+    :type max_keys: :class:`int`
+
+    """
+
+    def __init__(self, window=0.002, max_keys=MAX_GET_KEYS):
+        if not 0 < max_keys <= MAX_GET_KEYS:
+            raise ValueError(
+                'max_keys must be between 1 and {0}'.format(MAX_GET_KEYS))
+        self.window = window
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._batch = []
+        self._timer = None
+
+    def load(self, model, hash_key, range_key=None):
+        """Get the item of the model through the loader.
+
+        :raises: :class:`~bynamodb.exceptions.ItemNotFoundException`
+                 if the item is not found.
+
+        """
+        key = model._encode_key(hash_key, range_key)
+        ident = (model.get_table_name(), _key_id(key))
+        batch = None
+        with self._lock:
+            pending = self._in_flight.get(ident)
+            if pending is None:
+                pending = self._in_flight[ident] = _PendingItem()
+                self._batch.append((model, key, ident))
+                if len(self._batch) >= self.max_keys:
+                    batch = self._take_batch()
+                elif self._timer is None:
+                    self._timer = threading.Timer(self.window, self._flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if batch:
+            self._dispatch(batch)
+        return model.from_raw_data(pending.wait())
+
+    def _take_batch(self):
+        batch, self._batch = self._batch, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _flush(self):
+        with self._lock:
+            batch = self._take_batch()
+        if batch:
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        # The models may use different connections or call policies, so
+        # the keys are requested once per connection.
+        try:
+            groups = _group_by_connection(batch)
+        except Exception as e:
+            self._resolve(batch, {}, e)
+            return
+        for conn, entries in groups:
+            self._dispatch_to(conn, entries)
+
+    def _dispatch_to(self, conn, batch):
+        request_items = {}
+        models = {}
+        for model, key, ident in batch:
+            table_name = ident[0]
+            request_items.setdefault(table_name, {'Keys': []})
+            request_items[table_name]['Keys'].append(key)
+            models[table_name] = model
+
+        results = {}
+        error = None
+        try:
+            responses = get_raw_items(conn, request_items)
+            for table_name, items in responses.items():
+                key_names = [k.name for k in models[table_name]._get_keys()]
+                for raw_item in items:
+                    key = dict((name, raw_item[name]) for name in key_names)
+                    results[(table_name, _key_id(key))] = raw_item
+        except Exception as e:
+            error = e
+        self._resolve(batch, results, error)
+
+    def _resolve(self, batch, results, error):
+        with self._lock:
+            pendings = [self._in_flight.pop(ident) for _, _, ident in batch]
+        for (_, _, ident), pending in zip(batch, pendings):
+            pending.resolve(results.get(ident), error)
+
+
+class _PendingItem(object):
+    """The result of a key shared by the callers waiting for it."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._raw_item = None
+        self._error = None
+
+    def resolve(self, raw_item, error=None):
+        self._raw_item = raw_item
+        self._error = error
+        self._event.set()
+
+    def wait(self):
+        self._event.wait()
+        if self._error is not None:
+            raise self._error
+        if self._raw_item is None:
+            raise ItemNotFoundException
+        return self._raw_item
+
@@ -1,9 +1,31 @@
 # -*-coding:utf8-*-
+import argparse
+import gzip
+import importlib
 import inspect
+import itertools
 import json
 import os
+import struct
+import threading
 from boto.dynamodb2.layer1 import DynamoDBConnection
+from bynamodb import init_bynamodb
+from bynamodb.batch import chunks, put_raw_items
 from bynamodb.model import Model
+from bynamodb.results import iter_parallel
+from bynamodb.serialization import dumps_value, loads_value
+from bynamodb.settings import conf
+
+
+#: The formats of the exported segment files.
+#: ``jsonl`` is a raw item in JSON per line, and ``binary`` is a raw item
+#: serialized by :func:`~bynamodb.serialization.dumps_value` and prefixed
+#: with its length per record. Both have only data, so importing a file
+#: never runs code.
+EXPORT_FORMATS = ('jsonl', 'binary')
+
+EXPORT_CHECKPOINT = 'export.checkpoint.json'
+IMPORT_CHECKPOINT = 'import.checkpoint.json'
 
 
 def init_tables(models_module):
@@ -26,3 +48,317 @@ def load_fixture(model, fixture):
     with open(os.path.join('fixtures', '%s.json' % fixture), 'r') as f:
         for row in json.loads(f.read()):
             model.put_item(**row)
+
+
+def export_table(model, path, total_segments=1, format='jsonl',
+                 compress=False):
+    """Export the items of the table to the directory as they are stored.
+
+    Each segment of the parallel scan is written to its own file, and
+    the progress of the segments is saved in the checkpoint after every
+    page. Running the export again with the same parameters resumes it
+    from the checkpoint.
+
+    :param model: the model of the table to export.
+    :param path: the directory to write the files.
+    :param total_segments: the number of segments to scan in parallel.
+    :param format: one of :data:`EXPORT_FORMATS`.
+    :param compress: gzip the files if `True`.
+    :returns: the number of items exported by this run.
+
+    """
+    if format not in EXPORT_FORMATS:
+        raise ValueError('Unknown export format: {0}'.format(format))
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    params = {
+        'table': model.get_table_name(),
+        'total_segments': total_segments,
+        'format': format,
+        'compress': compress
+    }
+    checkpoint = _Checkpoint(
+        os.path.join(path, EXPORT_CHECKPOINT), params, total_segments,
+        {'offset': 0, 'last_key': None, 'count': 0, 'done': False}
+    )
+
+    def export_segment(segment):
+        state = checkpoint.segments[segment]
+        if state['done']:
+            return
+        file_path = os.path.join(
+            path, _segment_file_name(segment, format, compress))
+        with open(file_path, 'ab') as f:
+            # Drop what was written after the last checkpoint.
+            f.truncate(state['offset'])
+            result_set = model.scan(segment=segment,
+                                    total_segments=total_segments)
+            for result in result_set.pages(state['last_key']):
+                items = result.get('Items', [])
+                _write_records(f, items, format, compress)
+                f.flush()
+                os.fsync(f.fileno())
+                last_key = result.get('LastEvaluatedKey')
+                checkpoint.update(segment, offset=f.tell(), last_key=last_key,
+                                  count=state['count'] + len(items),
+                                  done=not last_key)
+                yield len(items)
+
+    return sum(iter_parallel(export_segment, range(total_segments)))
+
+
+def import_table(model, path, checkpoint_interval=1000):
+    """Import the items exported by :func:`export_table` to the table.
+
+    The items are written in batches, and the number of items imported from
+    each segment is saved in the checkpoint every ``checkpoint_interval``
+    items. Running the import again resumes it from the checkpoint, and
+    raises :exc:`ValueError` if the directory was exported again with
+    other parameters or items since.
+    The items are restored as they were exported, so the versions of
+    a :class:`~bynamodb.attributes.VersionAttribute` are written as they
+    are without being checked.
+
+    :param model: the model of the table to import to.
+    :param path: the directory of the exported files.
+    :returns: the number of items imported by this run.
+
+    """
+    with open(os.path.join(path, EXPORT_CHECKPOINT)) as f:
+        export = json.load(f)
+    if not all(state['done'] for state in export['segments']):
+        raise ValueError('The export in {0} is not complete'.format(path))
+    format = export['params']['format']
+    compress = export['params']['compress']
+    total_segments = export['params']['total_segments']
+    # The counts of each segment are only valid for the export they were
+    # taken from, so an import of another export doesn't resume.
+    params = {
+        'table': model.get_table_name(),
+        'total_segments': total_segments,
+        'format': format,
+        'compress': compress,
+        'exported': [state['count'] for state in export['segments']]
+    }
+    checkpoint = _Checkpoint(
+        os.path.join(path, IMPORT_CHECKPOINT), params, total_segments,
+        {'count': 0, 'done': False}
+    )
+    conn = model._get_connection()
+    table_name = model.get_table_name()
+
+    def import_segment(segment):
+        state = checkpoint.segments[segment]
+        if state['done']:
+            return
+        file_path = os.path.join(
+            path, _segment_file_name(segment, format, compress))
+        records = itertools.islice(
+            _read_records(file_path, format, compress), state['count'], None)
+        for chunk in chunks(records, checkpoint_interval):
+            for item in chunk:
+                model._validate_item(item)
+            put_raw_items(conn, table_name, chunk)
+            checkpoint.update(segment, count=state['count'] + len(chunk))
+            yield len(chunk)
+        checkpoint.update(segment, done=True)
+
+    count = sum(iter_parallel(import_segment, range(total_segments)))
+    model._written()
+    return count
+
+
+def copy_table(source, target, total_segments=1, transform=None,
+               checkpoint_path=None):
+    """Copy the items of the source table to the target table.
+
+    The items are written as they are scanned or transformed, so the
+    versions of a :class:`~bynamodb.attributes.VersionAttribute` are
+    copied without being checked.
+
+    :param source: the model of the table to copy from.
+    :param target: the model of the table to copy to.
+    :param total_segments: the number of segments to scan in parallel.
+    :param transform: the function taking a raw item of the source and
+                      returning the raw item to put to the target.
+                      The item is skipped if it returns `None`.
+    :param checkpoint_path: the file to save the progress of each segment.
+                            Copying again with the same parameters resumes
+                            from it.
+    :returns: the number of items copied by this run.
+
+    """
+    params = {
+        'source': source.get_table_name(),
+        'target': target.get_table_name(),
+        'total_segments': total_segments
+    }
+    checkpoint = _Checkpoint(checkpoint_path, params, total_segments,
+                             {'last_key': None, 'count': 0, 'done': False})
+    conn = target._get_connection()
+    table_name = target.get_table_name()
+
+    def copy_segment(segment):
+        state = checkpoint.segments[segment]
+        if state['done']:
+            return
+        result_set = source.scan(segment=segment,
+                                 total_segments=total_segments)
+        for result in result_set.pages(state['last_key']):
+            items = result.get('Items', [])
+            if transform is not None:
+                items = [item for item in map(transform, items)
+                         if item is not None]
+            for item in items:
+                target._validate_item(item)
+            count = put_raw_items(conn, table_name, items)
+            last_key = result.get('LastEvaluatedKey')
+            checkpoint.update(segment, last_key=last_key,
+                              count=state['count'] + count,
+                              done=not last_key)
+            yield count
+
+    count = sum(iter_parallel(copy_segment, range(total_segments)))
+    target._written()
+    return count
+
+
+class _Checkpoint(object):
+    """The progress of each segment saved to the file.
+
+    The existing checkpoint is loaded if it was saved with the same
+    parameters.
+
+    """
+
+    def __init__(self, path, params, total_segments, initial):
+        self.path = path
+        self._lock = threading.Lock()
+        state = None
+        if path and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            if state['params'] != params:
+                raise ValueError(
+                    'The checkpoint {0} was saved with the different '
+                    'parameters: {1}'.format(path, state['params']))
+        if state is None:
+            state = {
+                'params': params,
+                'segments': [dict(initial) for _ in range(total_segments)]
+            }
+        self.state = state
+        self.segments = state['segments']
+
+    def update(self, segment, **values):
+        with self._lock:
+            self.segments[segment].update(values)
+            if not self.path:
+                return
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(self.state, f)
+            os.rename(temp_path, self.path)
+
+
+def _segment_file_name(segment, format, compress):
+    name = 'segment-{0:04d}.{1}'.format(segment, format)
+    if compress:
+        name += '.gz'
+    return name
+
+
+def _write_records(f, items, format, compress):
+    if format == 'jsonl':
+        data = ''.join(json.dumps(item) + '\n' for item in items)
+    else:
+        records = [dumps_value(item) for item in items]
+        data = ''.join(struct.pack('>I', len(record)) + record
+                       for record in records)
+    if compress:
+        # Each write is a complete gzip member, so the file can be truncated
+        # to the offset of any checkpoint.
+        gzip_file = gzip.GzipFile(fileobj=f, mode='wb')
+        gzip_file.write(data)
+        gzip_file.close()
+    else:
+        f.write(data)
+
+
+def _read_records(file_path, format, compress):
+    if not os.path.exists(file_path):
+        return
+    f = gzip.open(file_path, 'rb') if compress else open(file_path, 'rb')
+    with f:
+        if format == 'jsonl':
+            for line in f:
+                yield json.loads(line)
+            return
+        while True:
+            header = f.read(4)
+            if not header:
+                break
+            size, = struct.unpack('>I', header)
+            yield loads_value(f.read(size))
+
+
+def _import_model(path):
+    module_name, _, model_name = path.partition(':')
+    return getattr(importlib.import_module(module_name), model_name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bynamodb.manage')
+    parser.add_argument('--host', help='DynamoDB host')
+    parser.add_argument('--port', type=int, help='DynamoDB port')
+    parser.add_argument('--insecure', action='store_true',
+                        help='connect without SSL')
+    parser.add_argument('--table-prefix', help='prefix of the table names')
+    commands = parser.add_subparsers(dest='command')
+
+    export_parser = commands.add_parser(
+        'export', help='export the table to the files')
+    export_parser.add_argument('model', help='module.path:Model')
+    export_parser.add_argument('path', help='directory to write the files')
+    export_parser.add_argument('--segments', type=int, default=1)
+    export_parser.add_argument('--format', choices=EXPORT_FORMATS,
+                               default='jsonl')
+    export_parser.add_argument('--compress', action='store_true')
+
+    import_parser = commands.add_parser(
+        'import', help='import the exported files to the table')
+    import_parser.add_argument('model', help='module.path:Model')
+    import_parser.add_argument('path', help='directory of the exported files')
+
+    copy_parser = commands.add_parser(
+        'copy', help='copy the items of a table to another table')
+    copy_parser.add_argument('source', help='module.path:Model')
+    copy_parser.add_argument('target', help='module.path:Model')
+    copy_parser.add_argument('--segments', type=int, default=1)
+    copy_parser.add_argument('--checkpoint', help='checkpoint file')
+
+    args = parser.parse_args(argv)
+    if args.table_prefix is not None:
+        conf.load_settings_from({'TABLE_PREFIX': args.table_prefix})
+    if args.host:
+        init_bynamodb(DYNAMODB_HOST=args.host, DYNAMODB_PORT=args.port,
+                      DYNAMODB_IS_SECURE=not args.insecure)
+
+    if args.command == 'export':
+        count = export_table(_import_model(args.model), args.path,
+                             total_segments=args.segments,
+                             format=args.format, compress=args.compress)
+        print('{0} items exported'.format(count))
+    elif args.command == 'import':
+        count = import_table(_import_model(args.model), args.path)
+        print('{0} items imported'.format(count))
+    else:
+        count = copy_table(_import_model(args.source),
+                           _import_model(args.target),
+                           total_segments=args.segments,
+                           checkpoint_path=args.checkpoint)
+        print('{0} items copied'.format(count))
+
+
+if __name__ == '__main__':
+    main()
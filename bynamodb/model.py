@@ -1,15 +1,20 @@
 import copy
 
-from boto.dynamodb2.layer1 import DynamoDBConnection
-from boto.dynamodb2.fields import HashKey, RangeKey
-from boto.dynamodb2.types import Dynamizer
-
-from .attributes import Attribute
+from .attributes import Attribute, VersionAttribute
+from .capacity import estimate, item_size
 from .settings import conf
 from .conditions import KEY_CONDITIONS, build_condition
-from .exceptions import NullAttributeException, ItemNotFoundException
+from .exceptions import (NullAttributeException, ItemNotFoundException,
+                         ItemTooLargeException, ConditionFailedException,
+                         VersionConflictException)
+from .filterexps import EQ, AttributeNotExists
+from .hotkeys import NO_SAMPLING
 from .indexes import Index, GlobalIndex
+from .lazy import (dynamodb2_exceptions, dynamodb2_fields,
+                   dynamodb2_layer1, dynamodb_types)
 from .results import ResultSet
+from .serialization import ModelSerializer
+from .session import current_session
 
 
 class ModelMeta(type):
@@ -18,12 +23,40 @@ class ModelMeta(type):
         for name, val in dct.items():
             if isinstance(val, Attribute):
                 val.attr_name = name
-            elif type(val) == type and issubclass(val, Index):
-                val._keys = [HashKey(val.hash_key, dct[val.hash_key].type)]
-                if val.range_key:
-                    val._keys.append(RangeKey(val.range_key,
-                                              dct[val.range_key].type))
-        return super(ModelMeta, mcs).__new__(mcs, clsname, bases, dct)
+        cls = super(ModelMeta, mcs).__new__(mcs, clsname, bases, dct)
+
+        # Collect the schema from the class dictionaries once, instead of
+        # scanning dir(cls) on the first use.
+        attributes = {}
+        indexes = {}
+        for klass in reversed(cls.__mro__):
+            for name, val in vars(klass).items():
+                attributes.pop(name, None)
+                indexes.pop(name, None)
+                if isinstance(val, Attribute):
+                    attributes[name] = val
+                elif type(val) == type and issubclass(val, Index):
+                    indexes[name] = val
+        for name, index in indexes.items():
+            if name not in dct:
+                continue
+            index._key_types = [(index.hash_key,
+                                 attributes[index.hash_key].type)]
+            if index.range_key:
+                index._key_types.append((index.range_key,
+                                         attributes[index.range_key].type))
+            index._keys = None
+        versions = [name for name, val in attributes.items()
+                    if isinstance(val, VersionAttribute)]
+        if len(versions) > 1:
+            raise ValueError(
+                '{0} has more than one VersionAttribute'.format(clsname))
+        cls._attributes = attributes
+        cls._indexes = [indexes[name] for name in sorted(indexes)]
+        cls._version_attribute = versions[0] if versions else None
+        cls._keys = None
+        cls._serializer = None
+        return cls
 
 
 class Model(object):
@@ -39,10 +72,56 @@ class Model(object):
     #: # If omitted, the Model class name will be the table name.
     table_name = None
 
+    #: (:class:`~bynamodb.loader.ItemLoader`) If set, :meth:`get_item`
+    #: calls are coalesced and batched through the loader.
+    loader = None
+
+    #: (:class:`bool`) If `True`, the items loaded from the table keep
+    #: the raw data and decode each attribute on its first access.
+    #: The attributes never accessed are saved back without re-encoding.
+    lazy_decode = False
+
+    #: (:class:`~bynamodb.cache.QueryCache`) If set, the results of
+    #: :meth:`query` and :meth:`scan` are cached, and the writes through
+    #: the model invalidate them.
+    query_cache = None
+
+    #: (:class:`int`) If set, the items larger than this size in bytes are
+    #: rejected before they are written.
+    #: :data:`~bynamodb.capacity.MAX_ITEM_SIZE` is the limit of DynamoDB.
+    max_item_size = None
+
+    #: (:class:`~bynamodb.capacity.CostAggregator`) If set, the estimated
+    #: costs of the items written through the model are aggregated.
+    cost_aggregator = None
+
+    #: (:class:`~bynamodb.hotkeys.HotKeySampler`) If set, the hash keys
+    #: accessed through the model are sampled.
+    key_sampler = None
+
+    #: (:class:`~bynamodb.policy.CallPolicy`) If set, the requests of
+    #: the model are sent with its deadlines, retries and hedging.
+    call_policy = None
+
+    #: (:class:`~bynamodb.writebehind.WriteBehindBuffer`) If set,
+    #: :meth:`save`, :meth:`put_item` and :meth:`delete` return once
+    #: the write is buffered, and the buffer writes it in the background.
+    write_buffer = None
+
+    #: (:class:`~bynamodb.autoscaling.ThroughputTuner`) If set, the capacity
+    #: consumed by the requests of the model is observed to tune
+    #: the provisioned throughput of the table and its indexes.
+    throughput_tuner = None
+
     _attributes = None
     _conn = None
+    # The connection, the tuner and the policy it was wrapped with, and
+    # the wrapped connection.
+    _wrapped_conn = None
     _keys = None
     _indexes = None
+    _serializer = None
+    _version_attribute = None
 
     def __init__(self, **data):
         """An object of the Model represents an item of the model.
@@ -52,28 +131,119 @@ class Model(object):
 
         """
         self._data = {}
+        self._raw = {}
         self._set_defaults()
+        # The names are checked against the attributes ModelMeta collected,
+        # as dir() would list the whole class on every construction.
+        attributes = self._get_attributes()
         for name, value in data.items():
-            if name in dir(self):
+            if name in attributes:
                 setattr(self, name, value)
-            else:
-                continue
 
-    def _set_defaults(self):
+    def _set_defaults(self, exclude=()):
         for attr in self._get_attributes().values():
-            if attr.default is not None:
+            if attr.default is not None and attr.attr_name not in exclude:
                 value = copy.copy(attr.default)
                 if callable(value):
                     value = value()
                 setattr(self, attr.attr_name, value)
 
-    def save(self):
-        self._put_item(self)
+    def save(self, condition=None, if_not_exists=False):
+        """Put the item to the table.
+
+        If the model has a :class:`~bynamodb.attributes.VersionAttribute`,
+        the version is incremented, and the item is put only if the version
+        in the table is still the one the object has.
+
+        :param condition: the condition the item in the table must meet.
+        :type condition: :class:`~bynamodb.filterexps.Operator`
+        :param if_not_exists: put the item only if the table has no item
+                              of the key.
+        :type if_not_exists: :class:`bool`
+        :raises: :class:`~bynamodb.exceptions.VersionConflictException`
+                 if the version has changed, or
+                 :class:`~bynamodb.exceptions.ConditionFailedException`
+                 if the condition is not met.
+
+        """
+        self._put_item(self, condition, if_not_exists)
+
+    def estimate_cost(self):
+        """Estimate the size and capacity units of the item.
+
+        :returns: :data:`~bynamodb.capacity.ItemCost`
+
+        """
+        return estimate(self.__class__, self._encode_item(self))
+
+    def dumps(self):
+        """Serialize the item to the compact binary format of the model
+        schema, to be cached outside. :meth:`loads` loads it back.
+
+        """
+        return self._get_serializer().dumps(self)
+
+    @classmethod
+    def loads(cls, data):
+        """Load the item serialized by :meth:`dumps`.
+
+        :raises: :class:`~bynamodb.exceptions.SchemaMismatchException`
+                 if it was serialized with another schema or the
+                 payload is truncated.
+        :raises: :exc:`ValueError` if bytes are left after the item.
+
+        """
+        return cls._get_serializer().loads(data)
+
+    def delete(self, condition=None):
+        """Delete the item from the table.
+
+        If the object has a version, the item is deleted only if the version
+        in the table is still the one the object has.
+
+        :param condition: the condition the item in the table must meet.
+        :type condition: :class:`~bynamodb.filterexps.Operator`
+        :raises: :class:`~bynamodb.exceptions.VersionConflictException`
+                 if the version has changed, or
+                 :class:`~bynamodb.exceptions.ConditionFailedException`
+                 if the condition is not met.
+
+        """
+        session = current_session()
+        if session is not None:
+            session.delete(self, condition)
+            return None
+        if self.write_buffer is not None:
+            self._check_buffered(condition)
+            key = self._encode_key(
+                *[getattr(self, key.name) for key in self._get_keys()])
+            self.write_buffer.delete(self.__class__, key)
+            return None
+        return self._delete_item(self, condition)
+
+    @classmethod
+    def _delete_item(cls, item, condition=None):
+        """Delete the item with the condition and the version check,
+        not through the session nor the write buffer.
 
-    def delete(self):
-        key_fields = [key.name for key in self._get_keys()]
-        key = dict((key, getattr(self, key)) for key in key_fields)
-        return self._get_connection().delete_item(self.get_table_name(), key)
+        """
+        key_values = [getattr(item, key.name) for key in cls._get_keys()]
+        key = cls._encode_key(*key_values)
+        version_check = None
+        if cls._version_attribute is not None:
+            version = getattr(item, cls._version_attribute)
+            if version is not None:
+                version_check = EQ(cls._version_attribute, version)
+        kwargs = _condition_kwargs(_and(version_check, condition))
+        try:
+            with cls._sample_access(key_values[0]):
+                result = cls._get_connection().delete_item(
+                    cls.get_table_name(), key, **kwargs)
+        except dynamodb2_exceptions.ConditionalCheckFailedException as e:
+            _condition_failed(e, version_check is not None and
+                              condition is None)
+        cls._written(key)
+        return result
 
     @classmethod
     def create_table(cls, read_throughput=None, write_throughput=None):
@@ -103,7 +273,7 @@ class Model(object):
                 global_indexes.append(index.schema())
             else:
                 indexes.append(index.schema())
-            for key in index._keys:
+            for key in index._get_keys():
                 if key.name not in seen_attrs:
                     table_definitions.append(key.definition())
                     seen_attrs.add(key.name)
@@ -128,9 +298,75 @@ class Model(object):
         return cls._put_item(cls(**data))
 
     @classmethod
-    def _put_item(cls, item):
+    def _put_item(cls, item, condition=None, if_not_exists=False):
+        if if_not_exists:
+            condition = _and(AttributeNotExists(cls._get_hash_key().name),
+                             condition)
+        session = current_session()
+        if session is not None:
+            session.add(item, condition)
+            return item
+        if cls.write_buffer is not None:
+            cls._check_buffered(condition)
+            data = cls._encode_item(item)
+            cls._validate_item(data)
+            cls.write_buffer.put(cls, data)
+            return item
+        return cls._write_item(item, condition)
+
+    @classmethod
+    def _write_item(cls, item, condition=None):
+        """Put the item with the condition and the version check,
+        not through the session nor the write buffer.
+
+        """
+        name = cls._version_attribute
+        version_check = None
+        if name is not None:
+            version = getattr(item, name)
+            if version is None:
+                version_check = AttributeNotExists(name)
+            else:
+                version_check = EQ(name, version)
+            setattr(item, name, (version or 0) + 1)
+        try:
+            data = cls._encode_item(item)
+            cls._validate_item(data)
+            kwargs = _condition_kwargs(_and(version_check, condition))
+            hash_key = getattr(item, cls._get_hash_key().name)
+            with cls._sample_access(hash_key):
+                cls._get_connection().put_item(cls.get_table_name(), data,
+                                               **kwargs)
+        except Exception as e:
+            if name is not None:
+                setattr(item, name, version)
+            if isinstance(
+                    e, dynamodb2_exceptions.ConditionalCheckFailedException):
+                _condition_failed(e, version_check is not None and
+                                  condition is None)
+            raise
+        cls._written(data)
+        return item
+
+    @classmethod
+    def _check_batched(cls):
+        if cls._version_attribute is not None:
+            raise ValueError('The writes of {0} check its version, so they '
+                             'cannot be batched'.format(cls.__name__))
+
+    @classmethod
+    def _check_buffered(cls, condition):
+        if condition is not None or cls._version_attribute is not None:
+            raise ValueError('The conditional writes of {0} cannot be '
+                             'buffered'.format(cls.__name__))
+
+    @classmethod
+    def _encode_item(cls, item):
         data = {}
         for name, attr in cls._get_attributes().items():
+            if name in item._raw:
+                data[name] = item._raw[name]
+                continue
             attr_value = getattr(item, name, None)
             if attr_value is None:
                 if not attr.null:
@@ -139,14 +375,36 @@ class Model(object):
                 else:
                     continue
             data[attr.attr_name] = attr.encode(attr_value)
-        cls._get_connection().put_item(cls.get_table_name(), data)
-        return item
+        return data
+
+    @classmethod
+    def _validate_item(cls, raw_item):
+        """Check the raw item before it is written."""
+        if cls.max_item_size is not None:
+            size = item_size(raw_item)
+            if size > cls.max_item_size:
+                raise ItemTooLargeException(
+                    'The item is {0} bytes, larger than {1} bytes'.format(
+                        size, cls.max_item_size))
+        if cls.cost_aggregator is not None:
+            cls.cost_aggregator.add(cls, estimate(cls, raw_item))
 
     @classmethod
     def get_item(cls, hash_key, range_key=None):
         """ Get item from the table."""
-        key = cls._encode_key(hash_key, range_key)
-        raw_data = cls._get_connection().get_item(cls.get_table_name(), key)
+        session = current_session()
+        if session is not None:
+            return session.get(cls, hash_key, range_key)
+        return cls._load_item(hash_key, range_key)
+
+    @classmethod
+    def _load_item(cls, hash_key, range_key=None):
+        with cls._sample_access(hash_key):
+            if cls.loader is not None:
+                return cls.loader.load(cls, hash_key, range_key)
+            key = cls._encode_key(hash_key, range_key)
+            raw_data = cls._get_connection().get_item(
+                cls.get_table_name(), key)
         if 'Item' not in raw_data:
             raise ItemNotFoundException
         return cls.from_raw_data(raw_data['Item'])
@@ -169,14 +427,22 @@ class Model(object):
         return ResultSet(cls, 'query', query_kwargs)
 
     @classmethod
-    def scan(cls, filter_builder=None, **scan_filter):
+    def scan(cls, filter_builder=None, segment=None, total_segments=None,
+             **scan_filter):
         """High level scan API.
 
         :param filter_builder: filter expression builder.
         :type filter_builder: :class:`~bynamodb.filterexps.Operator`
+        :param segment: the segment to scan in a parallel scan.
+        :type segment: :class:`int`
+        :param total_segments: the number of segments of a parallel scan.
+        :type total_segments: :class:`int`
 
         """
         scan_kwargs = {'scan_filter': build_condition(scan_filter)}
+        if total_segments is not None:
+            scan_kwargs['segment'] = segment
+            scan_kwargs['total_segments'] = total_segments
         if filter_builder:
             cls._build_filter_expression(filter_builder, scan_kwargs)
         return ResultSet(cls, 'scan', scan_kwargs)
@@ -187,10 +453,49 @@ class Model(object):
         to the item object.
 
         """
+        if cls.lazy_decode:
+            attributes = cls._get_attributes()
+            item = cls.__new__(cls)
+            item._data = {}
+            item._raw = dict((name, value) for name, value in item_raw.items()
+                             if name in attributes)
+            item._set_defaults(exclude=item._raw)
+            return item
         deserialized = {}
+        lazy = {}
         for name, attr in item_raw.items():
-            deserialized[name] = getattr(cls, name).decode(attr)
-        return cls(**deserialized)
+            attribute = getattr(cls, name)
+            if attribute.lazy:
+                lazy[name] = attr
+            else:
+                deserialized[name] = attribute.decode(attr)
+        item = cls(**deserialized)
+        item._raw.update(lazy)
+        return item
+
+    @classmethod
+    def _written(cls, *raw_items):
+        """Called after the items are written to the table through the model.
+
+        :param raw_items: the raw items or keys written, none if unknown.
+
+        """
+        if cls.query_cache is not None:
+            cls.query_cache.invalidate(cls.get_table_name(), *raw_items)
+
+    @classmethod
+    def _sample_access(cls, hash_key, index_name=None):
+        """The context of an access to the hash key sampled by
+        :attr:`key_sampler`. Nothing is sampled without a hash key, as in
+        the scans.
+
+        """
+        if cls.key_sampler is None or hash_key is None:
+            return NO_SAMPLING
+        name = cls.get_table_name()
+        if index_name:
+            name = '{0}.{1}'.format(name, index_name)
+        return cls.key_sampler.access(name, hash_key)
 
     @classmethod
     def _build_filter_expression(cls, filter_builder, kwargs):
@@ -199,7 +504,7 @@ class Model(object):
 
     @classmethod
     def _encode_key(cls, hash_key, range_key=None):
-        dynamizer = Dynamizer()
+        dynamizer = dynamodb_types.Dynamizer()
         encoded = {cls._get_hash_key().name: dynamizer.encode(hash_key)}
         if range_key:
             encoded.update(
@@ -218,9 +523,10 @@ class Model(object):
         range_key = None
         for attr in cls._get_attributes().values():
             if attr.hash_key:
-                hash_key = HashKey(attr.attr_name, attr.type)
+                hash_key = dynamodb2_fields.HashKey(attr.attr_name, attr.type)
             elif attr.range_key:
-                range_key = RangeKey(attr.attr_name, attr.type)
+                range_key = dynamodb2_fields.RangeKey(attr.attr_name,
+                                                      attr.type)
         cls._keys = [key for key in [hash_key, range_key] if key]
         return cls._keys
 
@@ -234,29 +540,61 @@ class Model(object):
 
     @classmethod
     def _get_attributes(cls):
-        if cls._attributes:
-            return cls._attributes
-        cls._attributes = {}
-        for item_name in dir(cls):
-            item_cls = getattr(getattr(cls, item_name), '__class__', None)
-            if item_cls is not None and issubclass(item_cls, Attribute):
-                cls._attributes[item_name] = getattr(cls, item_name)
         return cls._attributes
 
     @classmethod
     def _get_indexes(cls):
-        if cls._indexes:
-            return cls._indexes
-        cls._indexes = []
-        for item_name in dir(cls):
-            attr = getattr(cls, item_name)
-            if type(attr) == type and issubclass(attr, Index):
-                cls._indexes.append(attr)
         return cls._indexes
 
+    @classmethod
+    def _get_serializer(cls):
+        if cls._serializer:
+            return cls._serializer
+        cls._serializer = ModelSerializer(cls)
+        return cls._serializer
+
     @classmethod
     def _get_connection(cls):
-        if cls._conn:
-            return cls._conn
-        cls._conn = DynamoDBConnection()
-        return cls._conn
+        if not cls._conn:
+            cls._conn = dynamodb2_layer1.DynamoDBConnection()
+        conn = cls._conn
+        tuner, policy = cls.throughput_tuner, cls.call_policy
+        if tuner is None and policy is None:
+            return conn
+        wrapped = cls._wrapped_conn
+        if wrapped is not None and wrapped[0] is conn and \
+                wrapped[1] is tuner and wrapped[2] is policy:
+            return wrapped[3]
+        wrapped_conn = conn
+        if tuner is not None:
+            wrapped_conn = tuner.wrap(wrapped_conn)
+        if policy is not None:
+            wrapped_conn = policy.wrap(wrapped_conn)
+        cls._wrapped_conn = conn, tuner, policy, wrapped_conn
+        return wrapped_conn
+
+
+def _and(*operators):
+    """Combine the operators except `None` with AND."""
+    result = None
+    for operator in operators:
+        if operator is None:
+            continue
+        result = operator if result is None else result & operator
+    return result
+
+
+def _condition_kwargs(condition):
+    if condition is None:
+        return {}
+    expression, values = condition.build_exp()
+    kwargs = {'condition_expression': expression}
+    if values:
+        kwargs['expression_attribute_values'] = values
+    return kwargs
+
+
+def _condition_failed(error, version_only):
+    if version_only:
+        raise VersionConflictException(error.message)
+    raise ConditionFailedException(error.message)
@@ -0,0 +1,362 @@
+import random
+import socket
+import sys
+import threading
+import time
+import weakref
+from collections import deque
+from httplib import HTTPException
+from Queue import Empty, Queue
+
+from .exceptions import DeadlineExceededException
+from .lazy import boto_exception, dynamodb2_exceptions
+
+
+#: The operations safe to send twice. They are hedged and retried after
+#: any retryable error, while the other operations are retried only when
+#: DynamoDB rejected the request.
+IDEMPOTENT_OPERATIONS = frozenset([
+    'get_item', 'batch_get_item', 'query', 'scan', 'describe_table',
+    'list_tables'
+])
+
+#: The operations hedged by default.
+HEDGED_OPERATIONS = frozenset(['get_item', 'batch_get_item', 'query'])
+
+#: The error codes of the requests rejected before they were processed.
+REJECTED_ERROR_CODES = frozenset([
+    'ProvisionedThroughputExceededException', 'ThrottlingException',
+    'RequestLimitExceeded', 'LimitExceededException'
+])
+
+
+class CallPolicy(object):
+    """Deadlines, retries and hedged reads of the requests to DynamoDB.
+
+    Each request has a deadline of its operation. A failed request is
+    retried with the jittered exponential backoff as long as the deadline
+    allows. A hedged request is sent again if it doesn't respond within
+    the percentile of the recent latencies of the operation, and the first
+    response wins.
+
+    The requests with a deadline or hedged are sent from a pool of
+    reused threads, and the calling thread waits for the first response
+    until the deadline of the operation. A request cut off by its deadline
+    raises :class:`~bynamodb.exceptions.DeadlineExceededException`,
+    though a write may still land. The requests without a deadline are
+    sent from the calling thread. :meth:`wrap` turns off the retries of
+    boto, so only the policy retries, and lowers the socket timeout of
+    the connection to the longest deadline, so the requests cut off don't
+    hold their threads for long.
+
+    .. code-block:: python
+
+       Model.call_policy = CallPolicy(
+           timeouts={'get_item': 0.05, 'query': 0.5},
+           hedge_percentile=95
+       )
+
+    :param timeout: the deadline in seconds of the operations without
+                    their own. No deadline if omitted.
+    :type timeout: :class:`float`
+    :param timeouts: the deadline of each operation name of
+                     :class:`boto.dynamodb2.layer1.DynamoDBConnection`.
+    :type timeouts: :class:`collections.Mapping`
+    :param max_retries: the number of retries after the first attempt.
+    :type max_retries: :class:`int`
+    :param backoff: the base of the backoff in seconds.
+    :param max_backoff: the maximum backoff in seconds.
+    :param hedge_percentile: the percentile of the latencies to wait before
+                             hedging. No hedging if omitted.
+    :type hedge_percentile: :class:`float`
+    :param hedge_min_delay: the minimum seconds to wait before hedging.
+    :param hedged_operations: the operation names to hedge.
+                              :data:`HEDGED_OPERATIONS` if omitted.
+    :param window: the number of the recent latencies kept per operation.
+    :param min_samples: the latencies needed before hedging an operation.
+
+    """
+
+    def __init__(self, timeout=None, timeouts=None, max_retries=3,
+                 backoff=0.05, max_backoff=1.0, hedge_percentile=None,
+                 hedge_min_delay=0.005, hedged_operations=None, window=1000,
+                 min_samples=20):
+        self.timeout = timeout
+        self.timeouts = dict(timeouts or {})
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        if hedged_operations is None:
+            hedged_operations = HEDGED_OPERATIONS
+        self.hedged_operations = frozenset(hedged_operations)
+        self.window = window
+        self.min_samples = min_samples
+        self._latencies = {}
+        self._counters = dict.fromkeys([
+            'calls', 'retries', 'hedges', 'hedge_wins', 'deadlines_exceeded'
+        ], 0)
+        self._lock = threading.Lock()
+        self._wrapped = weakref.WeakKeyDictionary()
+
+    def wrap(self, conn):
+        """Wrap the connection to send its requests under the policy.
+        The connection is wrapped once, its retries are turned off, and its
+        socket timeout is lowered to the longest deadline.
+
+        """
+        with self._lock:
+            wrapped = self._wrapped.get(conn)
+            if wrapped is None:
+                _disable_retries(conn)
+                self._set_socket_timeout(conn)
+                wrapped = self._wrapped[conn] = _PolicyConnection(self, conn)
+            return wrapped
+
+    def call(self, operation, method, *args, **kwargs):
+        """Call the method of the connection for the operation under
+        the policy.
+
+        :raises: :class:`~bynamodb.exceptions.DeadlineExceededException`
+                 if the deadline passes before a response.
+
+        """
+        self._count('calls')
+        timeout = self.timeouts.get(operation, self.timeout)
+        deadline = None if timeout is None else time.time() + timeout
+        attempt = 0
+        while True:
+            try:
+                return self._attempt(operation, method, args, kwargs,
+                                     deadline)
+            except Exception as e:
+                if attempt >= self.max_retries or \
+                        not self.is_retryable(operation, e):
+                    raise
+                delay = random.uniform(
+                    0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                if deadline is not None and time.time() + delay >= deadline:
+                    raise
+            self._count('retries')
+            time.sleep(delay)
+            attempt += 1
+
+    def is_retryable(self, operation, error):
+        """`True` if the request failed with the error can be retried."""
+        throttled = dynamodb2_exceptions.ProvisionedThroughputExceededException
+        if isinstance(error, throttled):
+            return True
+        if isinstance(error, boto_exception.JSONResponseError):
+            if getattr(error, 'error_code', None) in REJECTED_ERROR_CODES:
+                return True
+            server_error = error.status >= 500
+        else:
+            server_error = isinstance(error, (socket.error, HTTPException))
+        return server_error and operation in IDEMPOTENT_OPERATIONS
+
+    def hedge_delay(self, operation):
+        """The seconds to wait before hedging the request of the operation,
+        or `None` if it isn't hedged.
+
+        """
+        if self.hedge_percentile is None or \
+                operation not in self.hedged_operations:
+            return None
+        latency = self.latency_percentile(operation, self.hedge_percentile)
+        if latency is None:
+            return None
+        return max(self.hedge_min_delay, latency)
+
+    def latency_percentile(self, operation, percentile):
+        """The percentile of the recent latencies of the operation,
+        or `None` if there are not enough of them.
+
+        """
+        with self._lock:
+            latencies = self._latencies.get(operation)
+            if latencies is None or len(latencies) < self.min_samples:
+                return None
+            return latencies.percentile(percentile)
+
+    def stats(self):
+        """The counters of the policy as :class:`dict`."""
+        with self._lock:
+            return dict(self._counters)
+
+    def _set_socket_timeout(self, conn):
+        deadlines = [timeout for timeout in
+                     [self.timeout] + list(self.timeouts.values())
+                     if timeout is not None]
+        kwargs = getattr(conn, 'http_connection_kwargs', None)
+        if not deadlines or not isinstance(kwargs, dict):
+            return
+        current = kwargs.get('timeout')
+        if current is None or current > max(deadlines):
+            kwargs['timeout'] = max(deadlines)
+
+    def _attempt(self, operation, method, args, kwargs, deadline):
+        hedge_delay = self.hedge_delay(operation)
+        if hedge_delay is None and deadline is None:
+            started_at = time.time()
+            result = method(*args, **kwargs)
+            self._record(operation, time.time() - started_at)
+            return result
+
+        responses = Queue()
+
+        def send(hedge):
+            started_at = time.time()
+            try:
+                result = method(*args, **kwargs)
+            except Exception:
+                responses.put((hedge, None, sys.exc_info()))
+            else:
+                self._record(operation, time.time() - started_at)
+                responses.put((hedge, result, None))
+
+        hedge_at = None
+        if hedge_delay is not None:
+            hedge_at = time.time() + hedge_delay
+        _workers.submit(send, False)
+        in_flight = 1
+        while True:
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.time()
+            if hedge_at is not None:
+                until_hedge = hedge_at - time.time()
+                timeout = until_hedge if timeout is None \
+                    else min(timeout, until_hedge)
+            try:
+                hedge, result, exc_info = responses.get(
+                    timeout=None if timeout is None else max(0, timeout))
+            except Empty:
+                if hedge_at is not None and time.time() >= hedge_at:
+                    hedge_at = None
+                    self._count('hedges')
+                    _workers.submit(send, True)
+                    in_flight += 1
+                    continue
+                self._count('deadlines_exceeded')
+                raise DeadlineExceededException(
+                    '{0} has not responded within the deadline'.format(
+                        operation))
+            in_flight -= 1
+            if exc_info is None:
+                if hedge:
+                    self._count('hedge_wins')
+                return result
+            if not in_flight:
+                raise exc_info[0], exc_info[1], exc_info[2]
+
+    def _record(self, operation, latency):
+        with self._lock:
+            latencies = self._latencies.get(operation)
+            if latencies is None:
+                latencies = self._latencies[operation] = \
+                    _Latencies(self.window)
+            latencies.add(latency)
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+
+class _Latencies(object):
+    """The recent latencies. The sorted latencies are cached until a tenth
+    of them are replaced.
+
+    """
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self._sorted = None
+        self._stale = 0
+
+    def __len__(self):
+        return len(self.samples)
+
+    def add(self, latency):
+        self.samples.append(latency)
+        self._stale += 1
+
+    def percentile(self, percentile):
+        if self._sorted is None or self._stale * 10 >= len(self.samples):
+            self._sorted = sorted(self.samples)
+            self._stale = 0
+        index = int(round(percentile / 100.0 * (len(self._sorted) - 1)))
+        return self._sorted[index]
+
+
+class _PolicyConnection(object):
+    """The connection sending its requests under the policy."""
+
+    def __init__(self, policy, conn):
+        self.policy = policy
+        self.conn = conn
+
+    def __getattr__(self, name):
+        attr = getattr(self.conn, name)
+        if not callable(attr) or name.startswith('_'):
+            return attr
+
+        def call(*args, **kwargs):
+            return self.policy.call(name, attr, *args, **kwargs)
+        return call
+
+
+class _Workers(object):
+    """The daemon threads reused to send the requests waited on. A thread
+    is started when none is idle, and exits after idling for
+    ``idle_timeout`` seconds.
+
+    """
+
+    def __init__(self, idle_timeout=60.0):
+        self.idle_timeout = idle_timeout
+        # The inbox of each idle thread.
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args):
+        with self._lock:
+            inbox = self._idle.pop() if self._idle else None
+        if inbox is None:
+            _start(self._work, func, args)
+        else:
+            inbox.put((func, args))
+
+    def _work(self, func, args):
+        while True:
+            func(*args)
+            inbox = Queue()
+            with self._lock:
+                self._idle.append(inbox)
+            try:
+                func, args = inbox.get(timeout=self.idle_timeout)
+            except Empty:
+                with self._lock:
+                    if inbox in self._idle:
+                        self._idle.remove(inbox)
+                        return
+                # A task was handed over just as the thread timed out.
+                func, args = inbox.get()
+
+
+_workers = _Workers()
+
+
+def _disable_retries(conn):
+    # boto retries the errors and the throttled requests up to 10 times
+    # with its own backoff, which would overrun the deadlines.
+    if hasattr(conn, 'NumberRetries'):
+        conn.NumberRetries = 0
+    if hasattr(conn, 'num_retries'):
+        conn.num_retries = 0
+
+
+def _start(func, *args):
+    thread = threading.Thread(target=func, args=args)
+    thread.daemon = True
+    thread.start()
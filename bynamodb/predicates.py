@@ -0,0 +1,96 @@
+from decimal import Decimal
+
+from .lazy import dynamodb_types
+
+
+def value_getter(raw=False):
+    """Make the function getting the value of the attribute path of
+    an item.
+
+    :param raw: the items are the raw items from
+                :class:`boto.dynamodb2.layer1.DynamoDBConnection` if `True`.
+                Otherwise the items are model objects or :class:`dict` of
+                the decoded values.
+    :type raw: :class:`bool`
+    :returns: the function taking an item and the attribute path, and
+              returning the value or `None` if missing.
+
+    """
+    dynamizer = dynamodb_types.Dynamizer()
+
+    def get_value(item, path):
+        names = path.split('.')
+        if isinstance(item, dict):
+            value = item.get(names[0])
+            if raw and value is not None:
+                value = dynamizer.decode(value)
+        else:
+            value = getattr(item, names[0], None)
+        for name in names[1:]:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(name)
+        return value
+    return get_value
+
+
+def dynamo_type(value):
+    """The DynamoDB type of the decoded value."""
+    if isinstance(value, bool):
+        return 'BOOL'
+    if isinstance(value, (int, long, float, Decimal)):
+        return 'N'
+    if isinstance(value, basestring):
+        return 'S'
+    if isinstance(value, dynamodb_types.Binary):
+        return 'B'
+    if isinstance(value, (set, frozenset)):
+        return 'SET'
+    if isinstance(value, (list, tuple)):
+        return 'L'
+    if isinstance(value, dict):
+        return 'M'
+    return None
+
+
+def equals(value, operand):
+    """``value = operand``. The values of different types are not equal."""
+    return (value is not None and
+            dynamo_type(value) == dynamo_type(operand) and
+            value == operand)
+
+
+def compare(op, value, operand):
+    """Compare the values with the operator function. Only the numbers,
+    strings and binaries of the same type are comparable.
+
+    """
+    value_type = dynamo_type(value)
+    return (value_type in ('N', 'S', 'B') and
+            value_type == dynamo_type(operand) and
+            op(value, operand))
+
+
+def contains(value, operand):
+    """``contains(value, operand)`` for a string or a set or list."""
+    value_type = dynamo_type(value)
+    if value_type == 'S':
+        return dynamo_type(operand) == 'S' and operand in value
+    if value_type == 'B':
+        return (dynamo_type(operand) == 'B' and
+                operand.value in value.value)
+    if value_type in ('SET', 'L'):
+        return any(equals(elem, operand) for elem in value)
+    return False
+
+
+def begins_with(value, operand):
+    """``begins_with(value, operand)`` for a string or a binary."""
+    value_type = dynamo_type(value)
+    if value_type != dynamo_type(operand):
+        return False
+    if value_type == 'S':
+        return value.startswith(operand)
+    if value_type == 'B':
+        return value.value.startswith(operand.value)
+    return False
@@ -1,4 +1,39 @@
-from boto.dynamodb.types import Dynamizer
+import json
+import logging
+import math
+import random
+import sys
+import threading
+import time
+from array import array
+from collections import namedtuple
+from Queue import Full, Queue
+
+from .attributes import BooleanAttribute, NumberAttribute, StringAttribute
+from .batch import MAX_WRITE_ITEMS, chunks, delete_raw_keys
+from .lazy import dynamodb_types, multiprocessing
+from .settings import conf
+
+
+logger = logging.getLogger(__name__)
+
+#: The estimated count of the items of :meth:`ResultSet.count`.
+#: ``error`` is the half width of the confidence interval of
+#: ``confidence``, so the count is within ``count - error`` and
+#: ``count + error`` at that confidence. It is `None` if the error is
+#: unknown, as for the ``ItemCount`` of the table which DynamoDB updates
+#: about every six hours. ``method`` is ``'item_count'``, ``'sample'``
+#: or ``'exact'``, and ``scanned`` is the number of the items read.
+CountEstimate = namedtuple('CountEstimate', [
+    'count', 'error', 'confidence', 'method', 'scanned'
+])
+
+#: (:class:`int`) The approximate number of the items in a segment
+#: sampled by :meth:`ResultSet.count`.
+ITEMS_PER_SAMPLED_SEGMENT = 1000
+
+#: (:class:`int`) The maximum total segments of a scan.
+MAX_TOTAL_SEGMENTS = 1000000
 
 
 class ResultSet(object):
@@ -9,51 +44,876 @@ class ResultSet(object):
         self.operation = operation
         self.kwargs = kwargs
 
+        #: (:class:`QueryStats`) The statistics of the latest run.
+        self.stats = None
+
+        #: (:class:`dict`) The options of :class:`PageSizer` if the page
+        #: sizes are adapted.
+        self.page_sizing = None
+
     def __iter__(self):
-        """Result items of the operation."""
-        operation = self._get_operation()
-        kwargs = self.kwargs.copy()
-        while True:
-            result = operation(self.model.get_table_name(), **kwargs)
+        """Result items of the operation.
+
+        In the context of a :class:`~bynamodb.session.Session`, the items
+        of the keys the session has are its objects, and the keys it knows
+        to have no item are skipped. The other items are tracked by the
+        session unless the index projects only some attributes.
+
+        """
+        from .session import current_session
+        session = current_session()
+        if session is None:
+            return self._decode(self.kwargs.copy(), self.model.from_raw_data)
+        return self._decode_in_session(session)
+
+    def raw(self):
+        """Iterate the raw items of the operation as they are returned from
+        :class:`boto.dynamodb2.layer1.DynamoDBConnection`, without decoding.
+
+        """
+        for result in self._iter_pages(self.kwargs.copy()):
             for raw_item in result.get('Items'):
-                yield self.model.from_raw_data(raw_item)
+                yield raw_item
 
-            last_evaluated_key = self._get_last_key(result)
-            if last_evaluated_key:
-                kwargs['exclusive_start_key'] = last_evaluated_key
-            else:
-                raise StopIteration
+    def pages(self, exclusive_start_key=None):
+        """Iterate the raw results of each request of the operation.
+
+        The ``LastEvaluatedKey`` of a result can be passed as
+        ``exclusive_start_key`` later to resume from the next page.
+
+        """
+        kwargs = self.kwargs.copy()
+        if exclusive_start_key:
+            kwargs['exclusive_start_key'] = exclusive_start_key
+        return self._iter_pages(kwargs)
+
+    def values(self, *fields):
+        """Iterate the items as :class:`dict` of the decoded values
+        without creating the model objects.
+
+        :param fields: the attribute names to fetch. Only these attributes
+                       are requested if given, otherwise all attributes
+                       of the items are decoded.
+
+        """
+        if not fields:
+            attributes = self.model._get_attributes()
+
+            def decode_item(raw_item):
+                return dict((name, attributes[name].decode(value))
+                            for name, value in raw_item.items()
+                            if name in attributes)
+            return self._decode(self.kwargs.copy(), decode_item)
+
+        decoders = self._get_decoders(fields)
+
+        def decode_fields(raw_item):
+            return dict((name, decode(raw_item[name]))
+                        for name, decode in decoders if name in raw_item)
+        return self._decode(self._projected_kwargs(fields), decode_fields)
+
+    def values_list(self, *fields, **kwargs):
+        """Iterate the items as :class:`tuple` of the decoded values
+        ordered as the ``fields``, without creating the model objects.
+        The missing attributes are `None`.
+
+        :param fields: the attribute names to fetch.
+        :param named: yield :func:`collections.namedtuple` rows if `True`.
+        :type named: :class:`bool`
+
+        """
+        if not fields:
+            raise ValueError('values_list requires the fields to fetch')
+        named = kwargs.pop('named', False)
+        if kwargs:
+            raise TypeError(
+                'Unexpected keyword arguments: {0}'.format(', '.join(kwargs)))
+        decoders = self._get_decoders(fields)
+        row = tuple
+        if named:
+            row_cls = namedtuple('Row', fields)
+            row = row_cls._make
+
+        def decode_fields(raw_item):
+            return row(decode(raw_item[name]) if name in raw_item else None
+                       for name, decode in decoders)
+        return self._decode(self._projected_kwargs(fields), decode_fields)
+
+    def to_columns(self, fields, chunk_size=10000, total_segments=None,
+                   numpy=False):
+        """Iterate the items as chunks of columns, keeping the memory bounded
+        by the ``chunk_size``.
+
+        Each chunk is a :class:`dict` of the field name and its column.
+        The columns are typed by the attribute declarations:
+
+        - :class:`~bynamodb.attributes.NumberAttribute`: ``array('d')``,
+          `NaN` if missing.
+        - :class:`~bynamodb.attributes.BooleanAttribute`: ``array('b')``,
+          ``-1`` if missing.
+        - Other attributes: :class:`list` of the decoded values,
+          `None` if missing.
+
+        :param fields: the attribute names to fetch.
+        :param chunk_size: the number of items in a chunk.
+        :type chunk_size: :class:`int`
+        :param total_segments: scan this number of segments in parallel.
+                               The chunks are yielded as each segment
+                               fills them.
+        :type total_segments: :class:`int`
+        :param numpy: the typed columns are :class:`numpy.ndarray`
+                      sharing the memory of the arrays if `True`.
+        :type numpy: :class:`bool`
+
+        """
+        columns = self._get_column_types(fields)
+        if numpy:
+            import numpy as np
+            dtypes = {'d': np.float64, 'b': np.int8}
 
-    def count(self):
+        if total_segments:
+            chunks = iter_parallel(
+                lambda result_set: _iter_column_chunks(
+                    result_set._iter_projected(fields), columns, chunk_size),
+                self.segments(total_segments)
+            )
+        else:
+            chunks = _iter_column_chunks(
+                self._iter_projected(fields), columns, chunk_size)
+
+        for chunk in chunks:
+            if numpy:
+                for field, column in chunk.items():
+                    if isinstance(column, array):
+                        chunk[field] = np.frombuffer(
+                            column, dtype=dtypes[column.typecode])
+            yield chunk
+
+    def parallel_map(self, func, processes=None, segments=None):
+        """Apply the function to each item in the worker processes.
+
+        Each worker process opens its own connection, scans the segments
+        assigned to it and sends back only the results of the function,
+        so the CPU-bound work on the items scales across the cores.
+        The function and the model must be picklable, so both should be
+        defined at the module level.
+
+        :param func: the function taking an item and returning the result.
+        :param processes: the number of worker processes.
+                          The number of the CPUs if omitted.
+        :type processes: :class:`int`
+        :param segments: the number of segments to split the scan into.
+                         ``processes`` if omitted.
+        :type segments: :class:`int`
+        :returns: the iterator of the results in no particular order.
+
+        """
+        processes = processes or multiprocessing.cpu_count()
+        tasks = [(result_set, func, None, None)
+                 for result_set in self.segments(segments or processes)]
+        for results in self._run_in_pool(processes, tasks):
+            for result in results:
+                yield result
+
+    def parallel_reduce(self, func, reducer, initializer, processes=None,
+                        segments=None, combiner=None):
+        """Apply the function to each item and reduce the results
+        in the worker processes.
+
+        Each segment is reduced in its worker process starting from
+        the ``initializer``, and only the reduced value is sent back.
+        The values of the segments are combined with the ``combiner``.
+        The arguments must be picklable as in :meth:`parallel_map`.
+
+        :param func: the function taking an item and returning the result.
+        :param reducer: the function taking the reduced value and a result,
+                        and returning the new reduced value.
+        :param initializer: the initial reduced value of each segment.
+        :param combiner: the function taking two reduced values and
+                         returning the combined value. ``reducer`` if
+                         omitted.
+        :returns: the value combined from the values of the segments.
+
+        """
+        processes = processes or multiprocessing.cpu_count()
+        tasks = [(result_set, func, reducer, initializer)
+                 for result_set in self.segments(segments or processes)]
+        return reduce(combiner or reducer,
+                      self._run_in_pool(processes, tasks))
+
+    def _run_in_pool(self, processes, tasks):
+        pool = multiprocessing.Pool(processes, _reset_connection,
+                                    (self.model,))
+        try:
+            for result in pool.imap_unordered(_process_segment, tasks):
+                yield result
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+    def adaptive(self, target_latency=None, target_capacity=None,
+                 initial_limit=100, min_limit=1, max_limit=None):
+        """Adapt the ``Limit`` of each request to the observed latency and
+        consumed capacity of the previous pages, instead of reading pages
+        of up to 1 MB. See :class:`PageSizer` for the parameters.
+
+        The latency is aimed at 0.2 seconds if no target is given.
+        The limits chosen are recorded in :attr:`QueryStats.page_sizes`.
+
+        :returns: the :class:`ResultSet` reading the adaptive pages.
+
+        """
+        if target_latency is None and target_capacity is None:
+            target_latency = 0.2
+        result_set = ResultSet(self.model, self.operation, self.kwargs)
+        result_set.page_sizing = dict(
+            target_latency=target_latency,
+            target_capacity=target_capacity,
+            initial_limit=initial_limit,
+            min_limit=min_limit,
+            max_limit=max_limit
+        )
+        return result_set
+
+    def segments(self, total_segments):
+        """Split the scan into the segments of a parallel scan.
+
+        :returns: :class:`ResultSet` of each segment.
+
+        """
+        if self.operation != 'scan':
+            raise ValueError('Only the scan can be split into segments')
+        result_sets = [
+            ResultSet(self.model, self.operation,
+                      dict(self.kwargs, segment=segment,
+                           total_segments=total_segments))
+            for segment in range(total_segments)
+        ]
+        for result_set in result_sets:
+            result_set.page_sizing = self.page_sizing
+        return result_sets
+
+    def delete(self, concurrency=4):
+        """Delete the matching items.
+
+        Only the keys of the items are fetched, and they are deleted by
+        BatchWriteItem requests sent from ``concurrency`` threads.
+
+        :param concurrency: the maximum number of requests in flight.
+        :type concurrency: :class:`int`
+        :returns: the number of items deleted.
+        :raises: :exc:`ValueError` if the model has a version, which
+                 BatchWriteItem can't check.
+
+        """
+        self.model._check_batched()
+        key_names = [key.name for key in self.model._get_keys()]
+        conn = self.model._get_connection()
+        table_name = self.model.get_table_name()
+        batches = chunks(self._iter_projected(key_names), MAX_WRITE_ITEMS)
+        lock = threading.Lock()
+
+        def delete_batches(_):
+            while True:
+                with lock:
+                    batch = next(batches, None)
+                if batch is None:
+                    return
+                count = delete_raw_keys(conn, table_name, batch)
+                self.model._written(*batch)
+                yield count
+
+        return sum(iter_parallel(delete_batches, range(concurrency)))
+
+    def count(self, approximate=False, segments=8, total_segments=None,
+              time_budget=None, capacity_budget=None, confidence=0.95):
         """Total count of the matching items.
 
         It sums up the count of partial results, and returns the total count of
         matching items in the table.
+
+        If ``approximate`` is `True`, the count of the scan is estimated and
+        returned as :data:`CountEstimate`. The count of the unfiltered scan
+        is the ``ItemCount`` of the table. The filtered scan reads
+        ``segments`` random segments of ``total_segments`` in parallel until
+        they end or the budget runs out, and the count is extrapolated from
+        the ratio of the items matched to the items read, with the error of
+        the confidence. The error is estimated from the segments read to
+        the end, and is `None` if fewer than two of them end within the
+        budget. The count is exact if the segments cover the table.
+
+        :param approximate: estimate the count of the scan if `True`.
+        :type approximate: :class:`bool`
+        :param segments: the number of the segments to sample.
+        :type segments: :class:`int`
+        :param total_segments: the number of the segments to split the table
+                               into. About :data:`ITEMS_PER_SAMPLED_SEGMENT`
+                               items per segment if omitted.
+        :type total_segments: :class:`int`
+        :param time_budget: seconds to sample at most.
+        :type time_budget: :class:`float`
+        :param capacity_budget: the read capacity units to sample at most.
+        :type capacity_budget: :class:`float`
+        :param confidence: the confidence of the error.
+        :type confidence: :class:`float`
         """
-        count = 0
-        operation = self._get_operation()
+        if approximate:
+            return self._estimate_count(segments, total_segments,
+                                        time_budget, capacity_budget,
+                                        confidence)
         kwargs = self.kwargs.copy()
         kwargs['select'] = 'COUNT'
+        return sum(result['Count'] for result in self._iter_pages(kwargs))
+
+    def _estimate_count(self, segments, total_segments, time_budget,
+                        capacity_budget, confidence):
+        if self.operation != 'scan' or 'segment' in self.kwargs:
+            raise ValueError('Only the whole scan can be counted '
+                             'approximately')
+        table = self.model._get_connection().describe_table(
+            self.model.get_table_name())['Table']
+        item_count = table.get('ItemCount', 0)
+        if not self.kwargs.get('scan_filter') and \
+                not self.kwargs.get('filter_expression'):
+            return CountEstimate(item_count, None, confidence, 'item_count', 0)
+
+        if total_segments is None:
+            total_segments = min(
+                MAX_TOTAL_SEGMENTS,
+                max(segments, item_count // ITEMS_PER_SAMPLED_SEGMENT))
+        sampled = random.sample(xrange(total_segments),
+                                min(segments, total_segments))
+        counts = dict((segment, [0, 0]) for segment in sampled)
+        deadline = None
+        if time_budget is not None:
+            deadline = time.time() + time_budget
+        stop = threading.Event()
+        consumed = [0.0]
+        lock = threading.Lock()
+
+        def count_segment(segment):
+            kwargs = dict(self.kwargs, select='COUNT', segment=segment,
+                          total_segments=total_segments)
+            result_set = ResultSet(self.model, self.operation, kwargs)
+            result_set.page_sizing = self.page_sizing
+            for result in result_set._iter_pages(kwargs.copy()):
+                # The budget is checked by each segment, so no more than
+                # a page per segment is read over the budget.
+                with lock:
+                    consumed[0] += result.get(
+                        'ConsumedCapacity', {}).get('CapacityUnits', 0)
+                    if deadline is not None and time.time() >= deadline or \
+                            capacity_budget is not None and \
+                            consumed[0] >= capacity_budget:
+                        stop.set()
+                yield segment, result
+                if stop.is_set():
+                    return
+            yield segment, None
+
+        finished = set()
+        for segment, result in iter_parallel(count_segment, sampled):
+            if result is None:
+                finished.add(segment)
+                continue
+            counts[segment][0] += result['Count']
+            counts[segment][1] += result['ScannedCount']
+
+        matched = sum(count for count, _ in counts.values())
+        scanned = sum(scanned for _, scanned in counts.values())
+        if len(finished) == total_segments:
+            return CountEstimate(matched, 0.0, confidence, 'exact', scanned)
+        if not scanned:
+            return CountEstimate(0, None, confidence, 'sample', 0)
+        # The ItemCount is stale for up to six hours.
+        item_count = max(item_count, scanned)
+        ratio = float(matched) / scanned
+        error = None
+        # The segments cut off by the budget are not clusters of the table,
+        # so only the segments read to the end estimate the variance.
+        clusters = [counts[segment] for segment in finished]
+        if len(clusters) > 1:
+            # The ratio estimator of the segments sampled as clusters.
+            mean_scanned = float(sum(scanned_count
+                                     for _, scanned_count in clusters)) / \
+                len(clusters)
+            variance = sum((count - ratio * scanned_count) ** 2
+                           for count, scanned_count in clusters) / \
+                (len(clusters) * (len(clusters) - 1) * mean_scanned ** 2)
+            variance *= max(0.0, 1 - float(scanned) / item_count)
+            error = _z_score(confidence) * item_count * math.sqrt(variance)
+        return CountEstimate(int(round(ratio * item_count)), error,
+                             confidence, 'sample', scanned)
+
+    def _iter_pages(self, kwargs, stats=None):
+        if stats is None:
+            stats = self._new_stats()
+        self.stats = stats
+        cache = self.model.query_cache
+        if cache is None:
+            for result in self._request_pages(kwargs, stats):
+                yield result
+        else:
+            key = cache.make_key(self.model.get_table_name(), self.operation,
+                                 kwargs)
+            pages = cache.get(key)
+            if pages is None:
+                # The pages are not cached if a write lands while paging.
+                generation = cache.generation(self.model.get_table_name())
+                pages = []
+                for result in self._request_pages(kwargs, stats):
+                    pages.append(result)
+                    yield result
+                cache.set(key, pages, self._get_partition(), generation)
+            else:
+                stats.cache_hit = True
+                for result in pages:
+                    stats.add_page(result)
+                    yield result
+        self._report_stats(stats)
+
+    def _request_pages(self, kwargs, stats):
+        operation = self._get_operation()
+        kwargs.setdefault('return_consumed_capacity', 'TOTAL')
+        hash_key = self._get_hash_key_value()
+        sizer = None
+        if self.page_sizing is not None:
+            sizer = PageSizer(**self.page_sizing)
         while True:
-            result = operation(self.model.get_table_name(), **kwargs)
-            count += result['Count']
+            if sizer is not None:
+                kwargs['limit'] = sizer.limit
+            started_at = time.time()
+            with self.model._sample_access(hash_key,
+                                           self.kwargs.get('index_name')):
+                result = operation(self.model.get_table_name(), **kwargs)
+            network_time = time.time() - started_at
+            stats.add_page(result, network_time, kwargs.get('limit'))
+            if sizer is not None:
+                sizer.observe(result, network_time)
+            yield result
 
             last_evaluated_key = self._get_last_key(result)
-            if last_evaluated_key:
-                kwargs['exclusive_start_key'] = last_evaluated_key
-            else:
+            if not last_evaluated_key:
                 break
-        return count
+            kwargs['exclusive_start_key'] = last_evaluated_key
+
+    def _decode(self, kwargs, decode):
+        # The stats of this run, as another run may replace self.stats.
+        stats = self._new_stats()
+        for result in self._iter_pages(kwargs, stats):
+            started_at = time.time()
+            items = [decode(raw_item) for raw_item in result.get('Items')]
+            stats.decode_time += time.time() - started_at
+            for item in items:
+                yield item
+
+    def _decode_in_session(self, session):
+        model = self.model
+        key_names = [key.name for key in model._get_keys()]
+        index_name = self.kwargs.get('index_name')
+        track = index_name is None or any(
+            index._get_index_name() == index_name and
+            index.projection_type == 'ALL'
+            for index in model._get_indexes())
+
+        def decode(raw_item):
+            raw_key = dict((name, raw_item[name]) for name in key_names)
+            known, item = session.lookup(model, raw_key)
+            if not known:
+                item = model.from_raw_data(raw_item)
+                if track:
+                    session.track(model, raw_key, item)
+            return item
+
+        for item in self._decode(self.kwargs.copy(), decode):
+            if item is not None:
+                yield item
+
+    def _new_stats(self):
+        # Measuring the size re-serializes each page, so it is done only
+        # if the stats are reported.
+        return QueryStats(
+            measure_size=conf.get('RESULT_STATS_HOOK') is not None or
+            logger.isEnabledFor(logging.DEBUG))
+
+    def _report_stats(self, stats):
+        logger.debug('%s on %s: %r', self.operation,
+                     self.model.get_table_name(), stats)
+        hook = conf.get('RESULT_STATS_HOOK')
+        if hook is not None:
+            hook(self, stats)
+
+    def _get_hash_key_value(self):
+        """The value of the hash key the query reads, of the index if it
+        queries an index.
+
+        """
+        if self.operation != 'query' or self.model.key_sampler is None:
+            return None
+        index_name = self.kwargs.get('index_name')
+        if index_name:
+            hash_key_name = None
+            for index in self.model._get_indexes():
+                if index._get_index_name() == index_name:
+                    hash_key_name = index.hash_key
+        else:
+            hash_key_name = self.model._get_hash_key().name
+        condition = self.kwargs['key_conditions'].get(hash_key_name)
+        if condition is None or condition['ComparisonOperator'] != 'EQ':
+            return None
+        return dynamodb_types.Dynamizer().decode(
+            condition['AttributeValueList'][0])
+
+    def _get_partition(self):
+        """The hash key name and its raw value if the operation queries
+        a partition of the table.
+
+        """
+        if self.operation != 'query' or self.kwargs.get('index_name'):
+            return None
+        hash_key_name = self.model._get_hash_key().name
+        condition = self.kwargs['key_conditions'].get(hash_key_name)
+        if condition is None or condition['ComparisonOperator'] != 'EQ':
+            return None
+        return hash_key_name, condition['AttributeValueList'][0]
+
+    def _iter_projected(self, fields):
+        for result in self._iter_pages(self._projected_kwargs(fields)):
+            for raw_item in result.get('Items'):
+                yield raw_item
+
+    def _projected_kwargs(self, fields):
+        kwargs = self.kwargs.copy()
+        if kwargs.get('filter_expression'):
+            # Expression and non-expression parameters can't be mixed.
+            names = dict(('#p{0}'.format(i), field)
+                         for i, field in enumerate(fields))
+            kwargs['projection_expression'] = ', '.join(sorted(names))
+            kwargs['expression_attribute_names'] = names
+        else:
+            kwargs['attributes_to_get'] = list(fields)
+        return kwargs
+
+    def _get_decoders(self, fields):
+        attributes = self.model._get_attributes()
+        try:
+            return [(field, attributes[field].decode) for field in fields]
+        except KeyError as e:
+            raise ValueError('Unknown attribute: {0}'.format(e.args[0]))
+
+    def _get_column_types(self, fields):
+        attributes = self.model._get_attributes()
+        columns = []
+        for field in fields:
+            try:
+                attr = attributes[field]
+            except KeyError:
+                raise ValueError('Unknown attribute: {0}'.format(field))
+            if isinstance(attr, NumberAttribute):
+                columns.append((field, 'd', attr.decode))
+            elif isinstance(attr, BooleanAttribute):
+                columns.append((field, 'b', attr.decode))
+            elif type(attr) is StringAttribute:
+                columns.append((field, 'S', attr.decode))
+            else:
+                columns.append((field, None, attr.decode))
+        return columns
 
     def _get_operation(self):
         return getattr(self.model._get_connection(), self.operation)
 
     def _get_last_key(self, result):
-        last_evaluated_key = result.get('LastEvaluatedKey')
-        if not last_evaluated_key:
+        # The key is passed back to the connection as it is, so it stays in
+        # the wire format.
+        return result.get('LastEvaluatedKey') or None
+
+
+class QueryStats(object):
+    """The execution statistics of a run of :class:`ResultSet`.
+
+    The summary is logged to the ``bynamodb.results`` logger at the end of
+    the run, and passed to the ``RESULT_STATS_HOOK`` setting if configured,
+    which is called with the :class:`ResultSet` and the statistics.
+
+    :param measure_size: estimate :attr:`bytes_received` if `True`.
+    :type measure_size: :class:`bool`
+
+    """
+
+    def __init__(self, measure_size=True):
+        #: (:class:`int`) The number of the pages fetched.
+        self.pages = 0
+
+        #: (:class:`int`) The number of the items returned.
+        self.count = 0
+
+        #: (:class:`int`) The number of the items read before the filter.
+        self.scanned_count = 0
+
+        #: (:class:`int`) The approximate size of the responses in bytes,
+        #: `None` if not measured.
+        self.bytes_received = 0 if measure_size else None
+
+        #: (:class:`float`) The read capacity units consumed.
+        self.consumed_capacity = 0.0
+
+        #: (:class:`float`) Seconds waiting on the network.
+        self.network_time = 0.0
+
+        #: (:class:`float`) Seconds spent decoding the items and
+        #: constructing the models.
+        self.decode_time = 0.0
+
+        #: (:class:`bool`) `True` if the pages were read from the cache.
+        self.cache_hit = False
+
+        #: (:class:`list`) The ``Limit`` of each request,
+        #: `None` if not limited.
+        self.page_sizes = []
+
+    @property
+    def filter_ratio(self):
+        """The ratio of the items returned to the items read,
+        `None` if no items were read.
+
+        """
+        if not self.scanned_count:
             return None
-        last_key = {}
-        dynamizer = Dynamizer()
-        for key, value in last_evaluated_key.items():
-            last_key[key] = dynamizer.decode(value)
-        return last_key
+        return float(self.count) / self.scanned_count
+
+    def add_page(self, result, network_time=None, limit=None):
+        """Add the page fetched. ``network_time`` is `None` if it was not
+        received from the network, and ``limit`` is the ``Limit`` of
+        the request.
+
+        """
+        self.pages += 1
+        self.count += result.get('Count', 0)
+        self.scanned_count += result.get('ScannedCount', 0)
+        if network_time is None:
+            return
+        self.page_sizes.append(limit)
+        self.network_time += network_time
+        if self.bytes_received is not None:
+            self.bytes_received += len(json.dumps(result))
+        self.consumed_capacity += \
+            result.get('ConsumedCapacity', {}).get('CapacityUnits', 0)
+
+    def as_dict(self):
+        return dict(
+            pages=self.pages,
+            count=self.count,
+            scanned_count=self.scanned_count,
+            filter_ratio=self.filter_ratio,
+            bytes_received=self.bytes_received,
+            consumed_capacity=self.consumed_capacity,
+            network_time=self.network_time,
+            decode_time=self.decode_time,
+            cache_hit=self.cache_hit,
+            page_sizes=list(self.page_sizes)
+        )
+
+    def __repr__(self):
+        return (
+            '<QueryStats pages={0.pages} count={0.count} '
+            'scanned_count={0.scanned_count} '
+            'bytes_received={0.bytes_received} '
+            'consumed_capacity={0.consumed_capacity} '
+            'network_time={0.network_time:.3f} '
+            'decode_time={0.decode_time:.3f}>'.format(self)
+        )
+
+
+class PageSizer(object):
+    """Choose the ``Limit`` of each page from the latency and the consumed
+    capacity per item read in the previous pages.
+
+    The costs per item are smoothed over the pages, and the limit grows
+    at most twice per page, so a single fast page doesn't overshoot.
+
+    :param target_latency: seconds to aim each request at.
+    :type target_latency: :class:`float`
+    :param target_capacity: the read capacity units to aim each request at.
+    :type target_capacity: :class:`float`
+    :param initial_limit: the limit of the first page.
+    :param min_limit: the smallest limit to choose.
+    :param max_limit: the largest limit to choose. Unbounded if omitted,
+                      DynamoDB still stops each page at 1 MB.
+
+    """
+
+    #: (:class:`float`) The weight of the latest page in the smoothed costs.
+    smoothing = 0.5
+
+    #: (:class:`int`) The factor the limit grows by at most per page.
+    max_growth = 2
+
+    def __init__(self, target_latency=None, target_capacity=None,
+                 initial_limit=100, min_limit=1, max_limit=None):
+        if target_latency is None and target_capacity is None:
+            raise ValueError('target_latency or target_capacity is required')
+        self.target_latency = target_latency
+        self.target_capacity = target_capacity
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        #: (:class:`int`) The limit of the next page.
+        self.limit = self._clamp(initial_limit)
+        self._item_latency = None
+        self._item_capacity = None
+
+    def observe(self, result, latency):
+        """Update the limit with the raw result of a page and the seconds
+        it took.
+
+        """
+        scanned = result.get('ScannedCount', result.get('Count', 0))
+        if not scanned:
+            return
+        self._item_latency = self._smooth(self._item_latency,
+                                          latency / scanned)
+        capacity = result.get('ConsumedCapacity', {}).get('CapacityUnits')
+        if capacity is not None:
+            self._item_capacity = self._smooth(self._item_capacity,
+                                               float(capacity) / scanned)
+        limits = [self.limit * self.max_growth]
+        if self.target_latency is not None and self._item_latency:
+            limits.append(self.target_latency / self._item_latency)
+        if self.target_capacity is not None and self._item_capacity:
+            limits.append(self.target_capacity / self._item_capacity)
+        self.limit = self._clamp(int(min(limits)))
+
+    def _smooth(self, average, value):
+        if average is None:
+            return value
+        return self.smoothing * value + (1 - self.smoothing) * average
+
+    def _clamp(self, limit):
+        limit = max(self.min_limit, limit)
+        if self.max_limit is not None:
+            limit = min(self.max_limit, limit)
+        return limit
+
+
+_MISSING = {'d': float('nan'), 'b': -1}
+
+
+def _iter_column_chunks(raw_items, columns, chunk_size):
+    """Decode the raw items straight into the preallocated columns."""
+    def allocate():
+        return dict(
+            (field, array(typecode, [_MISSING[typecode]]) * chunk_size
+             if typecode in _MISSING else [None] * chunk_size)
+            for field, typecode, _ in columns
+        )
+
+    chunk = allocate()
+    size = 0
+    for raw_item in raw_items:
+        for field, typecode, decode in columns:
+            value = raw_item.get(field)
+            if value is None:
+                continue
+            if typecode == 'd':
+                value = float(value['N'])
+            elif typecode == 'b':
+                value = value['BOOL']
+            elif typecode == 'S':
+                value = value['S']
+            else:
+                value = decode(value)
+            chunk[field][size] = value
+        size += 1
+        if size == chunk_size:
+            yield chunk
+            chunk = allocate()
+            size = 0
+    if size:
+        for column in chunk.values():
+            del column[size:]
+        yield chunk
+
+
+def _z_score(confidence):
+    """The z-score of the two-sided confidence of the normal
+    distribution.
+
+    """
+    target = (1 + confidence) / 2.0
+    low, high = 0.0, 10.0
+    for _ in range(60):
+        middle = (low + high) / 2
+        if 0.5 * (1 + math.erf(middle / math.sqrt(2))) < target:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+def _reset_connection(model):
+    """Make the worker process open its own connection."""
+    model._conn = None
+
+
+def _process_segment(task):
+    result_set, func, reducer, initializer = task
+    results = (func(item) for item in result_set)
+    if reducer is None:
+        return list(results)
+    return reduce(reducer, results, initializer)
+
+
+def iter_parallel(func, args):
+    """Iterate the results of the generator ``func`` over each of ``args``
+    running in its own thread, in the order they are produced.
+
+    The threads stop at their next result once the iteration is closed or
+    raises, so a consumer stopping early doesn't leave them blocked.
+
+    """
+    queue = Queue(maxsize=len(args) * 2)
+    stopped = threading.Event()
+    done = object()
+
+    def put(entry):
+        while not stopped.is_set():
+            try:
+                queue.put(entry, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def run(arg):
+        results = None
+        try:
+            results = func(arg)
+            for result in results:
+                if not put((result, None)):
+                    break
+        except Exception:
+            put((None, sys.exc_info()))
+        finally:
+            if hasattr(results, 'close'):
+                results.close()
+            put((done, None))
+
+    threads = [threading.Thread(target=run, args=(arg,)) for arg in args]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    try:
+        running = len(threads)
+        while running:
+            result, exc_info = queue.get()
+            if exc_info is not None:
+                raise exc_info[0], exc_info[1], exc_info[2]
+            if result is done:
+                running -= 1
+            else:
+                yield result
+    finally:
+        stopped.set()
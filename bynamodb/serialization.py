@@ -0,0 +1,364 @@
+import struct
+import zlib
+from decimal import Decimal
+
+from .attributes import (BinaryAttribute, BooleanAttribute, NumberAttribute,
+                         StringAttribute)
+from .exceptions import SchemaMismatchException
+from .lazy import dynamodb_types
+
+
+#: (:class:`int`) The version of the format written in the header.
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct('>BI')
+_BYTES_OF = [chr(i) for i in range(256)]
+_DOUBLE = struct.Struct('>d')
+
+# The tags of the values not typed by the attribute declarations.
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _DECIMAL, _BYTES, _UNICODE, _LIST, \
+    _MAP, _SET, _BINARY = [chr(i) for i in range(12)]
+
+
+class ModelSerializer(object):
+    """Serialize the objects of the model to a compact binary format.
+
+    The values are written positionally in the order of the attribute
+    names after a bitmap of the attributes present, so the names are not
+    repeated in each payload. The strings, booleans and binaries are
+    written as their attributes declare, and the other values are tagged
+    with their types. The header has the format version and the
+    fingerprint of the schema, and a payload of another schema is rejected.
+
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.fields = sorted(model._get_attributes().items())
+        self.fingerprint = schema_fingerprint(model)
+        self._header = _HEADER.pack(FORMAT_VERSION, self.fingerprint)
+        self._writers = [(name, _get_writer(attr))
+                         for name, attr in self.fields]
+        self._readers = [(name, _get_reader(attr))
+                         for name, attr in self.fields]
+        self._bitmap_size = (len(self.fields) + 7) // 8
+
+    def dumps(self, item):
+        chunks = [self._header, None]
+        bitmap = 0
+        data = item._data
+        raw = item._raw
+        for i, (name, write) in enumerate(self._writers):
+            value = getattr(item, name) if name in raw else data.get(name)
+            if value is None:
+                continue
+            bitmap |= 1 << i
+            write(value, chunks)
+        chunks[1] = _pack_bitmap(bitmap, self._bitmap_size)
+        return ''.join(chunks)
+
+    def loads(self, data):
+        if len(data) < _HEADER.size:
+            raise SchemaMismatchException('The payload has no header')
+        version, fingerprint = _HEADER.unpack_from(data)
+        if version != FORMAT_VERSION or fingerprint != self.fingerprint:
+            raise SchemaMismatchException(
+                'The payload was dumped with another schema of {0}'.format(
+                    self.model.__name__))
+        offset = _HEADER.size
+        _check_size(data, offset, self._bitmap_size)
+        bitmap = _unpack_bitmap(data[offset:offset + self._bitmap_size])
+        offset += self._bitmap_size
+        values = {}
+        for i, (name, read) in enumerate(self._readers):
+            if bitmap & (1 << i):
+                values[name], offset = read(data, offset)
+        if offset != len(data):
+            # Concatenated or corrupted payloads would load silently.
+            raise ValueError('{0} bytes are left after the item'.format(
+                len(data) - offset))
+        item = self.model.__new__(self.model)
+        item._data = values
+        item._raw = {}
+        return item
+
+
+def dumps_value(value):
+    """Serialize the plain value, such as a raw item of the table, with the
+    tags of its types. The format has only data, so loading a payload never
+    runs code.
+
+    """
+    chunks = []
+    _write_value(value, chunks)
+    return ''.join(chunks)
+
+
+def loads_value(data):
+    """Load the value serialized by :func:`dumps_value`.
+
+    :raises: :class:`~bynamodb.exceptions.SchemaMismatchException`
+             if the payload is not a value or is truncated.
+
+    """
+    if not data:
+        raise SchemaMismatchException('The payload is empty')
+    value, offset = _read_value(data, 0)
+    if offset != len(data):
+        raise SchemaMismatchException('The payload has trailing data')
+    return value
+
+
+def schema_fingerprint(model):
+    """The CRC32 of the attribute names and types of the model."""
+    schema = '|'.join(
+        '{0}:{1}:{2}'.format(name, attr.__class__.__name__, attr.type)
+        for name, attr in sorted(model._get_attributes().items())
+    )
+    return zlib.crc32(schema) & 0xffffffff
+
+
+def _get_writer(attr):
+    attr_type = type(attr)
+    if attr_type is StringAttribute:
+        return _write_unicode
+    if attr_type is BooleanAttribute:
+        return _write_bool
+    if attr_type is BinaryAttribute:
+        return _write_bytes
+    return _write_value
+
+
+def _get_reader(attr):
+    attr_type = type(attr)
+    if attr_type is StringAttribute:
+        return _read_unicode
+    if attr_type is BooleanAttribute:
+        return _read_bool
+    if attr_type is BinaryAttribute:
+        return _read_bytes
+    return _read_value
+
+
+def _pack_bitmap(bitmap, size):
+    return ''.join(chr((bitmap >> (8 * i)) & 0xff) for i in range(size))
+
+
+def _unpack_bitmap(data):
+    bitmap = 0
+    for i, byte in enumerate(data):
+        bitmap |= ord(byte) << (8 * i)
+    return bitmap
+
+
+def _check_size(data, offset, size):
+    if offset + size > len(data):
+        raise SchemaMismatchException('The payload is truncated')
+
+
+def _write_varint(n, chunks):
+    while n > 0x7f:
+        chunks.append(_BYTES_OF[n & 0x7f | 0x80])
+        n >>= 7
+    chunks.append(_BYTES_OF[n])
+
+
+def _read_varint(data, offset):
+    n = shift = 0
+    while True:
+        _check_size(data, offset, 1)
+        byte = ord(data[offset])
+        offset += 1
+        n |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return n, offset
+        shift += 7
+
+
+def _write_bytes(value, chunks):
+    _write_varint(len(value), chunks)
+    chunks.append(value)
+
+
+def _read_bytes(data, offset):
+    size, offset = _read_varint(data, offset)
+    _check_size(data, offset, size)
+    return data[offset:offset + size], offset + size
+
+
+def _write_unicode(value, chunks):
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    _write_bytes(value, chunks)
+
+
+def _read_unicode(data, offset):
+    value, offset = _read_bytes(data, offset)
+    return value.decode('utf-8'), offset
+
+
+def _write_bool(value, chunks):
+    chunks.append(_TRUE if value else _FALSE)
+
+
+def _read_bool(data, offset):
+    _check_size(data, offset, 1)
+    return data[offset] == _TRUE, offset + 1
+
+
+def _write_value(value, chunks):
+    try:
+        write = _VALUE_WRITERS[type(value)]
+    except KeyError:
+        if not isinstance(value, dynamodb_types.Binary):
+            raise TypeError('Cannot serialize {0!r}'.format(value))
+        write = _write_binary
+    write(value, chunks)
+
+
+def _read_value(data, offset):
+    _check_size(data, offset, 1)
+    try:
+        read = _VALUE_READERS[data[offset]]
+    except KeyError:
+        raise SchemaMismatchException(
+            'Unknown tag: {0!r}'.format(data[offset]))
+    return read(data, offset + 1)
+
+
+def _write_none(value, chunks):
+    chunks.append(_NONE)
+
+
+def _write_tagged_bool(value, chunks):
+    chunks.append(_TRUE if value else _FALSE)
+
+
+def _write_int(value, chunks):
+    chunks.append(_INT)
+    # Zigzag, so the small negative numbers stay short.
+    _write_varint(value * 2 if value >= 0 else -value * 2 - 1, chunks)
+
+
+def _read_int(data, offset):
+    n, offset = _read_varint(data, offset)
+    return (n >> 1 if not n & 1 else -((n + 1) >> 1)), offset
+
+
+def _write_float(value, chunks):
+    chunks.append(_FLOAT)
+    chunks.append(_DOUBLE.pack(value))
+
+
+def _read_float(data, offset):
+    _check_size(data, offset, _DOUBLE.size)
+    return _DOUBLE.unpack_from(data, offset)[0], offset + _DOUBLE.size
+
+
+def _write_decimal(value, chunks):
+    chunks.append(_DECIMAL)
+    _write_bytes(str(value), chunks)
+
+
+def _read_decimal(data, offset):
+    value, offset = _read_bytes(data, offset)
+    return Decimal(value), offset
+
+
+def _write_tagged_bytes(value, chunks):
+    chunks.append(_BYTES)
+    _write_bytes(value, chunks)
+
+
+def _write_tagged_unicode(value, chunks):
+    chunks.append(_UNICODE)
+    _write_bytes(value.encode('utf-8'), chunks)
+
+
+def _write_binary(value, chunks):
+    chunks.append(_BINARY)
+    _write_bytes(value.value, chunks)
+
+
+def _read_binary(data, offset):
+    value, offset = _read_bytes(data, offset)
+    return dynamodb_types.Binary(value), offset
+
+
+def _write_list(value, chunks):
+    chunks.append(_LIST)
+    _write_elems(value, chunks)
+
+
+def _write_set(value, chunks):
+    chunks.append(_SET)
+    _write_elems(value, chunks)
+
+
+def _write_elems(value, chunks):
+    _write_varint(len(value), chunks)
+    for elem in value:
+        _write_value(elem, chunks)
+
+
+def _read_list(data, offset):
+    size, offset = _read_varint(data, offset)
+    elems = []
+    for _ in xrange(size):
+        elem, offset = _read_value(data, offset)
+        elems.append(elem)
+    return elems, offset
+
+
+def _read_set(data, offset):
+    elems, offset = _read_list(data, offset)
+    return set(elems), offset
+
+
+def _write_map(value, chunks):
+    chunks.append(_MAP)
+    _write_varint(len(value), chunks)
+    for key, elem in value.iteritems():
+        _write_value(key, chunks)
+        _write_value(elem, chunks)
+
+
+def _read_map(data, offset):
+    size, offset = _read_varint(data, offset)
+    value = {}
+    for _ in xrange(size):
+        key, offset = _read_value(data, offset)
+        value[key], offset = _read_value(data, offset)
+    return value, offset
+
+
+_VALUE_WRITERS = {
+    type(None): _write_none,
+    bool: _write_tagged_bool,
+    int: _write_int,
+    long: _write_int,
+    float: _write_float,
+    Decimal: _write_decimal,
+    str: _write_tagged_bytes,
+    unicode: _write_tagged_unicode,
+    list: _write_list,
+    tuple: _write_list,
+    dict: _write_map,
+    set: _write_set,
+    frozenset: _write_set,
+}
+
+_VALUE_READERS = {
+    _NONE: lambda data, offset: (None, offset),
+    _FALSE: lambda data, offset: (False, offset),
+    _TRUE: lambda data, offset: (True, offset),
+    _INT: _read_int,
+    _FLOAT: _read_float,
+    _DECIMAL: _read_decimal,
+    _BYTES: _read_bytes,
+    _UNICODE: _read_unicode,
+    _LIST: _read_list,
+    _MAP: _read_map,
+    _SET: _read_set,
+    _BINARY: _read_binary,
+}
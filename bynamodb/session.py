@@ -0,0 +1,237 @@
+import threading
+from collections import OrderedDict
+
+from .batch import BatchWriter, _key_id
+from .exceptions import ItemNotFoundException, NullAttributeException
+
+
+_local = threading.local()
+
+
+def current_session():
+    """The innermost :class:`Session` of the thread, `None` if there is
+    no session.
+
+    """
+    sessions = getattr(_local, 'sessions', None)
+    return sessions[-1] if sessions else None
+
+
+class Session(object):
+    """The unit of work mapping each key to a single model object.
+
+    In the context of a session, :meth:`~bynamodb.model.Model.get_item`
+    and :func:`~bynamodb.batch.batch_get` return the objects the session
+    already has without a request, including the keys known to have no
+    item, and the queries and the scans return its objects for the keys
+    it has. :meth:`~bynamodb.model.Model.save`,
+    :meth:`~bynamodb.model.Model.put_item` and
+    :meth:`~bynamodb.model.Model.delete` are deferred to :meth:`commit`,
+    which writes them with the objects changed since they were loaded in
+    BatchWriteItem requests. The session is committed when its context
+    exits, or discarded if it exits with an exception. The objects with
+    conditions or versions are written one by one with their checks
+    before the others. The commit writes right away even if the model has
+    a :attr:`~bynamodb.model.Model.write_buffer`, after flushing the
+    buffer, and invalidates the
+    :attr:`~bynamodb.model.Model.query_cache` as the other writes do.
+
+    .. code-block:: python
+
+       with Session():
+           user = User.get_item(user_id)
+           user.visits += 1
+           # No request, the same object
+           assert User.get_item(user_id) is user
+
+    The sessions are thread-local, and a nested session has its own
+    objects.
+
+    """
+
+    def __init__(self):
+        self._items = OrderedDict()
+        self._snapshots = {}
+        self._pending = set()
+        self._deleted = OrderedDict()
+        self._conditions = {}
+
+    def __enter__(self):
+        sessions = getattr(_local, 'sessions', None)
+        if sessions is None:
+            sessions = _local.sessions = []
+        sessions.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _local.sessions.remove(self)
+        try:
+            if exc_type is None:
+                self.commit()
+        finally:
+            self.clear()
+
+    def get(self, model, hash_key, range_key=None):
+        """Get the item of the key, from the session if it has the key.
+
+        :raises: :class:`~bynamodb.exceptions.ItemNotFoundException`
+                 if the table has no item of the key.
+
+        """
+        raw_key = model._encode_key(hash_key, range_key)
+        known, item = self.lookup(model, raw_key)
+        if not known:
+            try:
+                item = model._load_item(hash_key, range_key)
+            except ItemNotFoundException:
+                self.track(model, raw_key, None)
+                raise
+            self.track(model, raw_key, item)
+        if item is None:
+            raise ItemNotFoundException
+        return item
+
+    def lookup(self, model, raw_key):
+        """The tuple of whether the session knows the raw key of the model,
+        and its object or `None` if it has no item.
+
+        """
+        ident = model, _key_id(raw_key)
+        if ident not in self._items:
+            return False, None
+        return True, self._items[ident]
+
+    def track(self, model, raw_key, item):
+        """Map the raw key of the model to the object loaded, or to `None`
+        if the table has no item of the key.
+
+        """
+        ident = model, _key_id(raw_key)
+        self._items[ident] = item
+        self._snapshots[ident] = None if item is None else _snapshot(item)
+
+    def add(self, item, condition=None):
+        """Map the key of the object to it, and put it at :meth:`commit`
+        if the item in the table meets the condition.
+
+        :raises: :exc:`ValueError` if the session has another object of
+                 the key with changes not committed.
+
+        """
+        ident = _ident(item)
+        tracked = self._items.get(ident)
+        if tracked is not None and tracked is not item and \
+                self._is_dirty(ident):
+            raise ValueError(
+                'The session has another object of the key with changes '
+                'not committed')
+        self._items[ident] = item
+        self._pending.add(ident)
+        self._deleted.pop(ident, None)
+        self._set_condition(ident, condition)
+
+    def delete(self, item, condition=None):
+        """Delete the item of the object at :meth:`commit` if the item
+        in the table meets the condition.
+
+        """
+        ident = _ident(item)
+        self._items[ident] = None
+        self._pending.discard(ident)
+        self._deleted[ident] = item
+        self._set_condition(ident, condition)
+
+    def is_dirty(self, item):
+        """`True` if the object will be put at :meth:`commit`."""
+        return self._is_dirty(_ident(item))
+
+    @property
+    def dirty(self):
+        """The list of the objects to be put at :meth:`commit`."""
+        return [item for ident, item in self._items.items()
+                if self._is_dirty(ident)]
+
+    def commit(self):
+        """Put the objects added or changed, and delete the objects deleted
+        in BatchWriteItem requests.
+
+        The objects with conditions or versions are written first, one by
+        one, and the commit stops at the first check failed.
+
+        :raises: :class:`~bynamodb.exceptions.ConditionFailedException`
+                 if a condition is not met.
+
+        """
+        dirty = [(ident, item) for ident, item in self._items.items()
+                 if self._is_dirty(ident)]
+        # The writes buffered before the session go out first.
+        models = set(ident[0] for ident, _ in dirty)
+        models.update(ident[0] for ident in self._deleted)
+        for model in models:
+            if model.write_buffer is not None:
+                model.write_buffer.flush()
+        for ident, item in dirty:
+            if self._is_checked(ident):
+                ident[0]._write_item(item, self._conditions.get(ident))
+                self._written(ident, _snapshot(item))
+        for ident, item in list(self._deleted.items()):
+            if self._is_checked(ident):
+                ident[0]._delete_item(item, self._conditions.get(ident))
+                self._written(ident, None)
+        dirty = [(ident, item) for ident, item in dirty
+                 if self._is_dirty(ident)]
+        with BatchWriter() as writer:
+            for _, item in dirty:
+                writer.put(item)
+            for item in self._deleted.values():
+                writer.delete(item)
+        for ident, item in dirty:
+            self._written(ident, _snapshot(item))
+        for ident in list(self._deleted):
+            self._written(ident, None)
+
+    def clear(self):
+        """Forget the objects and the changes not committed."""
+        self._items.clear()
+        self._snapshots.clear()
+        self._pending.clear()
+        self._deleted.clear()
+        self._conditions.clear()
+
+    def _set_condition(self, ident, condition):
+        if condition is None:
+            self._conditions.pop(ident, None)
+        else:
+            self._conditions[ident] = condition
+
+    def _is_checked(self, ident):
+        return ident in self._conditions or \
+            ident[0]._version_attribute is not None
+
+    def _written(self, ident, snapshot):
+        self._snapshots[ident] = snapshot
+        self._pending.discard(ident)
+        self._deleted.pop(ident, None)
+        self._conditions.pop(ident, None)
+
+    def _is_dirty(self, ident):
+        item = self._items.get(ident)
+        if item is None:
+            return False
+        if ident in self._pending:
+            return True
+        return _snapshot(item) != self._snapshots.get(ident)
+
+
+def _ident(item):
+    model = item.__class__
+    raw_key = model._encode_key(
+        *[getattr(item, key.name) for key in model._get_keys()])
+    return model, _key_id(raw_key)
+
+
+def _snapshot(item):
+    try:
+        return item._encode_item(item)
+    except NullAttributeException:
+        return None
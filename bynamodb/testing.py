@@ -0,0 +1,447 @@
+import copy
+import random
+import threading
+import time
+
+from boto.dynamodb.types import Dynamizer
+from boto.dynamodb2.exceptions import (ProvisionedThroughputExceededException,
+                                       ResourceNotFoundException)
+
+from .capacity import item_size, read_units, write_units
+
+
+class SlowConnection(object):
+    """The stand-in of :class:`boto.dynamodb2.layer1.DynamoDBConnection`
+    delaying and failing the requests to the connection it wraps, to test
+    the behavior under the slow and the throttled responses against
+    the local DynamoDB.
+
+    .. code-block:: python
+
+       Model._conn = SlowConnection(DynamoDBConnection(), latency=0.001,
+                                    slow_ratio=0.01, slow_latency=0.5)
+
+    :param conn: the connection to send the requests.
+    :param latency: seconds to delay every request, or the function taking
+                    the operation name and returning the seconds.
+    :param slow_ratio: the ratio of the requests delayed more.
+    :type slow_ratio: :class:`float`
+    :param slow_latency: seconds to delay the slow requests more.
+    :type slow_latency: :class:`float`
+    :param error_ratio: the ratio of the requests failed with
+                        :exc:`ProvisionedThroughputExceededException`.
+    :type error_ratio: :class:`float`
+    :param seed: the seed of the random delays and errors.
+
+    """
+
+    def __init__(self, conn, latency=0.0, slow_ratio=0.0, slow_latency=0.0,
+                 error_ratio=0.0, seed=None):
+        self.conn = conn
+        self.latency = latency
+        self.slow_ratio = slow_ratio
+        self.slow_latency = slow_latency
+        self.error_ratio = error_ratio
+        #: (:class:`list`) The operation names of the requests sent.
+        self.calls = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self.conn, name)
+        if not callable(attr) or name.startswith('_'):
+            return attr
+
+        def call(*args, **kwargs):
+            delay, fail = self._plan(name)
+            if delay:
+                time.sleep(delay)
+            if fail:
+                raise ProvisionedThroughputExceededException(
+                    400, 'Bad Request', {
+                        '__type': 'com.amazonaws.dynamodb.v20120810#'
+                                  'ProvisionedThroughputExceededException',
+                        'message': 'Injected by SlowConnection'
+                    })
+            return attr(*args, **kwargs)
+        return call
+
+    def _plan(self, name):
+        with self._lock:
+            self.calls.append(name)
+            delay = self.latency(name) if callable(self.latency) \
+                else self.latency
+            if self._random.random() < self.slow_ratio:
+                delay += self.slow_latency
+            fail = self._random.random() < self.error_ratio
+        return delay, fail
+
+
+class MemoryConnection(object):
+    """The stand-in of :class:`boto.dynamodb2.layer1.DynamoDBConnection`
+    keeping the tables in the memory, to run the models without DynamoDB.
+
+    The requests of a single item, the batch requests, the queries of
+    the tables and the indexes, and the scans are supported. They match
+    the key conditions and the ``QueryFilter``/``ScanFilter`` conditions,
+    not the filter expressions, and return all the matched items in a page
+    unless ``limit`` is given. The capacity consumed is estimated from the
+    sizes of the items, and the provisioned throughput is kept to be
+    described and updated. Wrap it with :class:`SlowConnection` to add
+    the latency of the network.
+
+    .. code-block:: python
+
+       Event._conn = SlowConnection(MemoryConnection(), latency=0.002)
+       Event.create_table()
+
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self._dynamizer = Dynamizer()
+        self._lock = threading.Lock()
+
+    def create_table(self, table_name, key_schema,
+                     provisioned_throughput=None,
+                     local_secondary_indexes=None,
+                     global_secondary_indexes=None, **kwargs):
+        indexes = [{
+            'IndexName': index['IndexName'],
+            'IndexStatus': 'ACTIVE',
+            'KeySchema': index['KeySchema'],
+            'ProvisionedThroughput': _throughput(
+                index.get('ProvisionedThroughput'))
+        } for index in global_secondary_indexes or []]
+        index_keys = dict(
+            (index['IndexName'],
+             [key['AttributeName'] for key in index['KeySchema']])
+            for index in (local_secondary_indexes or []) + indexes)
+        with self._lock:
+            self.tables[table_name] = {
+                'keys': [key['AttributeName'] for key in key_schema],
+                'index_keys': index_keys,
+                'items': {},
+                # The items of each hash key, so the queries don't scan.
+                'partitions': {},
+                'throughput': _throughput(provisioned_throughput),
+                'indexes': indexes
+            }
+
+    def delete_table(self, table_name):
+        with self._lock:
+            self._get_table(table_name)
+            del self.tables[table_name]
+
+    def list_tables(self, **kwargs):
+        return {'TableNames': sorted(self.tables)}
+
+    def describe_table(self, table_name):
+        table = self._get_table(table_name)
+        with self._lock:
+            description = {
+                'TableName': table_name,
+                'TableStatus': 'ACTIVE',
+                'ItemCount': len(table['items']),
+                'ProvisionedThroughput': dict(table['throughput'])
+            }
+            if table['indexes']:
+                description['GlobalSecondaryIndexes'] = copy.deepcopy(
+                    table['indexes'])
+        return {'Table': description}
+
+    def update_table(self, table_name, provisioned_throughput=None,
+                     global_secondary_index_updates=None, **kwargs):
+        table = self._get_table(table_name)
+        indexes = dict((index['IndexName'], index)
+                       for index in table['indexes'])
+        with self._lock:
+            if provisioned_throughput is not None:
+                _update_throughput(table['throughput'],
+                                   provisioned_throughput)
+            for update in global_secondary_index_updates or []:
+                update = update['Update']
+                _update_throughput(
+                    indexes[update['IndexName']]['ProvisionedThroughput'],
+                    update['ProvisionedThroughput'])
+        return self.describe_table(table_name)
+
+    def put_item(self, table_name, item, return_consumed_capacity=None,
+                 **kwargs):
+        table = self._get_table(table_name)
+        key_id = self._key_id(table, item)
+        item = copy.deepcopy(item)
+        with self._lock:
+            table['items'][key_id] = item
+            table['partitions'].setdefault(key_id[0], {})[key_id] = item
+        return self._consumed({}, table_name, return_consumed_capacity,
+                              *self._write_units(table, item))
+
+    def get_item(self, table_name, key, consistent_read=False,
+                 return_consumed_capacity=None, **kwargs):
+        table = self._get_table(table_name)
+        with self._lock:
+            item = table['items'].get(self._key_id(table, key))
+        result = {}
+        if item is not None:
+            result['Item'] = copy.deepcopy(item)
+        units = read_units(item_size(item or {}), consistent_read)
+        return self._consumed(result, table_name, return_consumed_capacity,
+                              units)
+
+    def delete_item(self, table_name, key, return_consumed_capacity=None,
+                    **kwargs):
+        table = self._get_table(table_name)
+        key_id = self._key_id(table, key)
+        with self._lock:
+            item = table['items'].pop(key_id, None)
+            table['partitions'].get(key_id[0], {}).pop(key_id, None)
+        return self._consumed({}, table_name, return_consumed_capacity,
+                              *self._write_units(table, item or key))
+
+    def batch_write_item(self, request_items, return_consumed_capacity=None,
+                         **kwargs):
+        consumed = []
+        for table_name, requests in request_items.items():
+            table_units = 0
+            index_units = {}
+            for request in requests:
+                if 'PutRequest' in request:
+                    result = self.put_item(table_name,
+                                           request['PutRequest']['Item'],
+                                           return_consumed_capacity='INDEXES')
+                else:
+                    result = self.delete_item(
+                        table_name, request['DeleteRequest']['Key'],
+                        return_consumed_capacity='INDEXES')
+                capacity = result['ConsumedCapacity']
+                table_units += capacity['Table']['CapacityUnits']
+                for name, index in capacity.get('GlobalSecondaryIndexes',
+                                                {}).items():
+                    index_units[name] = index_units.get(name, 0) + \
+                        index['CapacityUnits']
+            capacity = self._consumed({}, table_name,
+                                      return_consumed_capacity, table_units,
+                                      index_units).get('ConsumedCapacity')
+            if capacity is not None:
+                consumed.append(capacity)
+        result = {'UnprocessedItems': {}}
+        if consumed:
+            result['ConsumedCapacity'] = consumed
+        return result
+
+    def batch_get_item(self, request_items, return_consumed_capacity=None,
+                       **kwargs):
+        responses = {}
+        consumed = []
+        for table_name, request in request_items.items():
+            units = 0
+            items = responses[table_name] = []
+            for key in request['Keys']:
+                result = self.get_item(
+                    table_name, key,
+                    consistent_read=request.get('ConsistentRead', False),
+                    return_consumed_capacity='TOTAL')
+                units += result['ConsumedCapacity']['CapacityUnits']
+                if 'Item' in result:
+                    items.append(result['Item'])
+            capacity = self._consumed({}, table_name,
+                                      return_consumed_capacity,
+                                      units).get('ConsumedCapacity')
+            if capacity is not None:
+                consumed.append(capacity)
+        result = {'Responses': responses, 'UnprocessedKeys': {}}
+        if consumed:
+            result['ConsumedCapacity'] = consumed
+        return result
+
+    def query(self, table_name, key_conditions=None, index_name=None,
+              query_filter=None, limit=None, exclusive_start_key=None,
+              select=None, scan_index_forward=True, consistent_read=False,
+              return_consumed_capacity=None, **kwargs):
+        table = self._get_table(table_name)
+        key_names = self._key_names(table, index_name)
+        key_conditions = key_conditions or {}
+        hash_condition = key_conditions.get(key_names[0], {})
+        with self._lock:
+            if index_name is None and \
+                    hash_condition.get('ComparisonOperator') == 'EQ':
+                hash_value = self._dynamizer.decode(
+                    hash_condition['AttributeValueList'][0])
+                items = table['partitions'].get(hash_value, {}).values()
+            else:
+                items = table['items'].values()
+        items = [item for item in items
+                 if self._match(key_conditions, item)]
+        return self._page(table, table_name, items, key_names, query_filter,
+                          limit, exclusive_start_key, select,
+                          not scan_index_forward, consistent_read,
+                          return_consumed_capacity)
+
+    def scan(self, table_name, scan_filter=None, segment=None,
+             total_segments=None, limit=None, exclusive_start_key=None,
+             select=None, index_name=None, consistent_read=False,
+             return_consumed_capacity=None, **kwargs):
+        table = self._get_table(table_name)
+        key_names = self._key_names(table, index_name)
+        with self._lock:
+            items = table['items'].values()
+        if index_name is not None:
+            items = [item for item in items
+                     if all(name in item for name in key_names)]
+        if total_segments is not None:
+            items = [item for item in items
+                     if hash(self._key_id(table, item)[0]) % total_segments ==
+                     segment]
+        return self._page(table, table_name, items, key_names, scan_filter,
+                          limit, exclusive_start_key, select, False,
+                          consistent_read, return_consumed_capacity)
+
+    def _get_table(self, table_name):
+        try:
+            return self.tables[table_name]
+        except KeyError:
+            raise ResourceNotFoundException(
+                400, 'Bad Request', {
+                    '__type': 'com.amazonaws.dynamodb.v20120810#'
+                              'ResourceNotFoundException',
+                    'message': 'Requested resource not found: '
+                               'Table: {0} not found'.format(table_name)
+                })
+
+    def _key_names(self, table, index_name):
+        """The names of the key attributes of the table or the index to
+        sort its items by, with the table keys breaking the ties.
+
+        """
+        if index_name is None:
+            return table['keys']
+        try:
+            index_keys = table['index_keys'][index_name]
+        except KeyError:
+            raise ValueError('The index {0} is not defined'.format(
+                index_name))
+        return index_keys + [name for name in table['keys']
+                             if name not in index_keys]
+
+    def _page(self, table, table_name, items, key_names, conditions, limit,
+              exclusive_start_key, select, reverse, consistent_read,
+              return_consumed_capacity):
+        """The result of a query or a scan returning the page of the items
+        after ``exclusive_start_key`` in the order of ``key_names``.
+
+        """
+        def sort_key(item):
+            return tuple(self._dynamizer.decode(item[name])
+                         for name in key_names)
+
+        items = sorted((item for item in items
+                        if all(name in item for name in key_names)),
+                       key=sort_key, reverse=reverse)
+        if exclusive_start_key:
+            start = sort_key(exclusive_start_key)
+            items = [item for item in items
+                     if (sort_key(item) < start if reverse
+                         else sort_key(item) > start)]
+        result = {}
+        if limit is not None and len(items) > limit:
+            items = items[:limit]
+            result['LastEvaluatedKey'] = dict(
+                (name, items[-1][name]) for name in key_names)
+        matched = [item for item in items
+                   if self._match(conditions or {}, item)]
+        result['Count'] = len(matched)
+        result['ScannedCount'] = len(items)
+        if select != 'COUNT':
+            result['Items'] = copy.deepcopy(matched)
+        units = read_units(sum(item_size(item) for item in items),
+                           consistent_read)
+        return self._consumed(result, table_name, return_consumed_capacity,
+                              units)
+
+    def _write_units(self, table, item):
+        units = write_units(item_size(item))
+        index_units = {}
+        for index in table['indexes']:
+            key_names = [key['AttributeName'] for key in index['KeySchema']]
+            if all(name in item for name in key_names):
+                index_units[index['IndexName']] = units
+        return units, index_units
+
+    def _consumed(self, result, table_name, return_consumed_capacity,
+                  units, index_units=None):
+        if return_consumed_capacity not in ('TOTAL', 'INDEXES'):
+            return result
+        index_units = index_units or {}
+        capacity = {
+            'TableName': table_name,
+            'CapacityUnits': units + sum(index_units.values())
+        }
+        if return_consumed_capacity == 'INDEXES':
+            capacity['Table'] = {'CapacityUnits': units}
+            if index_units:
+                capacity['GlobalSecondaryIndexes'] = dict(
+                    (name, {'CapacityUnits': index})
+                    for name, index in index_units.items())
+        result['ConsumedCapacity'] = capacity
+        return result
+
+    def _key_id(self, table, item):
+        return tuple(self._dynamizer.decode(item[name])
+                     for name in table['keys'])
+
+    def _match(self, conditions, item):
+        for name, condition in conditions.items():
+            operator = condition['ComparisonOperator']
+            if operator in ('NULL', 'NOT_NULL'):
+                if (name in item) != (operator == 'NOT_NULL'):
+                    return False
+                continue
+            if name not in item:
+                return False
+            value = self._dynamizer.decode(item[name])
+            args = [self._dynamizer.decode(arg)
+                    for arg in condition.get('AttributeValueList', [])]
+            if not _COMPARISONS[operator](value, *args):
+                return False
+        return True
+
+
+_COMPARISONS = {
+    'EQ': lambda value, arg: value == arg,
+    'NE': lambda value, arg: value != arg,
+    'LT': lambda value, arg: value < arg,
+    'LE': lambda value, arg: value <= arg,
+    'GT': lambda value, arg: value > arg,
+    'GE': lambda value, arg: value >= arg,
+    'BETWEEN': lambda value, low, high: low <= value <= high,
+    'BEGINS_WITH': lambda value, arg: value.startswith(arg),
+    'CONTAINS': lambda value, arg: arg in value,
+    'NOT_CONTAINS': lambda value, arg: arg not in value,
+    'IN': lambda value, *args: value in args
+}
+
+
+def _throughput(provisioned_throughput):
+    provisioned_throughput = provisioned_throughput or {}
+    return {
+        'ReadCapacityUnits': provisioned_throughput.get('ReadCapacityUnits',
+                                                        0),
+        'WriteCapacityUnits': provisioned_throughput.get('WriteCapacityUnits',
+                                                         0),
+        'NumberOfDecreasesToday': 0
+    }
+
+
+def _update_throughput(throughput, update):
+    now = time.time()
+    increased = decreased = False
+    for name in ('ReadCapacityUnits', 'WriteCapacityUnits'):
+        increased = increased or update[name] > throughput[name]
+        decreased = decreased or update[name] < throughput[name]
+        throughput[name] = update[name]
+    if increased:
+        throughput['LastIncreaseDateTime'] = now
+    if decreased:
+        throughput['LastDecreaseDateTime'] = now
+        throughput['NumberOfDecreasesToday'] += 1
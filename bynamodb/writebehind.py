@@ -0,0 +1,244 @@
+import atexit
+import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from .batch import MAX_WRITE_ITEMS, _key_id, chunks, write_raw_items
+from .exceptions import DeadlineExceededException, WriteBufferFullException
+
+
+logger = logging.getLogger(__name__)
+
+#: (:class:`float`) Seconds each buffer is given to flush on interpreter
+#: exit.
+EXIT_TIMEOUT = 10.0
+
+# The buffers not closed yet, closed on interpreter exit.
+_open_buffers = weakref.WeakSet()
+
+
+class WriteBehindBuffer(object):
+    """Buffer the writes of the models and send them in the background
+    through BatchWriteItem, so the callers don't wait on them.
+
+    The buffer is flushed when it has ``flush_size`` keys, when its oldest
+    write has waited ``flush_interval`` seconds, and on interpreter exit
+    within :data:`EXIT_TIMEOUT`.
+    The repeated writes of a key before a flush are coalesced, and the last
+    one is sent. The writes are not visible to the reads until they are
+    flushed.
+
+    .. code-block:: python
+
+       Event.write_buffer = WriteBehindBuffer(flush_interval=0.5,
+                                              on_error=report_failure)
+
+    :param max_items: the maximum number of the keys in the buffer.
+    :type max_items: :class:`int`
+    :param flush_size: the number of the keys to trigger a flush.
+    :type flush_size: :class:`int`
+    :param flush_interval: seconds the oldest write waits at most.
+    :type flush_interval: :class:`float`
+    :param timeout: seconds a write waits for the space of the full buffer
+                    before :exc:`~bynamodb.exceptions.WriteBufferFullException`
+                    is raised. It waits forever if omitted.
+    :type timeout: :class:`float`
+    :param on_error: the function called with the error and the list of
+                     the model and the write request failed. The failures
+                     are logged if omitted.
+
+    """
+
+    def __init__(self, max_items=1000, flush_size=MAX_WRITE_ITEMS,
+                 flush_interval=1.0, timeout=None, on_error=None):
+        self.max_items = max_items
+        self.flush_size = min(flush_size, max_items)
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.on_error = on_error
+        self.written = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.flushes = 0
+        self._pending = OrderedDict()
+        self._oldest = None
+        self._closed = False
+        self._thread = None
+        self._cond = threading.Condition()
+        # Held while the taken writes are sent, so the writes of a key are
+        # never reordered by concurrent flushes.
+        self._write_lock = threading.Lock()
+        _open_buffers.add(self)
+
+    def put(self, model, raw_item):
+        """Buffer putting the raw item of the model."""
+        self._add(model, raw_item, {'PutRequest': {'Item': raw_item}})
+
+    def delete(self, model, raw_key):
+        """Buffer deleting the raw key of the model."""
+        self._add(model, raw_key, {'DeleteRequest': {'Key': raw_key}})
+
+    def flush(self):
+        """Send the buffered writes and wait for them."""
+        with self._write_lock:
+            self._flush()
+
+    def close(self, timeout=None):
+        """Stop the background thread after flushing the buffer.
+
+        :param timeout: seconds to wait for the flush. The writes not sent
+                        by then are reported as failed with
+                        :exc:`~bynamodb.exceptions.DeadlineExceededException`.
+                        It waits until they are sent if omitted.
+        :type timeout: :class:`float`
+
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        _open_buffers.discard(self)
+        if thread is not None:
+            thread.join(timeout)
+        # The background thread may still be sending its writes.
+        while not self._write_lock.acquire(False):
+            if deadline is not None and time.time() >= deadline:
+                self._flush(deadline, locked=False)
+                return
+            time.sleep(0.01)
+        try:
+            self._flush(deadline)
+        finally:
+            self._write_lock.release()
+
+    def stats(self):
+        """The statistics of the buffer as :class:`dict`."""
+        with self._cond:
+            return {
+                'pending': len(self._pending),
+                'written': self.written,
+                'coalesced': self.coalesced,
+                'failed': self.failed,
+                'flushes': self.flushes
+            }
+
+    def _add(self, model, raw_item, request):
+        key_names = [key.name for key in model._get_keys()]
+        key = (model.get_table_name(),
+               _key_id(dict((name, raw_item[name]) for name in key_names)))
+        with self._cond:
+            if self._closed:
+                raise ValueError('The write buffer is closed')
+            if key in self._pending:
+                self._pending[key] = model, request
+                self.coalesced += 1
+                return
+            self._wait_for_space()
+            self._pending[key] = model, request
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+            if self._oldest is None:
+                # Wake the thread to wait for the flush interval.
+                self._oldest = time.time()
+                self._cond.notify_all()
+            elif len(self._pending) >= self.flush_size:
+                self._cond.notify_all()
+
+    def _wait_for_space(self):
+        deadline = None
+        if self.timeout is not None:
+            deadline = time.time() + self.timeout
+        while len(self._pending) >= self.max_items:
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise WriteBufferFullException(
+                        'The write buffer is full with {0} items'.format(
+                            len(self._pending)))
+            self._cond.wait(remaining)
+
+    def _flush(self, deadline=None, locked=True):
+        with self._cond:
+            pending, self._pending = self._pending, OrderedDict()
+            self._oldest = None
+            self._cond.notify_all()
+        if not pending:
+            return
+        if locked:
+            self._write(pending.values(), deadline)
+        else:
+            self._fail(pending.values())
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and not self._is_due():
+                    if self._oldest is None:
+                        # Idle, so the thread doesn't keep the buffer alive.
+                        # A write starts it again.
+                        self._thread = None
+                        return
+                    self._cond.wait(
+                        self._oldest + self.flush_interval - time.time())
+                if self._closed:
+                    return
+            self.flush()
+
+    def _is_due(self):
+        if len(self._pending) >= self.flush_size:
+            return True
+        return self._oldest is not None and \
+            time.time() - self._oldest >= self.flush_interval
+
+    def _write(self, writes, deadline=None):
+        by_model = OrderedDict()
+        for model, request in writes:
+            by_model.setdefault(model, []).append(request)
+        for model, requests in by_model.items():
+            table_name = model.get_table_name()
+            for chunk in chunks(requests, MAX_WRITE_ITEMS):
+                if deadline is not None and time.time() >= deadline:
+                    self._fail([(model, request) for request in chunk])
+                    continue
+                try:
+                    write_raw_items(model._get_connection(),
+                                    {table_name: chunk})
+                except Exception as e:
+                    with self._cond:
+                        self.failed += len(chunk)
+                    self._report(e, [(model, request) for request in chunk])
+                    continue
+                with self._cond:
+                    self.written += len(chunk)
+                model._written(*[
+                    request['PutRequest']['Item'] if 'PutRequest' in request
+                    else request['DeleteRequest']['Key']
+                    for request in chunk])
+        with self._cond:
+            self.flushes += 1
+
+    def _fail(self, writes):
+        writes = list(writes)
+        with self._cond:
+            self.failed += len(writes)
+        self._report(DeadlineExceededException(
+            'The write buffer was closed before the writes were sent'),
+            writes)
+
+    def _report(self, error, failed):
+        if self.on_error is not None:
+            self.on_error(error, failed)
+        else:
+            logger.error('Failed to write %d items: %s', len(failed), error)
+
+
+@atexit.register
+def _close_buffers():
+    for buf in list(_open_buffers):
+        buf.close(EXIT_TIMEOUT)
@@ -1,5 +1,10 @@
+import base64
+
 from bynamodb.attributes import (NumberAttribute, StringAttribute,
-                                 NumberSetAttribute, StringSetAttribute)
+                                 NumberSetAttribute, StringSetAttribute,
+                                 CompressedStringAttribute,
+                                 CompressedJSONAttribute)
+from bynamodb.model import Model
 
 
 def test_number_attribute_validation():
@@ -27,3 +32,35 @@ def test_set_attributes_valid_with_expected_types():
 def test_set_attributes_not_valid_for_unexpected_types():
     assert not StringSetAttribute.valid({1, 2})
     assert not NumberSetAttribute.valid({'a', 'b'})
+
+
+def test_compressed_string_attribute_round_trip():
+    attr = CompressedStringAttribute(threshold=10)
+    attr.attr_name = 'content'
+    value = u'content ' * 100
+    encoded = attr.encode(value)
+    assert 'B' in encoded
+    assert len(encoded['B']) < len(value)
+    assert attr.decode(encoded) == value
+
+
+def test_compressed_attribute_below_threshold_not_compressed():
+    attr = CompressedStringAttribute(threshold=1024)
+    attr.attr_name = 'content'
+    encoded = attr.encode('short')
+    assert base64.b64decode(encoded['B']) == '\x00short'
+    assert attr.decode(encoded) == 'short'
+
+
+def test_compressed_json_attribute_decompressed_on_access():
+    class CompressedModel(Model):
+        hash_key = StringAttribute(hash_key=True)
+        payload = CompressedJSONAttribute(codec='bz2', threshold=0)
+
+    value = {'key': ['value'] * 100}
+    raw = {'hash_key': {'S': 'key'},
+           'payload': CompressedModel.payload.encode(value)}
+    item = CompressedModel.from_raw_data(raw)
+    assert 'payload' in item._raw
+    assert item.payload == value
+    assert item._data['payload'] == value
@@ -0,0 +1,148 @@
+import time
+
+from _pytest.python import raises, fixture
+from boto.dynamodb2.exceptions import ProvisionedThroughputExceededException
+
+from bynamodb.attributes import NumberAttribute, StringAttribute
+from bynamodb.autoscaling import CapacityChange, ThroughputTuner
+from bynamodb.indexes import GlobalAllIndex
+from bynamodb.model import Model
+from bynamodb.testing import MemoryConnection, SlowConnection
+
+
+@fixture
+def fx_tuned_model():
+    class TunedModel(Model):
+        user_id = StringAttribute(hash_key=True)
+        created_at = NumberAttribute(range_key=True)
+        category = StringAttribute(null=True)
+
+        class CategoryIndex(GlobalAllIndex):
+            hash_key = 'category'
+            read_throughput = 5
+            write_throughput = 5
+
+    TunedModel._conn = MemoryConnection()
+    TunedModel.create_table(read_throughput=10, write_throughput=10)
+    TunedModel.throughput_tuner = ThroughputTuner(
+        min_units=2, max_units=200, scale_down_cooldown=0, window=60)
+    return TunedModel
+
+
+def describe(model):
+    table = model._conn.describe_table(model.get_table_name())['Table']
+    throughput = table['ProvisionedThroughput']
+    index = table['GlobalSecondaryIndexes'][0]['ProvisionedThroughput']
+    return ((throughput['ReadCapacityUnits'],
+             throughput['WriteCapacityUnits']),
+            (index['ReadCapacityUnits'], index['WriteCapacityUnits']))
+
+
+def test_observe_consumed_capacity(fx_tuned_model):
+    tuner = fx_tuned_model.throughput_tuner
+    fx_tuned_model.put_item(user_id=u'a', created_at=1, category=u'x')
+    fx_tuned_model.put_item(user_id=u'a', created_at=2)
+    fx_tuned_model.get_item(u'a', 1)
+    list(fx_tuned_model.query(user_id__eq=u'a'))
+    stats = tuner.stats()
+    assert stats['TunedModel']['write_rate'] == 2
+    assert stats['TunedModel']['read_rate'] == 1
+    assert stats['TunedModel.CategoryIndex']['write_rate'] == 1
+    assert stats['TunedModel.CategoryIndex']['read_rate'] == 0
+
+
+def test_observe_throttles(fx_tuned_model):
+    fx_tuned_model._conn = SlowConnection(fx_tuned_model._conn,
+                                          error_ratio=1)
+    with raises(ProvisionedThroughputExceededException):
+        fx_tuned_model.put_item(user_id=u'a', created_at=1)
+    stats = fx_tuned_model.throughput_tuner.stats()
+    assert stats['TunedModel']['write_throttles'] == 1
+    assert stats['TunedModel']['read_throttles'] == 0
+
+
+def test_keep_requested_capacity(fx_tuned_model):
+    conn = fx_tuned_model._get_connection()
+    assert conn is fx_tuned_model._get_connection()
+    key = fx_tuned_model._encode_key(u'a', 1)
+    result = conn.get_item(fx_tuned_model.get_table_name(), key,
+                           return_consumed_capacity='NONE')
+    assert 'ConsumedCapacity' not in result
+    result = conn.get_item(fx_tuned_model.get_table_name(), key,
+                           return_consumed_capacity='TOTAL')
+    assert 'Table' in result['ConsumedCapacity']
+
+
+def test_scale_up(fx_tuned_model):
+    tuner = fx_tuned_model.throughput_tuner
+    now = time.time()
+    tuner.record('TunedModel', None, 'read', 70, now=now)
+    tuner.record('TunedModel', 'CategoryIndex', 'write', 1000, now=now)
+    changes = tuner.tune(fx_tuned_model._conn, now=now)
+    assert changes == [
+        CapacityChange('TunedModel', None, 10, 10, 100, 10),
+        CapacityChange('TunedModel', 'CategoryIndex', 5, 5, 5, 200)
+    ]
+    assert describe(fx_tuned_model) == ((100, 10), (5, 200))
+
+    # Within the cooldown
+    tuner.record('TunedModel', None, 'read', 1000, now=now + 1)
+    assert tuner.tune(fx_tuned_model._conn, now=now + 1) == []
+    # The idle writes are decreased with the increase after the window.
+    tuner.record('TunedModel', None, 'read', 1000, now=now + 61)
+    assert tuner.tune(fx_tuned_model._conn, now=now + 61)[0] == \
+        CapacityChange('TunedModel', None, 100, 10, 200, 2)
+
+
+def test_scale_up_throttled(fx_tuned_model):
+    tuner = fx_tuned_model.throughput_tuner
+    tuner.record('TunedModel', None, 'write', 1, throttled=True)
+    assert tuner.tune(fx_tuned_model._conn) == [
+        CapacityChange('TunedModel', None, 10, 10, 10, 15)
+    ]
+
+
+def test_scale_down(fx_tuned_model):
+    tuner = fx_tuned_model.throughput_tuner
+    tuner.max_decreases = 1
+    tuner.watch(fx_tuned_model)
+    now = time.time()
+    # Not until the tuner has observed a window
+    assert tuner.tune(fx_tuned_model._conn, now=now) == []
+
+    # 8.5 units per second for 31 seconds
+    tuner.record('TunedModel', None, 'read', 8.5 * 0.7 * 31, now=now + 30)
+    changes = tuner.tune(fx_tuned_model._conn, now=now + 61)
+    # The reads are near the target, so only the writes are decreased.
+    assert changes == [
+        CapacityChange('TunedModel', None, 10, 10, 10, 2),
+        CapacityChange('TunedModel', 'CategoryIndex', 5, 5, 2, 2)
+    ]
+    assert describe(fx_tuned_model) == ((10, 2), (2, 2))
+
+    # No more decreases in the period
+    tuner.record('TunedModel', None, 'read', 0, now=now + 200)
+    assert tuner.tune(fx_tuned_model._conn, now=now + 200) == []
+
+
+def test_bounds(fx_tuned_model):
+    tuner = fx_tuned_model.throughput_tuner
+    tuner.bounds['TunedModel'] = (20, 50)
+    now = time.time()
+    tuner.record('TunedModel', None, 'read', 1000, now=now)
+    changes = tuner.tune(fx_tuned_model._conn, now=now)
+    assert changes[0] == CapacityChange('TunedModel', None, 10, 10, 50, 20)
+
+
+def test_dry_run(fx_tuned_model):
+    tuner = fx_tuned_model.throughput_tuner
+    tuner.dry_run = True
+    tuner.record('TunedModel', None, 'read', 70)
+    changes = tuner.tune(fx_tuned_model._conn)
+    assert changes == [CapacityChange('TunedModel', None, 10, 10, 100, 10)]
+    assert describe(fx_tuned_model) == ((10, 10), (5, 5))
+
+
+def test_tune_without_connection():
+    with raises(ValueError):
+        ThroughputTuner().tune()
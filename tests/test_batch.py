@@ -0,0 +1,86 @@
+from _pytest.python import raises, fixture
+
+from bynamodb import BatchWriter, batch_get
+from bynamodb.attributes import NumberAttribute, StringAttribute
+from bynamodb.batch import write_raw_items
+from bynamodb.exceptions import UnprocessedItemsException
+from bynamodb.model import Model
+from bynamodb.testing import MemoryConnection, SlowConnection
+
+
+@fixture
+def fx_batch_models():
+    class BatchUser(Model):
+        user_id = StringAttribute(hash_key=True)
+        name = StringAttribute(null=True)
+
+    class BatchPost(Model):
+        user_id = StringAttribute(hash_key=True)
+        post_id = NumberAttribute(range_key=True)
+
+    BatchUser.create_table()
+    BatchPost.create_table()
+    return BatchUser, BatchPost
+
+
+def test_batch_write_and_get(fx_batch_models):
+    user_model, post_model = fx_batch_models
+    with BatchWriter() as writer:
+        writer.put(user_model(user_id='a', name='old'))
+        writer.put(user_model(user_id='a', name='new'))
+        writer.put(user_model(user_id='b'))
+        for i in range(1, 121):
+            writer.put(post_model(user_id='a', post_id=i))
+    post_model(user_id='a', post_id=1).save()
+
+    items = batch_get({
+        user_model: ['b', 'a', 'missing'],
+        post_model: [('a', i) for i in range(120, 0, -1)]
+    })
+    assert [user.user_id for user in items[user_model]] == ['b', 'a']
+    assert items[user_model][1].name == 'new'
+    assert [post.post_id for post in items[post_model]] == \
+        list(range(120, 0, -1))
+
+    with BatchWriter() as writer:
+        writer.delete(items[user_model][0])
+        for post in items[post_model][:30]:
+            writer.delete(post)
+    items = batch_get({user_model: ['a', 'b'],
+                       post_model: [('a', i) for i in range(1, 121)]},
+                      consistent_read=True)
+    assert [user.user_id for user in items[user_model]] == ['a']
+    assert len(items[post_model]) == 90
+
+
+def test_models_on_different_connections(fx_batch_models):
+    user_model, post_model = fx_batch_models
+    post_model._conn = SlowConnection(MemoryConnection())
+    post_model.create_table()
+    with BatchWriter() as writer:
+        writer.put(user_model(user_id='a'))
+        writer.put(post_model(user_id='a', post_id=1))
+    items = batch_get({user_model: ['a'], post_model: [('a', 1)]})
+    assert [user.user_id for user in items[user_model]] == ['a']
+    assert [post.post_id for post in items[post_model]] == [1]
+    assert post_model._conn.calls == \
+        ['create_table', 'batch_write_item', 'batch_get_item']
+    assert list(post_model._conn.conn.tables) == ['BatchPost']
+
+
+def test_write_raw_items_gives_up():
+    class ThrottledConnection(object):
+        calls = 0
+
+        def batch_write_item(self, request_items):
+            self.calls += 1
+            return {'UnprocessedItems': request_items}
+
+    conn = ThrottledConnection()
+    request_items = {
+        'BatchUser': [{'DeleteRequest': {'Key': {'user_id': {'S': 'a'}}}}]
+    }
+    with raises(UnprocessedItemsException) as exc_info:
+        write_raw_items(conn, request_items, retry_delay=0, max_retries=3)
+    assert conn.calls == 4
+    assert exc_info.value.request_items == request_items
@@ -0,0 +1,155 @@
+import random
+from collections import Counter
+
+from _pytest.python import raises, fixture
+
+from bynamodb.attributes import NumberAttribute, StringAttribute
+from bynamodb.batch import batch_get
+from bynamodb.bench import (BenchResult, Workload, ZipfianKeys, main,
+                            populate, run)
+from bynamodb.indexes import GlobalAllIndex
+from bynamodb.model import Model
+from bynamodb.testing import MemoryConnection, SlowConnection
+
+
+class BenchItem(Model):
+    user_id = StringAttribute(hash_key=True)
+    created_at = NumberAttribute(range_key=True)
+    payload = StringAttribute()
+
+
+@fixture
+def memory_model():
+    class MemoryBenchItem(BenchItem):
+        table_name = 'BenchItem'
+
+    MemoryBenchItem._conn = MemoryConnection()
+    MemoryBenchItem.create_table()
+    return MemoryBenchItem
+
+
+def test_zipfian_keys():
+    rand = random.Random(1)
+    keys = ZipfianKeys(1000)
+    counts = Counter(keys.choose(rand) for _ in range(10000))
+    assert all(0 <= key < 1000 for key in counts)
+    assert counts[0] > counts[1] > counts[10]
+    assert sum(counts[key] for key in range(10)) > 3000
+
+    rand = random.Random(1)
+    workload = Workload(keys=1000)
+    counts = Counter(workload.choose_key(rand) for _ in range(10000))
+    assert max(counts.values()) < 100
+
+
+def test_unknown_distribution():
+    with raises(ValueError):
+        Workload(distribution='pareto')
+
+
+def test_populate(memory_model):
+    workload = Workload(keys=60, item_size=10)
+    populate(memory_model, workload)
+    assert len(memory_model._conn.tables['BenchItem']['items']) == 60
+    item = memory_model.get_item(u'bench-0000000059', 1)
+    assert item.payload == u'x' * 10
+
+
+def test_run_operations(memory_model):
+    workload = Workload(read_ratio=0.5, query_ratio=0.5, keys=50,
+                        distribution='zipfian')
+    populate(memory_model, workload)
+    result = run(memory_model, workload, threads=4, duration=None,
+                 operations=400, seed=3)
+    assert result.operations == 400
+    assert set(result.latencies) == set(['get', 'put', 'query'])
+    assert not result.misses
+    assert not result.errors
+    assert result.throughput > 0
+    assert result.percentile(50) <= result.percentile(99)
+    summary = result.as_dict()
+    assert summary['operations'] == 400
+    assert summary['by_operation']['get']['count'] == \
+        len(result.latencies['get'])
+
+
+def test_run_misses_and_errors(memory_model):
+    memory_model._conn = SlowConnection(memory_model._conn, error_ratio=0.2,
+                                        seed=1)
+    workload = Workload(read_ratio=1.0, keys=10)
+    result = run(memory_model, workload, threads=2, duration=None,
+                 operations=100, seed=1)
+    assert result.misses['get'] == result.operations
+    assert result.operations + \
+        result.errors['ProvisionedThroughputExceededException'] == 100
+
+
+def test_run_without_limit(memory_model):
+    with raises(ValueError):
+        run(memory_model, Workload(), duration=None)
+
+
+def test_run_latency(memory_model):
+    memory_model._conn = SlowConnection(memory_model._conn, latency=0.01)
+    workload = Workload(read_ratio=0.0, keys=10)
+    result = run(memory_model, workload, threads=4, duration=None,
+                 operations=20)
+    assert result.operations == 20
+    assert len(result.latencies['put']) == 20
+    assert memory_model._conn.calls.count('put_item') == 20
+
+
+def test_memory_connection():
+    class MemoryIndexedItem(Model):
+        user_id = StringAttribute(hash_key=True)
+        created_at = NumberAttribute(range_key=True)
+        group = StringAttribute()
+
+        class by_group(GlobalAllIndex):
+            hash_key = 'group'
+            range_key = 'created_at'
+            read_throughput = 1
+            write_throughput = 1
+
+    MemoryIndexedItem._conn = MemoryConnection()
+    MemoryIndexedItem.create_table()
+    for index in range(10):
+        MemoryIndexedItem.put_item(user_id=u'user-{0}'.format(index % 3),
+                                   created_at=index,
+                                   group=u'even' if index % 2 else u'odd')
+    items = list(MemoryIndexedItem.query(index_name='by_group',
+                                         group__eq=u'even',
+                                         created_at__gt=4))
+    assert [item.created_at for item in items] == [5, 7, 9]
+    items = list(MemoryIndexedItem.scan(group__eq=u'odd'))
+    assert sorted(item.created_at for item in items) == [0, 2, 4, 6, 8]
+    segments = [list(MemoryIndexedItem.scan(segment=segment,
+                                            total_segments=3))
+                for segment in range(3)]
+    assert sorted(item.created_at for items in segments
+                  for item in items) == range(10)
+    found = batch_get({MemoryIndexedItem: [(u'user-1', 1), (u'user-2', 2),
+                                           (u'user-0', 1)]})
+    assert [item.created_at for item in found[MemoryIndexedItem]] == [1, 2]
+    with raises(ValueError):
+        list(MemoryIndexedItem.query(index_name='by_user', user_id__eq=u'a'))
+
+
+def test_percentile():
+    result = BenchResult(1.0, {'get': [0.3, 0.1, 0.2], 'put': [0.4]}, {}, {})
+    assert result.operations == 4
+    assert result.throughput == 4.0
+    assert result.percentile(0, 'get') == 0.1
+    assert result.percentile(100) == 0.4
+    assert result.percentile(50, 'query') is None
+    assert 'get' in result.report()
+
+
+def test_main(capsys):
+    main(['tests.test_bench:BenchItem', '--memory', '--keys', '20',
+          '--operations', '50', '--threads', '2', '--latency', '0.001',
+          '--json'])
+    out, _ = capsys.readouterr()
+    assert '"operations": 50' in out
+    assert isinstance(BenchItem._conn, SlowConnection)
+    del BenchItem._conn
@@ -0,0 +1,96 @@
+from _pytest.python import fixture
+
+from bynamodb.attributes import StringAttribute
+from bynamodb.cache import QueryCache
+from bynamodb.model import Model
+
+
+def test_cache_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('time.time', lambda: now[0])
+    cache = QueryCache(ttl=10)
+    cache.set('key', ['page'])
+    assert cache.get('key') == ['page']
+    now[0] += 10
+    assert cache.get('key') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_cache_evicts_least_recently_used():
+    cache = QueryCache(max_size=2)
+    cache.set('a', ['a'])
+    cache.set('b', ['b'])
+    cache.get('a')
+    cache.set('c', ['c'])
+    assert cache.get('b') is None
+    assert cache.get('a') == ['a']
+    assert cache.get('c') == ['c']
+    assert cache.stats()['evictions'] == 1
+
+
+def test_cache_invalidate_partition():
+    cache = QueryCache()
+    cache.set(('table', 'query', 'a'), [], ('hash', {'N': '1'}))
+    cache.set(('table', 'query', 'b'), [], ('hash', {'N': '2'}))
+    cache.set(('table', 'scan', 'c'), [])
+    cache.set(('other', 'scan', 'd'), [])
+    cache.invalidate('table', {'hash': {'N': '1.0'}, 'attr': {'S': 'value'}})
+    assert cache.get(('table', 'query', 'a')) is None
+    assert cache.get(('table', 'query', 'b')) == []
+    assert cache.get(('table', 'scan', 'c')) is None
+    assert cache.get(('other', 'scan', 'd')) == []
+
+    cache.invalidate('table')
+    assert cache.get(('table', 'query', 'b')) is None
+
+
+def test_cache_invalidate_batch():
+    cache = QueryCache()
+    for value in ('1', '2', '3'):
+        cache.set(('table', 'query', value), [], ('hash', {'N': value}))
+    cache.invalidate('table', {'hash': {'N': '1'}}, {'hash': {'N': '3'}})
+    assert cache.get(('table', 'query', '1')) is None
+    assert cache.get(('table', 'query', '2')) == []
+    assert cache.get(('table', 'query', '3')) is None
+    assert cache.stats()['invalidations'] == 2
+
+
+def test_cache_skips_pages_written_while_paging():
+    cache = QueryCache()
+    generation = cache.generation('table')
+    cache.invalidate('table', {'hash': {'N': '1'}})
+    cache.set(('table', 'scan', 'a'), ['stale'], generation=generation)
+    assert cache.get(('table', 'scan', 'a')) is None
+    cache.set(('table', 'scan', 'a'), ['page'],
+              generation=cache.generation('table'))
+    assert cache.get(('table', 'scan', 'a')) == ['page']
+
+
+@fixture
+def fx_cached_model():
+    class CachedTestModel(Model):
+        query_cache = QueryCache()
+        hash_key = StringAttribute(hash_key=True)
+        range_key = StringAttribute(range_key=True)
+    CachedTestModel.create_table()
+    for hash_key in ('a', 'b'):
+        for range_key in ('1', '2'):
+            CachedTestModel.put_item(hash_key=hash_key, range_key=range_key)
+    return CachedTestModel
+
+
+def test_cached_query(fx_cached_model):
+    cache = fx_cached_model.query_cache
+    assert len(list(fx_cached_model.query(hash_key__eq='a'))) == 2
+    assert len(list(fx_cached_model.query(hash_key__eq='b'))) == 2
+    assert len(list(fx_cached_model.query(hash_key__eq='a'))) == 2
+    assert cache.stats()['hits'] == 1
+
+    fx_cached_model.put_item(hash_key='a', range_key='3')
+    assert len(list(fx_cached_model.query(hash_key__eq='a'))) == 3
+    assert len(list(fx_cached_model.query(hash_key__eq='b'))) == 2
+    assert cache.stats()['hits'] == 2
+
+    fx_cached_model.get_item('b', '1').delete()
+    assert len(list(fx_cached_model.query(hash_key__eq='b'))) == 1
@@ -0,0 +1,82 @@
+from _pytest.python import raises, fixture
+
+from bynamodb.attributes import (MapAttribute, NumberAttribute,
+                                 StringAttribute)
+from bynamodb.capacity import CostAggregator, estimate, item_size
+from bynamodb.exceptions import ItemTooLargeException
+from bynamodb.indexes import GlobalAllIndex, GlobalIndex
+from bynamodb.model import Model
+
+
+def test_item_size():
+    assert item_size({'name': {'S': u'\uac00\ub098'}}) == 4 + 6
+    assert item_size({'n': {'N': '-12300'}}) == 1 + 3
+    assert item_size({'n': {'N': '0.00123'}}) == 1 + 3
+    assert item_size({'b': {'B': 'YWJj'}, 'f': {'BOOL': True}}) == \
+        (1 + 3) + (1 + 1)
+    assert item_size({'l': {'L': [{'S': 'ab'}, {'NULL': True}]}}) == \
+        1 + 3 + 3 + 2
+    assert item_size({'m': {'M': {'k': {'S': 'ab'}}}}) == 1 + 3 + 1 + 1 + 2
+
+
+@fixture
+def fx_cost_model():
+    class CostTestModel(Model):
+        hash_key = StringAttribute(hash_key=True)
+        index_key = StringAttribute(null=True)
+        number = NumberAttribute(null=True)
+        data = MapAttribute(null=True)
+
+        class AllIndex(GlobalAllIndex):
+            hash_key = 'index_key'
+            read_throughput = 1
+            write_throughput = 1
+
+        class KeysIndex(GlobalIndex):
+            hash_key = 'index_key'
+            range_key = 'number'
+            projection_type = 'KEYS_ONLY'
+            read_throughput = 1
+            write_throughput = 1
+
+    return CostTestModel
+
+
+def test_estimate(fx_cost_model):
+    raw_item = {
+        'hash_key': {'S': 'hash'},
+        'data': {'M': {'text': {'S': 'a' * 2000}}}
+    }
+    cost = estimate(fx_cost_model, raw_item)
+    assert cost.read_units == 1
+    assert cost.write_units == 2
+    assert cost.index_write_units == {}
+
+    raw_item['index_key'] = {'S': 'index'}
+    cost = estimate(fx_cost_model, raw_item)
+    assert cost.index_write_units == {'AllIndex': 2}
+    assert cost.write_units == 4
+
+    raw_item['number'] = {'N': '1'}
+    cost = estimate(fx_cost_model, raw_item)
+    assert cost.index_write_units == {'AllIndex': 2, 'KeysIndex': 1}
+    assert cost.write_units == 5
+
+
+def test_item_too_large_rejected(fx_cost_model):
+    fx_cost_model.max_item_size = 1024
+    item = fx_cost_model(hash_key='hash', data={'text': 'a' * 1024})
+    assert item.estimate_cost().size > 1024
+    with raises(ItemTooLargeException):
+        item.save()
+
+
+def test_cost_aggregator(fx_cost_model):
+    fx_cost_model.create_table()
+    fx_cost_model.cost_aggregator = CostAggregator()
+    fx_cost_model.put_item(hash_key='1', data={'text': 'a' * 2000})
+    fx_cost_model.put_item(hash_key='2', index_key='index')
+    report = fx_cost_model.cost_aggregator.report()['CostTestModel']
+    assert report['items'] == 2
+    assert report['write_units'] == 4
+    assert report['index_write_units'] == {'AllIndex': 1}
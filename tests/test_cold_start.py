@@ -0,0 +1,65 @@
+import subprocess
+import sys
+
+
+IMPORT_ALL = '''
+import sys
+import bynamodb
+from bynamodb import (attributes, autoscaling, batch, bench, cache, capacity,
+                      conditions, exceptions, filterexps, hotkeys, indexes,
+                      loader, model, policy, predicates, results,
+                      serialization, writebehind)
+from bynamodb.attributes import NumberAttribute, StringAttribute
+from bynamodb.indexes import GlobalAllIndex
+from bynamodb.model import Model
+
+
+class ColdStartItem(Model):
+    user_id = StringAttribute(hash_key=True)
+    created_at = NumberAttribute(range_key=True)
+
+    class by_created_at(GlobalAllIndex):
+        hash_key = 'created_at'
+        read_throughput = 1
+        write_throughput = 1
+
+
+print(sorted(name for name in sys.modules
+             if name.split('.')[0] in ('boto', 'multiprocessing') and
+             sys.modules[name]))
+'''
+
+IMPORT_TIME = '''
+import time
+started_at = time.time()
+import bynamodb.model
+print(time.time() - started_at)
+'''
+
+PATCH_ON_IMPORT = '''
+from bynamodb import init_bynamodb
+init_bynamodb(DYNAMODB_HOST='localhost', DYNAMODB_PORT=8000)
+from boto.dynamodb2.layer1 import DynamoDBConnection
+print(hasattr(DynamoDBConnection, '__original_init__'))
+'''
+
+#: The seconds importing :mod:`bynamodb.model` may take at most. It takes
+#: about 40ms, so the limit leaves room for slow machines and only catches
+#: an import much heavier than boto.
+IMPORT_TIME_LIMIT = 0.5
+
+
+def run(code):
+    return subprocess.check_output([sys.executable, '-c', code]).strip()
+
+
+def test_import_does_not_load_boto():
+    assert run(IMPORT_ALL) == '[]'
+
+
+def test_import_time():
+    assert min(float(run(IMPORT_TIME)) for _ in range(3)) < IMPORT_TIME_LIMIT
+
+
+def test_patch_connection_on_import():
+    assert run(PATCH_ON_IMPORT) == 'True'
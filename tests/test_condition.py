@@ -1,6 +1,7 @@
 from _pytest.python import raises
 
-from bynamodb.conditions import KEY_CONDITIONS, build_condition
+from bynamodb.conditions import (KEY_CONDITIONS, build_condition,
+                                 compile_condition)
 from bynamodb.exceptions import ConditionNotRecognizedException
 
 
@@ -13,3 +14,26 @@ def test_null_condition():
 def test_condition_not_in_key_conditions():
     with raises(ConditionNotRecognizedException):
         build_condition({'title__contains': 'title'}, KEY_CONDITIONS)
+
+
+def test_compile_condition():
+    predicate = compile_condition(build_condition({
+        'title__beginswith': 'Hello',
+        'views__between': (10, 20),
+        'deleted__null': True
+    }))
+    assert predicate({'title': 'Hello world', 'views': 10})
+    assert not predicate({'title': 'Hello world', 'views': 21})
+    assert not predicate({'title': 'Hello world', 'views': '15'})
+    assert not predicate({'title': 'Hello', 'views': 15, 'deleted': True})
+
+
+def test_compile_condition_raw():
+    predicate = compile_condition(build_condition({
+        'tags__contains': 'python',
+        'views__in': [1, 2]
+    }), raw=True)
+    assert predicate({'tags': {'SS': ['python', 'dynamodb']},
+                      'views': {'N': '2'}})
+    assert not predicate({'tags': {'SS': ['dynamodb']}, 'views': {'N': '2'}})
+    assert not predicate({'tags': {'SS': ['python']}, 'views': {'N': '3'}})
@@ -1,6 +1,6 @@
 from _pytest.python import fixture
 
-from bynamodb.filterexps import Contains, GT, OR
+from bynamodb.filterexps import Contains, EQ, GT, OR
 
 
 @fixture
@@ -39,3 +39,18 @@ def test_nest_or(fx_test_contain_operator, fx_test_gt_operator):
     assert filter_exp == '(contains(content, :1) or birth_year > :2)'
     assert attr_values[':1'] == {'S': 'keyword'}
     assert attr_values[':2'] == {'N': '1994'}
+
+
+def test_compile(fx_test_contain_operator, fx_test_gt_operator):
+    predicate = (fx_test_contain_operator | fx_test_gt_operator).compile()
+    assert predicate({'content': 'a keyword', 'birth_year': 1990})
+    assert predicate({'content': 'nothing', 'birth_year': 1995})
+    assert not predicate({'content': 'nothing', 'birth_year': 1994})
+    assert not predicate({'content': 'nothing', 'birth_year': '1995'})
+    assert not predicate({})
+
+
+def test_compile_raw(fx_test_gt_operator):
+    predicate = (fx_test_gt_operator & EQ('name', 'name')).compile(raw=True)
+    assert predicate({'birth_year': {'N': '1995'}, 'name': {'S': 'name'}})
+    assert not predicate({'birth_year': {'N': '1995'}, 'name': {'S': 'nam'}})
@@ -0,0 +1,121 @@
+import random
+from collections import Counter
+
+from _pytest.python import raises, fixture
+from boto.dynamodb2.exceptions import ProvisionedThroughputExceededException
+
+from bynamodb.attributes import NumberAttribute, StringAttribute
+from bynamodb.hotkeys import HotKeySampler
+from bynamodb.indexes import GlobalAllIndex
+from bynamodb.model import Model
+
+
+def test_sampler_top():
+    sampler = HotKeySampler(capacity=10)
+    for i in range(100):
+        sampler.record('table', 'hot')
+        for j in range(i % 5):
+            sampler.record('table', 'key-{0}'.format(j))
+    sampler.record('other', 'hot')
+    top = sampler.top(2, table_name='table')
+    assert [hot_key.hash_key for hot_key in top] == ['hot', 'key-0']
+    assert top[0].count == 100
+    assert top[0].error == 0
+    assert len(sampler.top()) == 6
+
+
+def test_sampler_bounded():
+    sampler = HotKeySampler(capacity=3)
+    for _ in range(50):
+        sampler.record('table', 'hot')
+    for i in range(20):
+        sampler.record('table', i)
+    top = sampler.top(table_name='table')
+    assert len(top) == 3
+    assert top[0].hash_key == 'hot'
+    assert top[0].count - top[0].error <= 50 <= top[0].count
+
+
+def test_sampler_bounds_hold():
+    rand = random.Random(1)
+    stream = [int(rand.paretovariate(1)) for _ in range(5000)]
+    sampler = HotKeySampler(capacity=20)
+    for key in stream:
+        sampler.record('table', key)
+    counts = Counter(stream)
+    top = sampler.top(20)
+    assert len(top) == 20
+    # The counts of a full sketch sum up to the accesses.
+    assert sum(hot_key.count for hot_key in top) == len(stream)
+    for hot_key in top:
+        assert hot_key.count - hot_key.error <= counts[hot_key.hash_key] \
+            <= hot_key.count
+    assert top[0].hash_key == counts.most_common(1)[0][0]
+
+
+def test_sampler_throttled():
+    sampler = HotKeySampler()
+    with raises(ProvisionedThroughputExceededException):
+        with sampler.access('table', 'hot'):
+            raise ProvisionedThroughputExceededException(400, 'throttled')
+    with sampler.access('table', 'cold'):
+        pass
+    assert [hot_key.hash_key for hot_key in sampler.top_throttled()] == \
+        ['hot']
+    assert len(sampler.top()) == 2
+    sampler.clear()
+    assert sampler.top() == []
+
+
+@fixture
+def fx_sampled_model():
+    class SampledModel(Model):
+        hash_key = StringAttribute(hash_key=True)
+        range_key = NumberAttribute(range_key=True)
+        category = StringAttribute(null=True)
+
+        class CategoryIndex(GlobalAllIndex):
+            hash_key = 'category'
+            range_key = 'range_key'
+            read_throughput = 5
+            write_throughput = 5
+
+    SampledModel.create_table()
+    SampledModel.key_sampler = HotKeySampler()
+    return SampledModel
+
+
+def test_model_sampling(fx_sampled_model):
+    for i in range(1, 4):
+        fx_sampled_model.put_item(hash_key='hot', range_key=i)
+    fx_sampled_model.put_item(hash_key='cold', range_key=1)
+    fx_sampled_model.get_item('hot', 1)
+    list(fx_sampled_model.query(hash_key__eq='hot'))
+    fx_sampled_model.get_item('cold', 1).delete()
+    top = fx_sampled_model.key_sampler.top()
+    assert [(hot_key.hash_key, hot_key.count) for hot_key in top] == \
+        [('hot', 5), ('cold', 3)]
+    assert top[0].table_name == fx_sampled_model.get_table_name()
+
+
+def test_query_samples_hash_key(fx_sampled_model):
+    fx_sampled_model.put_item(hash_key='hot', range_key=1, category='c')
+    fx_sampled_model.key_sampler.clear()
+    list(fx_sampled_model.query(hash_key__eq='hot', range_key__eq=1))
+    list(fx_sampled_model.query(index_name='CategoryIndex',
+                                category__eq='c', range_key__eq=1))
+    table_name = fx_sampled_model.get_table_name()
+    assert sorted((hot_key.table_name, hot_key.hash_key)
+                  for hot_key in fx_sampled_model.key_sampler.top()) == \
+        [(table_name, 'hot'), (table_name + '.CategoryIndex', 'c')]
+
+
+def test_scan_not_sampled(fx_sampled_model):
+    fx_sampled_model.put_item(hash_key='hot', range_key=1)
+    fx_sampled_model.put_item(hash_key='hot', range_key=2)
+    fx_sampled_model.key_sampler.clear()
+    list(fx_sampled_model.scan())
+    fx_sampled_model.scan().count()
+    list(fx_sampled_model.query(hash_key__eq='hot', range_key__gt=1))
+    assert [hot_key.hash_key
+            for hot_key in fx_sampled_model.key_sampler.top()] == ['hot']
@@ -0,0 +1,85 @@
+import threading
+
+from _pytest.python import raises, fixture
+
+from bynamodb.attributes import StringAttribute
+from bynamodb.exceptions import ItemNotFoundException
+from bynamodb.loader import ItemLoader
+from bynamodb.model import Model
+from bynamodb.testing import SlowConnection
+
+
+@fixture
+def fx_loader_model():
+    class LoaderTestModel(Model):
+        hash_key = StringAttribute(hash_key=True)
+        attr = StringAttribute()
+    LoaderTestModel.create_table()
+    for i in range(10):
+        LoaderTestModel.put_item(hash_key=str(i), attr='value %d' % i)
+    LoaderTestModel.loader = ItemLoader(window=0.01)
+    return LoaderTestModel
+
+
+def test_get_item_through_loader(fx_loader_model):
+    item = fx_loader_model.get_item('3')
+    assert item.attr == 'value 3'
+
+
+def test_get_item_through_loader_not_found(fx_loader_model):
+    with raises(ItemNotFoundException):
+        fx_loader_model.get_item('not found')
+
+
+def test_concurrent_get_items_batched(fx_loader_model):
+    calls = []
+    conn = fx_loader_model._get_connection()
+    original = conn.batch_get_item
+
+    def batch_get_item(request_items, *args, **kwargs):
+        calls.append(request_items)
+        return original(request_items, *args, **kwargs)
+    conn.batch_get_item = batch_get_item
+
+    results = {}
+
+    def load(key):
+        results[key] = fx_loader_model.get_item(key).attr
+    threads = [threading.Thread(target=load, args=(str(i % 5),))
+               for i in range(10)]
+    try:
+        [thread.start() for thread in threads]
+        [thread.join() for thread in threads]
+    finally:
+        del conn.batch_get_item
+
+    assert results == dict((str(i), 'value %d' % i) for i in range(5))
+    table_name = fx_loader_model.get_table_name()
+    requested = sum(len(request_items[table_name]['Keys'])
+                    for request_items in calls)
+    assert requested == 5
+
+
+def test_models_on_different_connections(fx_loader_model):
+    class OtherLoaderTestModel(Model):
+        hash_key = StringAttribute(hash_key=True)
+        attr = StringAttribute()
+    OtherLoaderTestModel._conn = SlowConnection(
+        fx_loader_model._get_connection())
+    OtherLoaderTestModel.create_table()
+    OtherLoaderTestModel.put_item(hash_key='1', attr='other')
+    OtherLoaderTestModel.loader = fx_loader_model.loader
+
+    results = {}
+
+    def load(model):
+        results[model] = model.get_item('1').attr
+    threads = [threading.Thread(target=load, args=(model,))
+               for model in (fx_loader_model, OtherLoaderTestModel)]
+    [thread.start() for thread in threads]
+    [thread.join() for thread in threads]
+
+    assert results == {fx_loader_model: 'value 1',
+                       OtherLoaderTestModel: 'other'}
+    assert OtherLoaderTestModel._conn.calls == \
+        ['create_table', 'put_item', 'batch_get_item']
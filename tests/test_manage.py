@@ -0,0 +1,88 @@
+import json
+import os
+
+from _pytest.python import raises, fixture
+
+from bynamodb.attributes import NumberAttribute, StringAttribute
+from bynamodb.manage import (EXPORT_CHECKPOINT, IMPORT_CHECKPOINT,
+                             copy_table, export_table, import_table)
+from bynamodb.model import Model
+
+
+class ExportTestModel(Model):
+    hash_key = StringAttribute(hash_key=True)
+    number = NumberAttribute()
+
+
+class ImportTestModel(Model):
+    hash_key = StringAttribute(hash_key=True)
+    number = NumberAttribute()
+
+
+@fixture
+def fx_export_items():
+    ExportTestModel.create_table()
+    ImportTestModel.create_table()
+    for i in range(30):
+        ExportTestModel.put_item(hash_key=str(i), number=i)
+
+
+def imported_items():
+    return sorted((item.hash_key, item.number)
+                  for item in ImportTestModel.scan())
+
+
+def test_export_and_import(tmpdir, fx_export_items):
+    for format in ('jsonl', 'binary'):
+        for compress in (False, True):
+            path = str(tmpdir.join(format + str(compress)))
+            assert export_table(ExportTestModel, path, total_segments=3,
+                                format=format, compress=compress) == 30
+            assert import_table(ImportTestModel, path) == 30
+            assert imported_items() == sorted((str(i), i) for i in range(30))
+
+
+def test_export_resumed_from_checkpoint(tmpdir, fx_export_items):
+    path = str(tmpdir)
+    export_table(ExportTestModel, path, total_segments=2, compress=True)
+    checkpoint_path = os.path.join(path, EXPORT_CHECKPOINT)
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+    checkpoint['segments'][1].update(offset=0, last_key=None, count=0,
+                                     done=False)
+    with open(checkpoint_path, 'w') as f:
+        json.dump(checkpoint, f)
+
+    assert 0 < export_table(ExportTestModel, path, total_segments=2,
+                            compress=True) < 30
+    assert import_table(ImportTestModel, path) == 30
+    assert imported_items() == sorted((str(i), i) for i in range(30))
+
+
+def test_copy_table(tmpdir, fx_export_items):
+    def transform(item):
+        if int(item['number']['N']) % 2:
+            return None
+        return item
+
+    checkpoint_path = str(tmpdir.join('copy.json'))
+    assert copy_table(ExportTestModel, ImportTestModel, total_segments=2,
+                      transform=transform,
+                      checkpoint_path=checkpoint_path) == 15
+    assert imported_items() == sorted((str(i), i) for i in range(0, 30, 2))
+    assert copy_table(ExportTestModel, ImportTestModel, total_segments=2,
+                      transform=transform,
+                      checkpoint_path=checkpoint_path) == 0
+
+
+def test_import_of_another_export(tmpdir, fx_export_items):
+    path = str(tmpdir.join('export'))
+    assert export_table(ExportTestModel, path, total_segments=3) == 30
+    assert import_table(ImportTestModel, path) == 30
+    assert os.path.exists(os.path.join(path, IMPORT_CHECKPOINT))
+    for name in os.listdir(path):
+        if name != IMPORT_CHECKPOINT:
+            os.remove(os.path.join(path, name))
+    assert export_table(ExportTestModel, path, total_segments=2) == 30
+    with raises(ValueError):
+        import_table(ImportTestModel, path)
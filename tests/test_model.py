@@ -1,12 +1,18 @@
+import math
+import time
+
 from _pytest.python import raises, fixture
 from boto.dynamodb2.layer1 import DynamoDBConnection
 
-from bynamodb.attributes import (NumberAttribute, StringAttribute,
-                                 StringSetAttribute)
+from bynamodb.attributes import (BooleanAttribute, NumberAttribute,
+                                 StringAttribute, StringSetAttribute)
 from bynamodb.exceptions import NullAttributeException, ItemNotFoundException
 from bynamodb.filterexps import GT
 from bynamodb.indexes import GlobalAllIndex, AllIndex
 from bynamodb.model import Model
+from bynamodb.results import (CountEstimate, PageSizer, iter_parallel,
+                              _z_score)
+from bynamodb.settings import conf
 
 
 @fixture
@@ -24,6 +30,15 @@ def test_table_attr_name(fx_test_model):
     assert fx_test_model.attr_1.attr_name == 'attr_1'
 
 
+def test_init_sets_attributes_only(fx_test_model):
+    item = fx_test_model(hash_key_attr=u'hash', attr_1=u'value',
+                         save=u'not an attribute', unknown=u'ignored')
+    assert item.hash_key_attr == u'hash'
+    assert item.attr_1 == u'value'
+    assert callable(item.save)
+    assert not hasattr(item, 'unknown')
+
+
 def test_create_table(fx_test_model):
     fx_test_model.create_table()
     table_description = DynamoDBConnection().describe_table(
@@ -220,12 +235,192 @@ def test_scan_with_filter_operator(fx_query_test_model, fx_query_test_items):
     assert all([item.published_at > 'bbbbb' for item in items])
 
 
+def test_scan_stats(fx_query_test_model, fx_query_test_items):
+    reported = []
+    conf.load_settings_from({
+        'RESULT_STATS_HOOK': lambda result, stats: reported.append(stats)
+    })
+    try:
+        result = fx_query_test_model.scan(published_at__gt='bbbbb')
+        items = list(result)
+    finally:
+        del conf.config['RESULT_STATS_HOOK']
+    stats = result.stats
+    assert reported == [stats]
+    assert stats.count == len(items) == 3
+    assert stats.scanned_count == 6
+    assert stats.filter_ratio == 0.5
+    assert stats.pages >= 1
+    assert stats.bytes_received > 0
+    assert stats.consumed_capacity > 0
+    assert stats.network_time > 0
+    assert stats.decode_time > 0
+
+
+def test_stats_of_each_run(fx_query_test_model, fx_query_test_items):
+    result = fx_query_test_model.scan()
+    list(result)
+    # The size is measured only if the stats are reported.
+    assert result.stats.bytes_received is None
+
+    reported = []
+    conf.load_settings_from({
+        'RESULT_STATS_HOOK': lambda result, stats: reported.append(stats)
+    })
+    try:
+        first, second = iter(result), iter(result)
+        next(first)
+        list(second)
+        list(first)
+    finally:
+        del conf.config['RESULT_STATS_HOOK']
+    assert len(reported) == 2
+    assert reported[0] is not reported[1]
+    assert [stats.count for stats in reported] == [6, 6]
+    assert all(stats.bytes_received > 0 for stats in reported)
+
+
+def test_adaptive_scan(fx_query_test_model, fx_query_test_items):
+    result = fx_query_test_model.scan().adaptive(initial_limit=2,
+                                                 max_limit=4)
+    assert len(list(result)) == 6
+    stats = result.stats
+    assert stats.page_sizes[0] == 2
+    assert len(stats.page_sizes) == stats.pages
+    assert all(1 <= size <= 4 for size in stats.page_sizes)
+    result = fx_query_test_model.scan()
+    list(result)
+    assert set(result.stats.page_sizes) == set([None])
+
+
+def test_page_sizer():
+    sizer = PageSizer(target_latency=1.0, initial_limit=10)
+    # 0.01 seconds per item aims at 100 items, growing twice at most.
+    sizer.observe({'Count': 10, 'ScannedCount': 10}, 0.1)
+    assert sizer.limit == 20
+    sizer.observe({'Count': 20, 'ScannedCount': 20}, 0.2)
+    assert sizer.limit == 40
+    # Slower items shrink the page at once.
+    sizer.observe({'Count': 40, 'ScannedCount': 40}, 4.0)
+    assert sizer.limit < 40
+    sizer.observe({'Count': 0, 'ScannedCount': 0}, 1.0)
+    assert sizer.limit < 40
+
+    sizer = PageSizer(target_capacity=5, initial_limit=10, max_limit=50)
+    sizer.observe({'Count': 10, 'ScannedCount': 10,
+                   'ConsumedCapacity': {'CapacityUnits': 10}}, 0.1)
+    assert sizer.limit == 5
+    with raises(ValueError):
+        PageSizer()
+
+
+def test_approximate_count(fx_query_test_model, fx_query_test_items):
+    assert fx_query_test_model.scan().count(approximate=True) == \
+        CountEstimate(6, None, 0.95, 'item_count', 0)
+    result = fx_query_test_model.scan(published_at__gt='bbbbb')
+    assert result.count(approximate=True, segments=4, total_segments=4) == \
+        CountEstimate(3, 0.0, 0.95, 'exact', 6)
+    with raises(ValueError):
+        fx_query_test_model.query(published_at__eq='aaaaa').count(
+            approximate=True)
+
+
+def test_sampled_count(fx_query_test_model):
+    for i in range(1, 201):
+        fx_query_test_model.put_item(published_at=str(i % 4), title=str(i))
+    result = fx_query_test_model.scan(published_at__gt='1')
+    estimate = result.count(approximate=True, segments=8, total_segments=16)
+    assert estimate.method == 'sample'
+    assert 0 < estimate.scanned < 200
+    assert estimate.error > 0
+    assert 0 < estimate.count < 200
+
+    page_limit = 3
+    result = result.adaptive(initial_limit=page_limit, min_limit=page_limit,
+                             max_limit=page_limit)
+    estimate = result.count(approximate=True, segments=8, total_segments=16,
+                            capacity_budget=0.1)
+    # Every page is over the budget, so each segment stops after its first.
+    assert estimate.scanned <= 8 * page_limit
+    assert abs(_z_score(0.95) - 1.96) < 0.01
+
+
 def test_query(fx_query_test_model, fx_query_test_items):
     result = fx_query_test_model.query(published_at__eq='aaaaa')
     assert result.count() == 2
     assert all(item.published_at == 'aaaaa' for item in result)
 
 
+def test_scan_raw(fx_query_test_model, fx_query_test_items):
+    items = list(fx_query_test_model.scan().raw())
+    assert len(items) == 6
+    assert all(type(item['published_at']) == dict for item in items)
+
+
+def test_scan_values(fx_query_test_model, fx_query_test_items):
+    items = list(fx_query_test_model.scan().values())
+    assert len(items) == 6
+    assert all(set(item) == {'published_at', 'title'} for item in items)
+
+    items = list(fx_query_test_model.scan().values('title'))
+    assert sorted(item['title'] for item in items) == [
+        str(i) * 5 for i in range(6)]
+    assert all(set(item) == {'title'} for item in items)
+
+
+def test_query_values_list(fx_query_test_model, fx_query_test_items):
+    result = fx_query_test_model.query(published_at__eq='aaaaa')
+    rows = sorted(result.values_list('title', 'published_at'))
+    assert rows == [('00000', 'aaaaa'), ('11111', 'aaaaa')]
+
+    rows = list(result.values_list('title', named=True))
+    assert sorted(row.title for row in rows) == ['00000', '11111']
+
+
+def test_scan_delete(fx_query_test_model, fx_query_test_items):
+    result = fx_query_test_model.scan(published_at__lt='ccccc')
+    assert result.delete(concurrency=2) == 3
+    assert sorted(item.published_at for item in fx_query_test_model.scan()) \
+        == ['ccccc', 'ddddd', 'eeeee']
+
+
+def test_query_delete(fx_query_test_model, fx_query_test_items):
+    assert fx_query_test_model.query(published_at__eq='aaaaa').delete() == 2
+    assert fx_query_test_model.scan().count() == 4
+
+
+class ParallelTestModel(Model):
+    hash_key = StringAttribute(hash_key=True)
+    number = NumberAttribute()
+
+
+def square_number(item):
+    return item.number ** 2
+
+
+def add(a, b):
+    return a + b
+
+
+@fixture
+def fx_parallel_test_items():
+    ParallelTestModel.create_table()
+    for i in range(20):
+        ParallelTestModel.put_item(hash_key=str(i), number=i)
+
+
+def test_parallel_map(fx_parallel_test_items):
+    results = ParallelTestModel.scan().parallel_map(
+        square_number, processes=2, segments=4)
+    assert sorted(results) == [i ** 2 for i in range(20)]
+
+
+def test_parallel_reduce(fx_parallel_test_items):
+    result = ParallelTestModel.scan().parallel_reduce(
+        square_number, add, 0, processes=2, segments=4)
+    assert result == sum(i ** 2 for i in range(20))
+
+
 @fixture
 def fx_model_with_set_attr():
     class TestModel(Model):
@@ -265,3 +460,97 @@ def test_model_with_number_attr(fx_model_with_number_attr):
     item = fx_model_with_number_attr.get_item('hash')
     assert type(item.attr) == float
     item.save()
+
+
+@fixture
+def fx_lazy_model():
+    class LazyTestModel(Model):
+        lazy_decode = True
+        hash_key = StringAttribute(hash_key=True)
+        attr = StringSetAttribute(default=set())
+        number = NumberAttribute(null=True)
+    return LazyTestModel
+
+
+def test_lazy_decode_on_access(fx_lazy_model):
+    item = fx_lazy_model.from_raw_data({
+        'hash_key': {'S': 'hash'},
+        'number': {'N': '12'},
+        'unknown': {'S': 'value'}
+    })
+    assert item._data == {'attr': set()}
+    assert set(item._raw) == {'hash_key', 'number'}
+    assert item.number == 12
+    assert item._raw == {'hash_key': {'S': 'hash'}}
+    item.hash_key = 'other'
+    assert item._raw == {}
+    assert item.hash_key == 'other'
+
+
+def test_lazy_decoded_item_saved(fx_lazy_model):
+    fx_lazy_model.create_table()
+    fx_lazy_model.put_item(hash_key='hash', attr={'a', 'b'}, number=1)
+    item = fx_lazy_model.get_item('hash')
+    item.number = 2
+    item.save()
+    item = fx_lazy_model.get_item('hash')
+    assert item.attr == {'a', 'b'}
+    assert item.number == 2
+
+
+@fixture
+def fx_column_test_model():
+    class ColumnTestModel(Model):
+        hash_key = StringAttribute(hash_key=True)
+        number = NumberAttribute(null=True)
+        flag = BooleanAttribute(null=True)
+    ColumnTestModel.create_table()
+    for i in range(10):
+        ColumnTestModel.put_item(hash_key=str(i), number=i, flag=i % 2 == 0)
+    ColumnTestModel.put_item(hash_key='missing')
+    return ColumnTestModel
+
+
+def test_scan_to_columns(fx_column_test_model):
+    chunks = list(fx_column_test_model.scan().to_columns(
+        ['hash_key', 'number', 'flag'], chunk_size=4))
+    assert [len(chunk['hash_key']) for chunk in chunks] == [4, 4, 3]
+    assert chunks[0]['number'].typecode == 'd'
+    assert chunks[0]['flag'].typecode == 'b'
+
+    columns = dict((field, []) for field in chunks[0])
+    for chunk in chunks:
+        for field, column in chunk.items():
+            columns[field].extend(column)
+    rows = dict(zip(columns['hash_key'], zip(columns['number'],
+                                              columns['flag'])))
+    assert rows['3'] == (3.0, 0)
+    assert rows['4'] == (4.0, 1)
+    assert math.isnan(rows['missing'][0])
+    assert rows['missing'][1] == -1
+
+
+def test_parallel_scan_to_columns(fx_column_test_model):
+    chunks = list(fx_column_test_model.scan().to_columns(
+        ['hash_key'], chunk_size=2, total_segments=3))
+    keys = [key for chunk in chunks for key in chunk['hash_key']]
+    assert sorted(keys) == sorted([str(i) for i in range(10)] + ['missing'])
+
+
+def test_iter_parallel_stops_early():
+    closed = []
+
+    def produce(arg):
+        try:
+            for i in xrange(1000):
+                yield i
+        finally:
+            closed.append(arg)
+
+    results = iter_parallel(produce, range(4))
+    next(results)
+    results.close()
+    deadline = time.time() + 2
+    while len(closed) < 4 and time.time() < deadline:
+        time.sleep(0.01)
+    assert sorted(closed) == range(4)
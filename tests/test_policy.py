@@ -0,0 +1,164 @@
+import socket
+import time
+
+from _pytest.python import raises, fixture
+from boto.dynamodb2.exceptions import ProvisionedThroughputExceededException
+from boto.dynamodb2.layer1 import DynamoDBConnection
+
+from bynamodb.attributes import NumberAttribute, StringAttribute
+from bynamodb.exceptions import DeadlineExceededException
+from bynamodb.model import Model
+from bynamodb.policy import CallPolicy
+from bynamodb.testing import MemoryConnection, SlowConnection
+
+
+def failing(errors, result='result', delays=()):
+    errors = list(errors)
+    delays = list(delays)
+    calls = []
+
+    def method():
+        calls.append(time.time())
+        if delays:
+            time.sleep(delays.pop(0))
+        if errors:
+            raise errors.pop(0)
+        return result
+    method.calls = calls
+    return method
+
+
+def test_retry_throttled():
+    policy = CallPolicy(max_retries=3, backoff=0.001)
+    method = failing([ProvisionedThroughputExceededException(400, 'throttled',
+                                                             None)] * 2)
+    assert policy.call('put_item', method) == 'result'
+    assert len(method.calls) == 3
+    assert policy.stats()['retries'] == 2
+
+    method = failing([ProvisionedThroughputExceededException(400, 'throttled',
+                                                             None)] * 5)
+    with raises(ProvisionedThroughputExceededException):
+        policy.call('get_item', method)
+    assert len(method.calls) == 4
+
+
+def test_retry_idempotent_only():
+    policy = CallPolicy(max_retries=3, backoff=0.001)
+    method = failing([socket.error('reset')])
+    assert policy.call('get_item', method) == 'result'
+    method = failing([socket.error('reset')])
+    with raises(socket.error):
+        policy.call('put_item', method)
+    assert len(method.calls) == 1
+
+
+def test_deadline():
+    policy = CallPolicy(timeouts={'get_item': 0.05})
+    started_at = time.time()
+    with raises(DeadlineExceededException):
+        policy.call('get_item', failing([], delays=[0.5]))
+    assert time.time() - started_at < 0.3
+    assert policy.stats()['deadlines_exceeded'] == 1
+    assert policy.call('put_item', failing([], delays=[0.1])) == 'result'
+
+    # A hedged request is cut at the deadline.
+    policy.hedge_percentile = 50
+    policy.min_samples = 1
+    policy.call('get_item', failing([]))
+    started_at = time.time()
+    with raises(DeadlineExceededException):
+        policy.call('get_item', failing([], delays=[0.5, 0.5]))
+    assert time.time() - started_at < 0.3
+
+
+def test_deadline_of_each_operation():
+    class DeadlineModel(Model):
+        hash_key = StringAttribute(hash_key=True)
+        range_key = NumberAttribute(range_key=True)
+
+    DeadlineModel._conn = SlowConnection(
+        MemoryConnection(),
+        latency=lambda operation: 0.3 if operation == 'get_item' else 0.0)
+    DeadlineModel.call_policy = CallPolicy(
+        timeouts={'get_item': 0.05, 'query': 1.0})
+    DeadlineModel.create_table()
+    DeadlineModel.put_item(hash_key='hash', range_key=1)
+    started_at = time.time()
+    with raises(DeadlineExceededException):
+        DeadlineModel.get_item('hash', 1)
+    assert time.time() - started_at < 0.2
+    assert len(list(DeadlineModel.query(hash_key__eq='hash'))) == 1
+
+
+def test_wrap_disables_boto_retries():
+    conn = DynamoDBConnection(aws_access_key_id='key',
+                              aws_secret_access_key='secret')
+    CallPolicy(timeout=1).wrap(conn)
+    assert conn.NumberRetries == 0
+    assert conn.num_retries == 0
+
+
+def test_wrap_once():
+    class Connection(object):
+        def __init__(self):
+            self.http_connection_kwargs = {'timeout': 70}
+
+    policy = CallPolicy(timeout=1, timeouts={'get_item': 0.05, 'query': 2})
+    conn = Connection()
+    assert policy.wrap(conn) is policy.wrap(conn)
+    assert conn.http_connection_kwargs['timeout'] == 2
+    assert policy.wrap(Connection()) is not policy.wrap(conn)
+
+
+def test_hedged_read():
+    policy = CallPolicy(hedge_percentile=50, min_samples=5)
+    for _ in range(5):
+        policy.call('get_item', failing([], delays=[0.01]))
+    assert policy.hedge_delay('get_item') >= 0.01
+    assert policy.hedge_delay('put_item') is None
+    method = failing([], delays=[0.5, 0.01])
+    started_at = time.time()
+    assert policy.call('get_item', method) == 'result'
+    assert time.time() - started_at < 0.3
+    assert len(method.calls) == 2
+    stats = policy.stats()
+    assert stats['hedges'] == stats['hedge_wins'] == 1
+
+
+@fixture
+def fx_policy_model():
+    class PolicyModel(Model):
+        hash_key = StringAttribute(hash_key=True)
+        range_key = NumberAttribute(range_key=True)
+
+    PolicyModel.create_table()
+    PolicyModel._conn = SlowConnection(PolicyModel._get_connection(),
+                                       error_ratio=0.3, seed=1)
+    PolicyModel.call_policy = CallPolicy(timeout=1, max_retries=10,
+                                         backoff=0.001)
+    return PolicyModel
+
+
+def test_model_call_policy(fx_policy_model):
+    for i in range(1, 11):
+        fx_policy_model.put_item(hash_key='hash', range_key=i)
+    assert fx_policy_model.get_item('hash', 1).range_key == 1
+    assert fx_policy_model.query(hash_key__eq='hash').count() == 10
+    conn = fx_policy_model._conn
+    stats = fx_policy_model.call_policy.stats()
+    assert stats['retries'] > 0
+    assert stats['calls'] + stats['retries'] == len(conn.calls)
+
+    assert fx_policy_model._get_connection() is \
+        fx_policy_model._get_connection()
+
+    conn.error_ratio = 0
+    conn.slow_ratio = 1
+    conn.slow_latency = 0.5
+    policy = fx_policy_model.call_policy
+    policy.timeouts['get_item'] = 0.05
+    policy.hedge_percentile = 50
+    policy.min_samples = 1
+    with raises(DeadlineExceededException):
+        fx_policy_model.get_item('hash', 1)
@@ -0,0 +1,73 @@
+# -*-coding:utf8-*-
+import cPickle as pickle
+from decimal import Decimal
+
+from _pytest.python import raises, fixture
+
+from bynamodb.attributes import (BinaryAttribute, BooleanAttribute,
+                                 CompressedJSONAttribute, ListAttribute,
+                                 MapAttribute, NumberAttribute,
+                                 NumberSetAttribute, StringAttribute,
+                                 StringSetAttribute)
+from bynamodb.exceptions import SchemaMismatchException
+from bynamodb.model import Model
+
+
+@fixture
+def fx_serialized_model():
+    class SerializedModel(Model):
+        hash_key = StringAttribute(hash_key=True)
+        range_key = NumberAttribute(range_key=True)
+        flag = BooleanAttribute(null=True)
+        data = BinaryAttribute(null=True)
+        tags = StringSetAttribute(null=True)
+        scores = NumberSetAttribute(null=True)
+        values = ListAttribute(null=True)
+        props = MapAttribute(null=True)
+        doc = CompressedJSONAttribute(null=True)
+        missing = StringAttribute(null=True)
+
+    return SerializedModel
+
+
+def test_dumps_loads(fx_serialized_model):
+    item = fx_serialized_model(
+        hash_key=u'가나', range_key=-12345678901234,
+        flag=False, data='\x00\xff', tags=set([u'a', u'b']),
+        scores=set([1, 2.5]),
+        values=[1, u'two', None, [True], {u'k': Decimal('1.10')}],
+        props={u'nested': {u'x': -1}}, doc={u'a': [1, 2]}
+    )
+    data = item.dumps()
+    loaded = fx_serialized_model.loads(data)
+    assert isinstance(loaded, fx_serialized_model)
+    for name in fx_serialized_model._get_attributes():
+        assert getattr(loaded, name) == getattr(item, name)
+    assert loaded.missing is None
+    assert len(data) < len(pickle.dumps(item._data, 2))
+
+
+def test_loads_schema_mismatch(fx_serialized_model):
+    data = fx_serialized_model(hash_key=u'a', range_key=1).dumps()
+
+    class OtherModel(Model):
+        hash_key = StringAttribute(hash_key=True)
+        range_key = StringAttribute(range_key=True)
+
+    with raises(SchemaMismatchException):
+        OtherModel.loads(data)
+    with raises(SchemaMismatchException):
+        fx_serialized_model.loads('\x00')
+
+
+def test_loads_truncated(fx_serialized_model):
+    data = fx_serialized_model(
+        hash_key=u'key', range_key=1.5, flag=True, values=[u'value'],
+        props={u'k': 1}).dumps()
+    for size in range(len(data)):
+        with raises(SchemaMismatchException):
+            fx_serialized_model.loads(data[:size])
+    with raises(ValueError):
+        fx_serialized_model.loads(data + '\x00')
+    with raises(ValueError):
+        fx_serialized_model.loads(data + data)
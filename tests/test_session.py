@@ -0,0 +1,124 @@
+from _pytest.python import raises, fixture
+
+from bynamodb.attributes import NumberAttribute, StringAttribute
+from bynamodb.batch import batch_get
+from bynamodb.exceptions import ItemNotFoundException
+from bynamodb.model import Model
+from bynamodb.session import Session, current_session
+from bynamodb.testing import SlowConnection
+
+
+@fixture
+def fx_session_model():
+    class SessionModel(Model):
+        hash_key = StringAttribute(hash_key=True)
+        range_key = NumberAttribute(range_key=True)
+        name = StringAttribute(null=True)
+
+    SessionModel.create_table()
+    for i in range(1, 4):
+        SessionModel.put_item(hash_key='hash', range_key=i, name=u'item')
+    SessionModel._conn = SlowConnection(SessionModel._get_connection())
+    return SessionModel
+
+
+def test_identity_map(fx_session_model):
+    calls = fx_session_model._conn.calls
+    with Session() as session:
+        assert current_session() is session
+        item = fx_session_model.get_item('hash', 1)
+        assert fx_session_model.get_item('hash', 1) is item
+        with raises(ItemNotFoundException):
+            fx_session_model.get_item('hash', 10)
+        with raises(ItemNotFoundException):
+            fx_session_model.get_item('hash', 10)
+        assert calls == ['get_item', 'get_item']
+        assert not session.dirty
+    assert current_session() is None
+    assert calls == ['get_item', 'get_item']
+    assert fx_session_model.get_item('hash', 1) is not item
+
+
+def test_commit_dirty(fx_session_model):
+    calls = fx_session_model._conn.calls
+    with Session() as session:
+        changed = fx_session_model.get_item('hash', 1)
+        fx_session_model.get_item('hash', 2)
+        changed.name = u'changed'
+        assert session.dirty == [changed]
+        new = fx_session_model.put_item(hash_key='hash', range_key=4)
+        assert fx_session_model.get_item('hash', 4) is new
+        fx_session_model.get_item('hash', 3).delete()
+        with raises(ItemNotFoundException):
+            fx_session_model.get_item('hash', 3)
+        assert calls == ['get_item'] * 3
+    assert calls == ['get_item'] * 3 + ['batch_write_item']
+    assert fx_session_model.get_item('hash', 1).name == u'changed'
+    assert fx_session_model.get_item('hash', 4).name is None
+    with raises(ItemNotFoundException):
+        fx_session_model.get_item('hash', 3)
+
+
+def test_commit_once(fx_session_model):
+    calls = fx_session_model._conn.calls
+    with Session() as session:
+        item = fx_session_model.get_item('hash', 1)
+        item.name = u'changed'
+        session.commit()
+        assert not session.is_dirty(item)
+        item.save()
+        assert session.is_dirty(item)
+    assert calls.count('batch_write_item') == 2
+
+
+def test_discard_on_error(fx_session_model):
+    with raises(ValueError):
+        with Session():
+            item = fx_session_model.get_item('hash', 1)
+            item.name = u'changed'
+            raise ValueError
+    assert fx_session_model.get_item('hash', 1).name == u'item'
+
+
+def test_nested_session(fx_session_model):
+    with Session() as outer:
+        item = fx_session_model.get_item('hash', 1)
+        with Session() as inner:
+            assert current_session() is inner
+            assert fx_session_model.get_item('hash', 1) is not item
+        assert current_session() is outer
+
+
+def test_batch_get(fx_session_model):
+    calls = fx_session_model._conn.calls
+    with Session():
+        item = fx_session_model.get_item('hash', 1)
+        with raises(ItemNotFoundException):
+            fx_session_model.get_item('hash', 10)
+        items = batch_get({
+            fx_session_model: [('hash', 1), ('hash', 2), ('hash', 10)]
+        })[fx_session_model]
+        assert items[0] is item
+        assert [i.range_key for i in items] == [1, 2]
+        assert fx_session_model.get_item('hash', 2) is items[1]
+        assert batch_get({fx_session_model: [('hash', 2)]}) == \
+            {fx_session_model: [items[1]]}
+    assert calls == ['get_item', 'get_item', 'batch_get_item']
+
+
+def test_query_in_session(fx_session_model):
+    with Session():
+        item = fx_session_model.get_item('hash', 1)
+        item.name = u'changed'
+        items = list(fx_session_model.query(hash_key__eq='hash'))
+        assert items[0] is item
+        assert items[0].name == u'changed'
+        assert fx_session_model.get_item('hash', 2) is items[1]
+        items[2].delete()
+        assert [i.range_key for i in fx_session_model.scan()] == [1, 2]
+        other = fx_session_model(hash_key='hash', range_key=1, name=u'other')
+        with raises(ValueError):
+            other.save()
+    assert fx_session_model.get_item('hash', 1).name == u'changed'
+    with raises(ItemNotFoundException):
+        fx_session_model.get_item('hash', 3)
@@ -0,0 +1,124 @@
+import threading
+
+from _pytest.python import raises, fixture
+
+from bynamodb.attributes import (NumberAttribute, StringAttribute,
+                                 VersionAttribute)
+from bynamodb.batch import BatchWriter
+from bynamodb.exceptions import (ConditionFailedException,
+                                 ItemNotFoundException,
+                                 VersionConflictException)
+from bynamodb.filterexps import EQ
+from bynamodb.model import Model
+from bynamodb.session import Session
+from bynamodb.writebehind import WriteBehindBuffer
+
+
+@fixture
+def fx_versioned_model():
+    class VersionedModel(Model):
+        hash_key = StringAttribute(hash_key=True)
+        range_key = NumberAttribute(range_key=True)
+        name = StringAttribute(null=True)
+        version = VersionAttribute()
+
+    VersionedModel.create_table()
+    return VersionedModel
+
+
+def test_version_attribute(fx_versioned_model):
+    assert fx_versioned_model._version_attribute == 'version'
+    assert Model._version_attribute is None
+    with raises(ValueError):
+        class TwoVersions(Model):
+            hash_key = StringAttribute(hash_key=True)
+            version = VersionAttribute()
+            other_version = VersionAttribute()
+
+
+def test_save_increments_version(fx_versioned_model):
+    item = fx_versioned_model(hash_key='hash', range_key=1)
+    assert item.version is None
+    item.save()
+    assert item.version == 1
+    item.name = u'changed'
+    item.save()
+    assert item.version == 2
+    loaded = fx_versioned_model.get_item('hash', 1)
+    assert loaded.version == 2
+    assert loaded.name == u'changed'
+
+
+def test_version_conflict(fx_versioned_model):
+    fx_versioned_model.put_item(hash_key='hash', range_key=1)
+    first = fx_versioned_model.get_item('hash', 1)
+    second = fx_versioned_model.get_item('hash', 1)
+    first.name = u'first'
+    first.save()
+    second.name = u'second'
+    with raises(VersionConflictException):
+        second.save()
+    assert second.version == 1
+    # A new object of an existing key conflicts too.
+    with raises(VersionConflictException):
+        fx_versioned_model.put_item(hash_key='hash', range_key=1)
+    with raises(VersionConflictException):
+        second.delete()
+    assert fx_versioned_model.get_item('hash', 1).name == u'first'
+    first.delete()
+    with raises(ItemNotFoundException):
+        fx_versioned_model.get_item('hash', 1)
+
+
+def test_conditional_write(fx_versioned_model):
+    item = fx_versioned_model(hash_key='hash', range_key=1, name=u'a')
+    item.save(if_not_exists=True)
+    with raises(ConditionFailedException):
+        fx_versioned_model(hash_key='hash', range_key=1).save(
+            if_not_exists=True)
+    item.name = u'b'
+    with raises(ConditionFailedException) as exc_info:
+        item.save(condition=EQ('name', u'b'))
+    assert not isinstance(exc_info.value, VersionConflictException)
+    item.save(condition=EQ('name', u'a'))
+    assert item.version == 2
+    with raises(ConditionFailedException):
+        item.delete(condition=EQ('name', u'a'))
+    item.delete(condition=EQ('name', u'b'))
+
+
+def test_session_version_conflict(fx_versioned_model):
+    fx_versioned_model.put_item(hash_key='hash', range_key=1)
+    other = fx_versioned_model.get_item('hash', 1)
+    with raises(VersionConflictException):
+        with Session():
+            item = fx_versioned_model.get_item('hash', 1)
+            item.name = u'session'
+            # Saved out of the session meanwhile
+            writer = threading.Thread(target=other.save)
+            writer.start()
+            writer.join()
+    assert fx_versioned_model.get_item('hash', 1).name is None
+    with Session():
+        item = fx_versioned_model.get_item('hash', 1)
+        item.name = u'session'
+    assert item.version == 3
+    assert fx_versioned_model.get_item('hash', 1).name == u'session'
+
+
+def test_buffered_conditional_write(fx_versioned_model):
+    fx_versioned_model.write_buffer = WriteBehindBuffer()
+    with raises(ValueError):
+        fx_versioned_model(hash_key='hash', range_key=1).save()
+
+
+def test_batched_versioned_write(fx_versioned_model):
+    item = fx_versioned_model.put_item(hash_key='hash', range_key=1)
+    with BatchWriter() as writer:
+        with raises(ValueError):
+            writer.put(item)
+        with raises(ValueError):
+            writer.delete(item)
+    with raises(ValueError):
+        fx_versioned_model.scan().delete()
+    assert fx_versioned_model.get_item('hash', 1).version == 1
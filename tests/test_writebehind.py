@@ -0,0 +1,108 @@
+import time
+
+from _pytest.python import raises, fixture
+
+from bynamodb.attributes import NumberAttribute, StringAttribute
+from bynamodb.exceptions import (DeadlineExceededException,
+                                 ItemNotFoundException,
+                                 WriteBufferFullException)
+from bynamodb.model import Model
+from bynamodb.testing import SlowConnection
+from bynamodb.writebehind import WriteBehindBuffer
+
+
+@fixture
+def fx_buffered_model():
+    class BufferedModel(Model):
+        hash_key = StringAttribute(hash_key=True)
+        count = NumberAttribute(default=0)
+
+    BufferedModel.create_table()
+    return BufferedModel
+
+
+def test_write_behind(fx_buffered_model):
+    buf = fx_buffered_model.write_buffer = WriteBehindBuffer(
+        flush_interval=60)
+    fx_buffered_model.put_item(hash_key='a', count=1)
+    fx_buffered_model.put_item(hash_key='a', count=2)
+    fx_buffered_model(hash_key='b', count=1).save()
+    with raises(ItemNotFoundException):
+        fx_buffered_model.get_item('a')
+    assert buf.stats()['pending'] == 2
+    assert buf.stats()['coalesced'] == 1
+
+    buf.flush()
+    assert fx_buffered_model.get_item('a').count == 2
+    assert fx_buffered_model.get_item('b').count == 1
+    fx_buffered_model.get_item('b').delete()
+    buf.close()
+    with raises(ItemNotFoundException):
+        fx_buffered_model.get_item('b')
+    assert buf.stats() == {'pending': 0, 'written': 3, 'coalesced': 1,
+                           'failed': 0, 'flushes': 2}
+    with raises(ValueError):
+        fx_buffered_model.put_item(hash_key='c')
+
+
+def test_write_behind_triggers(fx_buffered_model):
+    buf = fx_buffered_model.write_buffer = WriteBehindBuffer(
+        flush_size=2, flush_interval=0.05)
+    fx_buffered_model.put_item(hash_key='a')
+    time.sleep(0.3)
+    assert fx_buffered_model.get_item('a')
+    fx_buffered_model.write_buffer.flush_interval = 60
+    fx_buffered_model.put_item(hash_key='b')
+    fx_buffered_model.put_item(hash_key='c')
+    time.sleep(0.3)
+    assert fx_buffered_model.get_item('c')
+    assert buf.stats()['flushes'] == 2
+    buf.close()
+
+
+def test_write_behind_backpressure(fx_buffered_model):
+    fx_buffered_model._conn = SlowConnection(
+        fx_buffered_model._get_connection(), latency=0.3)
+    buf = fx_buffered_model.write_buffer = WriteBehindBuffer(
+        max_items=1, flush_interval=60, timeout=0.05)
+    fx_buffered_model.put_item(hash_key='a')
+    # Wait for the background flush to take it.
+    while buf.stats()['pending']:
+        time.sleep(0.001)
+    fx_buffered_model.put_item(hash_key='b')
+    fx_buffered_model.put_item(hash_key='b')
+    with raises(WriteBufferFullException):
+        fx_buffered_model.put_item(hash_key='c')
+    buf.close()
+    assert buf.stats()['written'] == 2
+
+
+def test_write_behind_close_timeout(fx_buffered_model):
+    failures = []
+    fx_buffered_model._conn = SlowConnection(
+        fx_buffered_model._get_connection(), latency=0.3)
+    buf = fx_buffered_model.write_buffer = WriteBehindBuffer(
+        flush_size=1, flush_interval=60,
+        on_error=lambda e, failed: failures.append(e))
+    fx_buffered_model.put_item(hash_key='a')
+    while buf.stats()['pending']:
+        time.sleep(0.001)
+    fx_buffered_model.put_item(hash_key='b')
+    started_at = time.time()
+    buf.close(timeout=0.05)
+    assert time.time() - started_at < 0.25
+    assert buf.stats()['failed'] == 1
+    assert isinstance(failures[0], DeadlineExceededException)
+
+
+def test_write_behind_failure(fx_buffered_model):
+    failures = []
+    fx_buffered_model._conn = SlowConnection(
+        fx_buffered_model._get_connection(), error_ratio=1)
+    buf = fx_buffered_model.write_buffer = WriteBehindBuffer(
+        flush_interval=60, on_error=lambda e, failed: failures.extend(failed))
+    fx_buffered_model.put_item(hash_key='a')
+    buf.close()
+    assert len(failures) == 1
+    assert failures[0][0] is fx_buffered_model
+    assert buf.stats()['failed'] == 1